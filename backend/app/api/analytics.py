@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from typing import Dict, List, Any
 from app.core.firebase import get_firestore_db
 from app.api.auth import get_current_user
+from app.services.counters import read_counters, reconcile_counters
+from app.services.analytics_engine import analytics_engine
+from app.services.response_cache import analytics_response_cache
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 from collections import defaultdict
 
 router = APIRouter()
 
+# Recent transfers and recently added assets each contribute up to this many activities
+RECENT_PER_SOURCE = 5
+MAX_RECENT_ACTIVITIES = 2 * RECENT_PER_SOURCE
+
 # Pydantic models
 class DashboardStats(BaseModel):
     total_assets: int
@@ -46,6 +53,13 @@ class ActivityReport(BaseModel):
     timestamp: str
     user: str
 
+async def _cached(response: Response, endpoint: str, key, compute):
+    """Serve `compute()` through the stale-while-revalidate cache, labelled with X-Cache and Age."""
+    result, status, age = await analytics_response_cache.get(endpoint, key, compute)
+    response.headers['X-Cache'] = status
+    response.headers['Age'] = str(int(age))
+    return result
+
 @router.get("/dashboard", response_model=DashboardStats)
 async def get_dashboard_stats(
     db = Depends(get_firestore_db),
@@ -55,26 +69,18 @@ async def get_dashboard_stats(
     if current_user.get("role") not in ["admin", "regular"]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Inefficient for large datasets. Consider using Cloud Functions for aggregation.
-    total_assets_query = db.collection('assets').count()
-    total_assets = total_assets_query.get()[0][0].value
-
-    # Get the reference to the 'In-service' status
-    in_service_status_ref = db.collection('asset_statuses').document('In-service')
-
-    active_assets_query = db.collection('assets').where('asset_status', '==', in_service_status_ref).count()
-    active_assets = active_assets_query.get()[0][0].value
-
+    # Sharded counters maintained by the write paths; seeded from a full
+    # count on first use, even if writes have already created shards
+    counters = await read_counters(db)
+    if counters is None:
+        counters = (await reconcile_counters(db))['actual']
+
+    total_assets = counters['assets_total']
+    active_assets = counters['assets_in_service']
     inactive_assets = total_assets - active_assets
-
-    pending_transfers_query = db.collection('transfers').where('status', '==', 'PENDING').count()
-    pending_transfers = pending_transfers_query.get()[0][0].value
-
-    total_users_query = db.collection('users').count()
-    total_users = total_users_query.get()[0][0].value
-
-    total_locations_query = db.collection('locations').count()
-    total_locations = total_locations_query.get()[0][0].value
+    pending_transfers = counters['transfers_pending']
+    total_users = counters['users_total']
+    total_locations = counters['locations_total']
     
     return DashboardStats(
         total_assets=total_assets,
@@ -93,12 +99,8 @@ async def get_assets_by_status(
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    assets = db.collection('assets').stream()
-    status_counts = defaultdict(int)
-    for asset in assets:
-        status_counts[asset.to_dict().get('status', 'UNKNOWN')] += 1
-    
-    return [AssetStatusReport(status=status, count=count) for status, count in status_counts.items()]
+    reports = await analytics_engine.report(db, 'by_status')
+    return [AssetStatusReport(**report) for report in reports]
 
 @router.get("/assets/by-category", response_model=List[AssetCategoryReport])
 async def get_assets_by_category(
@@ -108,12 +110,8 @@ async def get_assets_by_category(
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    assets = db.collection('assets').stream()
-    category_counts = defaultdict(int)
-    for asset in assets:
-        category_counts[asset.to_dict().get('category', 'UNKNOWN')] += 1
-    
-    return [AssetCategoryReport(category=category, count=count) for category, count in category_counts.items()]
+    reports = await analytics_engine.report(db, 'by_category')
+    return [AssetCategoryReport(**report) for report in reports]
 
 @router.get("/assets/by-type", response_model=List[AssetTypeReport])
 async def get_assets_by_type(
@@ -123,84 +121,41 @@ async def get_assets_by_type(
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Get all assets and their associated asset models to get asset types
-    assets = db.collection('assets').stream()
-    asset_models = {doc.id: doc.to_dict() for doc in db.collection('asset_models').stream()}
-    
-    # Define main asset types to show separately
-    main_types = {'Desktop', 'Headset', 'Laptop'}
-    type_counts = defaultdict(int)
-    other_count = 0
-    
-    for asset in assets:
-        asset_data = asset.to_dict()
-        # Check if asset has asset_type directly or through asset_model reference
-        asset_type = asset_data.get('asset_type')
-        if not asset_type and asset_data.get('asset_model'):
-            # If asset_model is a reference, get the ID
-            model_id = asset_data['asset_model']
-            if hasattr(model_id, 'id'):
-                model_id = model_id.id
-            model_data = asset_models.get(model_id, {})
-            asset_type = model_data.get('asset_type', 'UNKNOWN')
-        
-        if not asset_type:
-            asset_type = 'UNKNOWN'
-        
-        # Group asset types: show Desktop, Headset, Laptop separately, others as "Other"
-        if asset_type in main_types:
-            type_counts[asset_type] += 1
-        else:
-            other_count += 1
-    
-    # Build the result with main types and "Other" category
-    result = [AssetTypeReport(asset_type=asset_type, count=count) for asset_type, count in type_counts.items()]
-    if other_count > 0:
-        result.append(AssetTypeReport(asset_type="Other", count=other_count))
-    
-    return result
+    # Desktop, Headset and Laptop are shown separately, other types as "Other"
+    reports = await analytics_engine.report(db, 'by_type')
+    return [AssetTypeReport(**report) for report in reports]
 
 @router.get("/assets/by-location", response_model=List[LocationAssetReport])
 async def get_assets_by_location(
+    response: Response,
     db = Depends(get_firestore_db),
     current_user: dict = Depends(get_current_user)
 ):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    
-    locations = db.collection('locations').stream()
-    assets = db.collection('assets').stream()
-
-    location_map = {loc.id: loc.to_dict() for loc in locations}
-    location_counts = defaultdict(int)
 
-    for asset in assets:
-        location_id = asset.to_dict().get('location_id')
-        if location_id:
-            location_counts[location_id] += 1
-
-    return [
-        LocationAssetReport(
-            location_id=loc_id,
-            location_name=location_map.get(loc_id, {}).get('name', 'Unknown'),
-            asset_count=count
-        )
-        for loc_id, count in location_counts.items()
-    ]
+    async def compute():
+        reports = await analytics_engine.report(db, 'by_location')
+        return [LocationAssetReport(**report) for report in reports]
+    return await _cached(response, 'assets-by-location', None, compute)
 
 @router.get("/transfers/monthly", response_model=List[MonthlyTransferReport])
 async def get_monthly_transfers(
+    response: Response,
     db = Depends(get_firestore_db),
     current_user: dict = Depends(get_current_user)
 ):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    
+
+    return await _cached(response, 'transfers-monthly', None, lambda: _monthly_transfers(db))
+
+async def _monthly_transfers(db) -> List[MonthlyTransferReport]:
     twelve_months_ago = datetime.utcnow() - timedelta(days=365)
     transfers = db.collection('transfers').where('requested_at', '>=', twelve_months_ago).stream()
 
     monthly_counts = defaultdict(int)
-    for transfer in transfers:
+    async for transfer in transfers:
         transfer_date = transfer.to_dict().get('requested_at')
         if transfer_date:
             monthly_counts[(transfer_date.year, transfer_date.month)] += 1
@@ -227,7 +182,7 @@ async def get_assets_with_expiring_warranty(
     assets = db.collection('assets').where('warranty_expiry', '!=', None).where('warranty_expiry', '<=', expiry_date).where('warranty_expiry', '>=', datetime.utcnow()).where('status', '==', 'ACTIVE').stream()
 
     expiring_assets = []
-    for asset in assets:
+    async for asset in assets:
         asset_dict = asset.to_dict()
         asset_dict['id'] = asset.id
         expiring_assets.append(asset_dict)
@@ -240,47 +195,38 @@ async def get_assets_with_expiring_warranty(
 
 @router.get("/users/asset-allocation")
 async def get_user_asset_allocation(
+    response: Response,
     db = Depends(get_firestore_db),
     current_user: dict = Depends(get_current_user)
 ):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    
-    users = db.collection('users').where('is_active', '==', True).stream()
-    assets = db.collection('assets').stream()
-
-    user_map = {user.id: user.to_dict() for user in users}
-    asset_counts = defaultdict(int)
 
-    for asset in assets:
-        user_id = asset.to_dict().get('assigned_user_id')
-        if user_id:
-            asset_counts[user_id] += 1
-
-    return [
-        {
-            "user_id": user_id,
-            "full_name": user_map.get(user_id, {}).get('full_name', 'Unknown'),
-            "username": user_map.get(user_id, {}).get('username', 'Unknown'),
-            "asset_count": count
-        }
-        for user_id, count in asset_counts.items()
-    ]
+    async def compute():
+        reports = await analytics_engine.report(db, 'user_allocation')
+        return [dict(report) for report in reports]
+    return await _cached(response, 'user-asset-allocation', None, compute)
 
 @router.get("/recent-activities", response_model=List[ActivityReport])
 async def get_recent_activities(
-    limit: int = 10,
+    response: Response,
+    limit: int = Query(10, ge=1, le=100),
     db = Depends(get_firestore_db),
     current_user: dict = Depends(get_current_user)
 ):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    
+
+    # Larger limits return the same list, so they share one cache entry
+    limit = min(limit, MAX_RECENT_ACTIVITIES)
+    return await _cached(response, 'recent-activities', limit, lambda: _recent_activities(db, limit))
+
+async def _recent_activities(db, limit: int) -> List[ActivityReport]:
     activities = []
     
     # Get recent transfers
-    transfers = db.collection('transfers').order_by('requested_at', direction='DESCENDING').limit(5).stream()
-    for transfer in transfers:
+    transfers = db.collection('transfers').order_by('requested_at', direction='DESCENDING').limit(RECENT_PER_SOURCE).stream()
+    async for transfer in transfers:
         transfer_data = transfer.to_dict()
         activities.append({
             'id': transfer.id,
@@ -292,8 +238,8 @@ async def get_recent_activities(
     
     # Get recent assets (created in last 30 days)
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    assets = db.collection('assets').where('created_at', '>=', thirty_days_ago).order_by('created_at', direction='DESCENDING').limit(5).stream()
-    for asset in assets:
+    assets = db.collection('assets').where('created_at', '>=', thirty_days_ago).order_by('created_at', direction='DESCENDING').limit(RECENT_PER_SOURCE).stream()
+    async for asset in assets:
         asset_data = asset.to_dict()
         activities.append({
             'id': asset.id,
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from pydantic import BaseModel
 from typing import List
+from app.core.conditional import conditional_response, representation_cache
 from app.core.firebase import get_firestore_db
+from app.services.reference_cache import reference_cache
 
 router = APIRouter()
 
@@ -13,15 +15,19 @@ class AssetModelResponse(BaseModel):
 
 @router.get("/asset-models", response_model=List[AssetModelResponse])
 async def get_asset_models(
+    request: Request,
     db = Depends(get_firestore_db),
 ):
-    asset_models_ref = db.collection('asset_models')
-    all_asset_models = asset_models_ref.stream()
-    
-    asset_models_list = []
-    for model in all_asset_models:
-        model_dict = model.to_dict()
-        model_dict['id'] = model.id
-        asset_models_list.append(model_dict)
-
-    return asset_models_list
+    # Served from the listener-maintained reference cache; the encoded body
+    # is reused, and revalidated with its ETag, until a model changes
+    await reference_cache.ensure_loaded(db, ['asset_models'])
+    representation = representation_cache.get(
+        'asset_models',
+        reference_cache.collection_generation('asset_models'),
+        List[AssetModelResponse],
+        lambda: [
+            {**model, 'id': model_id}
+            for model_id, model in sorted(reference_cache.all('asset_models').items())
+        ],
+    )
+    return conditional_response(request, representation)
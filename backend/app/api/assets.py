@@ -1,190 +1,52 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import List, Optional, Dict, Any
 from app.core.firebase import get_firestore_db
+from app.core.config import settings
+from app.core.responses import fast_response
 from app.api.auth import get_current_user
 from pydantic import BaseModel
 from datetime import datetime
-from google.cloud.firestore_v1.document import DocumentReference
-from google.cloud.firestore_v1 import query as firestore_query
 import asyncio
-from functools import lru_cache
-import time
+from app.services import asset_export
+from app.services.reference_cache import reference_cache
+from app.services.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page
+from app.services.search_index import AssetSearchIndex, asset_search_index
+from app.services.user_locations import location_deltas, stage_deltas
+from app.services.bulk_updates import bulk_update_assets
+from app.services.query_planner import FanOutQuery
+from app.services.list_cache import asset_list_cache
+from app.services.generations import data_generations
+from app.services.asset_fields import denormalized_fields, stale_fields
+from app.services.counters import asset_deltas, stage_increments
+from app.services.repository import AssetRecord, hydrate_assets
 
 router = APIRouter()
 
-# Cache for frequently accessed reference data
-_cache = {
-    'locations': {},
-    'asset_models': {},
-    'asset_statuses': {},
-    'users': {},
-    'last_updated': {
-        'locations': 0,
-        'asset_models': 0,
-        'asset_statuses': 0,
-        'users': 0
-    }
-}
-
-CACHE_TTL = 300  # 5 minutes cache
-
-async def _get_cached_reference_data(db, collection_name: str) -> Dict[str, Any]:
-    """Get cached reference data with TTL"""
-    current_time = time.time()
-    
-    if (current_time - _cache['last_updated'][collection_name]) > CACHE_TTL:
-        # Cache expired, refresh
-        docs = db.collection(collection_name).stream()
-        _cache[collection_name] = {doc.id: convert_doc_refs(doc.to_dict()) for doc in docs}
-        _cache['last_updated'][collection_name] = current_time
-    
-    return _cache[collection_name]
-
-def convert_doc_refs(data):
-    if isinstance(data, dict):
-        for key, value in data.items():
-            data[key] = convert_doc_refs(value)
-    elif isinstance(data, list):
-        for i, item in enumerate(data):
-            data[i] = convert_doc_refs(item)
-    elif isinstance(data, DocumentReference):
-        return data.id
-    return data
-
 async def _get_populated_assets_optimized(asset_docs: list, db) -> list:
-    """Optimized version using cached reference data"""
+    """Hydrate assets from the listener-maintained reference cache"""
     if not asset_docs:
         return []
     
-    # Get all reference data in parallel using cache
-    locations_cache, models_cache, statuses_cache, users_cache = await asyncio.gather(
-        _get_cached_reference_data(db, 'locations'),
-        _get_cached_reference_data(db, 'asset_models'),
-        _get_cached_reference_data(db, 'asset_statuses'),
-        _get_cached_reference_data(db, 'users'),
-        return_exceptions=True
-    )
-    
-    # Handle any exceptions in cache loading
-    if isinstance(locations_cache, Exception):
-        locations_cache = {}
-    if isinstance(models_cache, Exception):
-        models_cache = {}
-    if isinstance(statuses_cache, Exception):
-        statuses_cache = {}
-    if isinstance(users_cache, Exception):
-        users_cache = {}
-
-    assets_list = []
-    for doc in asset_docs:
-        asset = convert_doc_refs(doc.to_dict())
-        asset['id'] = doc.id
-
-        # Populate location from cache
-        if asset.get('location'):
-            location_id = asset['location'] if isinstance(asset['location'], str) else asset['location'].id
-            asset['location'] = locations_cache.get(location_id)
-        
-        # Populate user from cache
-        if asset.get('user'):
-            user_id = asset['user'] if isinstance(asset['user'], str) else asset['user'].id
-            user_data = users_cache.get(user_id)
-            if user_data:
-                asset['assigned_user'] = user_data
-
-        # Handle asset_model field - keep separate fields
-        if asset.get('asset_model'):
-            if isinstance(asset['asset_model'], str):
-                # Direct string value - use as model only
-                asset['model'] = asset['asset_model']
-                # Keep existing asset_type and asset_make if they exist
-            else:
-                # Reference to asset_models collection
-                model_id = asset['asset_model'].id
-                model_data = models_cache.get(model_id)
-                if model_data:
-                    # Only set if not already present as direct fields
-                    if not asset.get('asset_type'):
-                        asset['asset_type'] = model_data.get('asset_type')
-                    if not asset.get('asset_make'):
-                        asset['asset_make'] = model_data.get('asset_make')
-                    asset['model'] = model_data.get('asset_model')
-        
-        # Debug: Print asset data to see what's being returned
-        print(f"Asset {asset.get('id', 'unknown')}: type={asset.get('asset_type')}, make={asset.get('asset_make')}, model={asset.get('model')}")
-
-        # Populate status from cache
-        if asset.get('asset_status'):
-            status_id = asset['asset_status'] if isinstance(asset['asset_status'], str) else asset['asset_status'].id
-            status_data = statuses_cache.get(status_id)
-            if status_data:
-                asset['status'] = status_data.get('status_name')
-
-        assets_list.append(asset)
-    
-    return assets_list
-
-async def _get_populated_assets(asset_docs: list, db) -> list:
-    location_refs = set()
-    user_refs = set()
-    model_refs = set()
-    status_refs = set()
-
-    for doc in asset_docs:
-        asset = doc.to_dict()
-        if asset.get('location') and isinstance(asset.get('location'), DocumentReference):
-            location_refs.add(asset['location'])
-        if asset.get('user') and isinstance(asset.get('user'), DocumentReference):
-            user_refs.add(asset['user'])
-        
-        if asset.get('asset_model') and isinstance(asset.get('asset_model'), DocumentReference):
-            model_refs.add(asset['asset_model'])
-        if asset.get('asset_status') and isinstance(asset.get('asset_status'), DocumentReference):
-            status_refs.add(asset['asset_status'])
-
-    all_refs = list(location_refs | user_refs | model_refs | status_refs)
-    valid_refs = [ref for ref in all_refs if ref is not None]
-    if valid_refs:
-        referenced_docs_raw = db.get_all(valid_refs)
-        referenced_docs_map = {doc.reference.path: convert_doc_refs(doc.to_dict()) for doc in referenced_docs_raw if doc.exists}
-    else:
-        referenced_docs_map = {}
-
-    assets_list = []
-    for doc in asset_docs:
-        asset = convert_doc_refs(doc.to_dict())
-        asset['id'] = doc.id
-
-        if asset.get('location') and isinstance(asset.get('location'), str):
-            location_ref_path = db.collection('locations').document(asset['location']).path
-            if location_ref_path in referenced_docs_map:
-                asset['location'] = referenced_docs_map[location_ref_path]
-        
-        if asset.get('user') and isinstance(asset.get('user'), str):
-            user_ref_path = db.collection('users').document(asset['user']).path
-            if user_ref_path in referenced_docs_map:
-                asset['assigned_user'] = referenced_docs_map[user_ref_path]
-
-        if asset.get('asset_model') and isinstance(asset.get('asset_model'), str):
-            model_ref_path = db.collection('asset_models').document(asset['asset_model']).path
-            if model_ref_path in referenced_docs_map:
-                model_data = referenced_docs_map[model_ref_path]
-                # Only set if not already present as direct fields
-                if not asset.get('asset_type'):
-                    asset['asset_type'] = model_data.get('asset_type')
-                if not asset.get('asset_make'):
-                    asset['asset_make'] = model_data.get('asset_make')
-                asset['model'] = model_data.get('asset_model')
-
-        if asset.get('asset_status') and isinstance(asset.get('asset_status'), str):
-            status_ref_path = db.collection('asset_statuses').document(asset['asset_status']).path
-            if status_ref_path in referenced_docs_map:
-                status_data = referenced_docs_map[status_ref_path]
-                asset['status'] = status_data.get('status_name')
-
-        assets_list.append(asset)
-    
-    return assets_list
+    # Only reads Firestore if a listener has not delivered its first snapshot yet
+    await reference_cache.ensure_loaded(db)
+    return hydrate_assets(asset_docs, reference_cache.get)
+
+async def _get_populated_assets(asset_docs: list, loader) -> list:
+    """Hydrate assets through a request-scoped DocumentLoader.
+
+    Every referenced document is requested at once, so concurrent callers
+    (one per transfer, say) share a single batched fetch, and the same
+    decoded document.
+    """
+    records = [AssetRecord.from_snapshot(doc) for doc in asset_docs]
+    keys = list({key for record in records for key in record.references()})
+    loaded = await asyncio.gather(*(loader.load(collection, doc_id) for collection, doc_id in keys))
+    referenced = {key: loader.data(key[0], snapshot) for key, snapshot in zip(keys, loaded)}
+
+    def lookup(collection, doc_id):
+        return referenced.get((collection, doc_id))
+    return [record.hydrate(lookup) for record in records]
 
 # Pydantic models
 class AssetCreate(BaseModel):
@@ -215,6 +77,21 @@ class BulkUpdateLocation(BaseModel):
     asset_ids: List[str]
     location_id: str
 
+class BulkItemResult(BaseModel):
+    asset_id: str
+    success: bool
+    error: Optional[str] = None
+
+class BulkUpdateResponse(BaseModel):
+    message: str
+    requested: int
+    updated: int
+    failed: int
+    batches: int
+    elapsed_ms: float
+    assets_per_second: Optional[float] = None
+    results: List[BulkItemResult]
+
 class AssetResponse(BaseModel):
     id: str
     asset_model: Optional[str] = None
@@ -235,6 +112,58 @@ class AssetResponse(BaseModel):
 class PaginatedAssetResponse(BaseModel):
     total_count: int
     assets: List[AssetResponse]
+    # Pass back as `cursor` to fetch the following page; None on the last page
+    next_cursor: Optional[str] = None
+
+async def _filtered_assets_query(db, category: Optional[str], status: Optional[str],
+                                 assigned_user_id: Optional[str], location_id: Optional[str]):
+    """A FanOutQuery with get_assets' filters applied, plus the same filters
+    in AssetSearchIndex.search's form (None when there are none)."""
+    query = db.collection('assets')
+    filters = {}
+    model_refs = None
+
+    # Apply server-side filters
+    if category and settings.DENORMALIZED_ASSET_FIELDS:
+        # Every asset carries its model's type, so this is one equality filter
+        query = query.where('asset_type', '==', category)
+        filters['asset_type'] = {category}
+    elif category:
+        # Optimize category filtering by using cached asset models
+        await reference_cache.ensure_loaded(db, ['asset_models'])
+        matching_model_ids = [
+            model_id for model_id, model_data in reference_cache.all('asset_models').items()
+            if model_data.get('asset_type') == category
+        ]
+        filters['asset_model'] = set(matching_model_ids)
+        # Split into several queries when there are more models than one 'in'
+        # filter takes; a category no model has matches no asset
+        model_refs = [db.collection('asset_models').document(model_id) for model_id in matching_model_ids]
+    if status:
+        status_ref = db.collection('asset_statuses').document(status.replace('/', '-'))
+        query = query.where('asset_status', '==', status_ref)
+        filters['asset_status'] = {status_ref.id}
+    if assigned_user_id:
+        query = query.where('assigned_user_id', '==', assigned_user_id)
+        filters['assigned_user_id'] = {assigned_user_id}
+    if location_id:
+        location_ref = db.collection('locations').document(location_id)
+        query = query.where('location', '==', location_ref)
+        filters['location'] = {location_id}
+
+    return FanOutQuery(query, 'asset_model', model_refs), filters or None
+
+async def _search_assets(db, query, search_query: str, filters):
+    """`(index, ranked)` for a search, where `index` holds the matched snapshots."""
+    await reference_cache.ensure_loaded(db)
+    if asset_search_index.ready:
+        return asset_search_index, asset_search_index.search(search_query, filters)
+
+    # The listener has not delivered its first snapshot yet; index the
+    # filtered candidates for this request only.
+    index = AssetSearchIndex()
+    index.rebuild([doc async for doc in query.stream()])
+    return index, index.search(search_query)
 
 @router.post("/", response_model=AssetResponse)
 async def create_asset(
@@ -244,27 +173,66 @@ async def create_asset(
 ):
     # Check if asset tag already exists
     assets_ref = db.collection('assets')
-    existing_asset = assets_ref.where('asset_tag', '==', asset_data.asset_tag).limit(1).get()
+    existing_asset = await assets_ref.where('asset_tag', '==', asset_data.asset_tag).limit(1).get()
     if existing_asset:
         raise HTTPException(status_code=400, detail="Asset tag already exists")
 
     # Check if serial number already exists (used as document ID)
     asset_ref = db.collection('assets').document(asset_data.serial_number)
-    if asset_ref.get().exists:
+    if (await asset_ref.get()).exists:
         raise HTTPException(status_code=400, detail="Serial number already exists")
 
     asset_dict = asset_data.dict()
+    await reference_cache.ensure_loaded(db, ['asset_models'])
+    asset_dict.update(denormalized_fields(asset_dict, reference_cache.all('asset_models')))
     asset_dict['created_at'] = datetime.utcnow()
     asset_dict['updated_at'] = datetime.utcnow()
 
-    asset_ref.set(asset_dict)
+    # The asset, the owner's location histogram and the dashboard counters are written together
+    batch = db.batch()
+    batch.set(asset_ref, asset_dict)
+    stage_deltas(batch, db, location_deltas(None, asset_dict))
+    stage_increments(batch, db, asset_deltas(None, asset_dict))
+    await batch.commit()
+    # Cached list pages are stale now, before the listener notices
+    data_generations.bump('assets')
 
-    created_asset = asset_ref.get()
+    created_asset = await asset_ref.get()
     populated_assets = await _get_populated_assets_optimized([created_asset], db)
     if not populated_assets:
         raise HTTPException(status_code=500, detail="Failed to create asset")
     return populated_assets[0]
 
+# Declared before /{asset_id} so "export" is not taken for an asset ID
+@router.get("/export")
+async def export_assets(
+    format: str = Query("csv", regex="^(csv|ndjson|xlsx)$"),
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    assigned_user_id: Optional[str] = None,
+    location_id: Optional[str] = None,
+    search_query: Optional[str] = None,
+    db = Depends(get_firestore_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream every asset matching get_assets' filters in the data.js column layout"""
+    query, filters = await _filtered_assets_query(db, category, status, assigned_user_id, location_id)
+    await reference_cache.ensure_loaded(db)
+
+    if search_query:
+        index, ranked = await _search_assets(db, query, search_query, filters)
+        snapshots = asset_export.iterate(index.snapshots(doc_id for doc_id, _ in ranked))
+    else:
+        # Rows are encoded as Firestore delivers them, never all held at once
+        snapshots = query.stream()
+
+    filename = f"assets-{datetime.utcnow():%Y%m%d}.{format}"
+    return StreamingResponse(
+        asset_export.export_assets(snapshots, format),
+        media_type=asset_export.MEDIA_TYPES[format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
 @router.get("/{asset_id}", response_model=AssetResponse)
 async def get_asset(
     asset_id: str,
@@ -272,7 +240,7 @@ async def get_asset(
     current_user: dict = Depends(get_current_user)
 ):
     asset_ref = db.collection('assets').document(asset_id)
-    asset = asset_ref.get()
+    asset = await asset_ref.get()
     if not asset.exists:
         raise HTTPException(status_code=404, detail="Asset not found")
     
@@ -292,82 +260,80 @@ async def get_assets(
     search_query: Optional[str] = None,
     sort_by: Optional[str] = None,
     sort_order: Optional[str] = Query("desc", regex="^(asc|desc)$"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; takes precedence over skip"),
     db = Depends(get_firestore_db),
     current_user: dict = Depends(get_current_user)
 ):
-    assets_ref = db.collection('assets')
-    query = assets_ref
+    query, filters = await _filtered_assets_query(db, category, status, assigned_user_id, location_id)
 
-    # Apply server-side filters
-    if category:
-        # Optimize category filtering by using cached asset models
-        models_cache = await _get_cached_reference_data(db, 'asset_models')
-        matching_model_ids = [
-            model_id for model_id, model_data in models_cache.items()
-            if model_data.get('asset_type') == category
-        ]
-        
-        if matching_model_ids:
-            # Limit to first 10 due to Firestore 'in' constraint
-            model_refs = [db.collection('asset_models').document(model_id) for model_id in matching_model_ids[:10]]
-            query = query.where('asset_model', 'in', model_refs)
-    if status:
-        status_ref = db.collection('asset_statuses').document(status.replace('/', '-'))
-        query = query.where('asset_status', '==', status_ref)
-    if assigned_user_id:
-        query = query.where('assigned_user_id', '==', assigned_user_id)
-    if location_id:
-        location_ref = db.collection('locations').document(location_id)
-        query = query.where('location', '==', location_ref)
-
-    # The search_query requires in-memory filtering due to Firestore limitations on partial text search.
-    # This part remains inefficient. For a production-grade solution, consider a dedicated search service
-    # like Algolia or Elasticsearch.
+    # Search is answered from the in-process trigram index, which mirrors the
+    # assets collection through a snapshot listener, so it costs no reads.
     if search_query:
-        all_assets_docs = list(query.stream())
-        assets_list = await _get_populated_assets_optimized(all_assets_docs, db)
-        
-        search_query_lower = search_query.lower()
-        assets_list = [
-            asset for asset in assets_list if
-            # Search only in assigned user name
-            (asset.get('assigned_user') and 
-             search_query_lower in str(asset.get('assigned_user', {}).get('name') or '').lower())
-        ]
-        
-        total_count = len(assets_list)
+        index, ranked = await _search_assets(db, query, search_query, filters)
 
-        if sort_by:
-            assets_list.sort(
-                key=lambda asset: asset.get(sort_by) or '',
-                reverse=(sort_order == "desc")
-            )
+        total_count = len(ranked)
 
-        paginated_assets = assets_list[skip : skip + limit]
-        return PaginatedAssetResponse(total_count=total_count, assets=paginated_assets)
+        try:
+            if sort_by:
+                # Sorting may use hydrated fields, so hydrate every match first.
+                assets_list = await _get_populated_assets_optimized(index.snapshots(doc_id for doc_id, _ in ranked), db)
+                paginated_assets, next_cursor = keyset_page(
+                    assets_list, sort_by, sort_order, limit, cursor=cursor, skip=skip
+                )
+            else:
+                # Relevance order: page the scores, then hydrate only that page.
+                rows = [{'id': doc_id, '_score': score} for doc_id, score in ranked]
+                page_rows, next_cursor = keyset_page(rows, '_score', 'desc', limit, cursor=cursor, skip=skip)
+                paginated_assets = await _get_populated_assets_optimized(
+                    index.snapshots(row['id'] for row in page_rows), db
+                )
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return fast_response(
+            PaginatedAssetResponse,
+            {'total_count': total_count, 'assets': paginated_assets, 'next_cursor': next_cursor}
+        )
 
     # Efficient path for non-search queries
     else:
-        # Get total count for pagination
-        count_query = query.count()
-        total_count_result = count_query.get()
-        total_count = total_count_result[0][0].value
-
-        # Apply sorting on the server
-        # Note: Firestore requires creating composite indexes for most non-trivial sort/filter combinations.
-        # If you get an error from Firestore, it will usually include a link to create the required index.
-        if sort_by and sort_by != "":
-            direction = firestore_query.Query.DESCENDING if sort_order == "desc" else firestore_query.Query.ASCENDING
-            query = query.order_by(sort_by, direction=direction)
-
-        # Apply pagination on the server
-        paginated_query = query.offset(skip).limit(limit)
-        
-        asset_docs = list(paginated_query.stream())
+        # Identical requests are answered from memory until an asset or a
+        # name they show changes
+        filter_key = asset_list_cache.filter_key(category, status, assigned_user_id, location_id)
+        page_key = asset_list_cache.page_key(filter_key, sort_by, sort_order, limit, skip, cursor)
+        cached_page = asset_list_cache.get_page(page_key)
+        if cached_page is not None:
+            return fast_response(PaginatedAssetResponse, cached_page)
+        generation = asset_list_cache.generation()
+
+        # Get total count for pagination; a split category query sums its parts
+        total_count = asset_list_cache.get_count(filter_key)
+        if total_count is None:
+            total_count = await query.count()
+            asset_list_cache.put_count(filter_key, generation, total_count)
+
+        # Apply pagination on the server. A cursor resumes after the last row
+        # of the previous page; offset() is kept for callers that still send skip,
+        # but Firestore reads (and bills) every skipped document.
+        start = None
+        if cursor:
+            try:
+                cursor_value, cursor_id = decode_cursor(cursor, sort_by, sort_order, db)
+            except InvalidCursor as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            start = {sort_by: cursor_value, '__name__': cursor_id} if sort_by else {'__name__': cursor_id}
+
+        asset_docs = await query.page(sort_by, sort_order, limit, start_after=start, offset=0 if cursor else skip)
+
+        next_cursor = None
+        if len(asset_docs) == limit:
+            last_doc = asset_docs[-1]
+            next_cursor = encode_cursor(sort_by, sort_order, last_doc.get(sort_by) if sort_by else None, last_doc.id)
         
         assets_list = await _get_populated_assets_optimized(asset_docs, db)
 
-        return PaginatedAssetResponse(total_count=total_count, assets=assets_list)
+        page = {'total_count': total_count, 'assets': assets_list, 'next_cursor': next_cursor}
+        asset_list_cache.put_page(page_key, generation, page)
+        return fast_response(PaginatedAssetResponse, page)
 
 @router.put("/{asset_id}", response_model=AssetResponse)
 async def update_asset(
@@ -377,19 +343,27 @@ async def update_asset(
     current_user: dict = Depends(get_current_user)
 ):
     asset_ref = db.collection('assets').document(asset_id)
-    asset = asset_ref.get()
+    asset = await asset_ref.get()
     if not asset.exists:
         raise HTTPException(status_code=404, detail="Asset not found")
 
     update_data = asset_data.dict(exclude_unset=True)
     update_data['updated_at'] = datetime.utcnow()
 
-    asset_ref.update(update_data)
-
-    updated_asset = asset_ref.get()
-    response = updated_asset.to_dict()
-    response['id'] = updated_asset.id
-    return response
+    before = asset.to_dict()
+    if 'asset_model' in update_data:
+        # Type, make and model follow the new model
+        await reference_cache.ensure_loaded(db, ['asset_models'])
+        update_data.update(stale_fields({**before, **update_data}, reference_cache.all('asset_models')))
+    batch = db.batch()
+    batch.update(asset_ref, update_data)
+    stage_deltas(batch, db, location_deltas(before, {**before, **update_data}))
+    stage_increments(batch, db, asset_deltas(before, {**before, **update_data}))
+    await batch.commit()
+    data_generations.bump('assets')
+
+    updated_asset = await asset_ref.get()
+    return (await _get_populated_assets_optimized([updated_asset], db))[0]
 
 @router.delete("/{asset_id}")
 async def delete__asset(
@@ -398,14 +372,19 @@ async def delete__asset(
     current_user: dict = Depends(get_current_user)
 ):
     asset_ref = db.collection('assets').document(asset_id)
-    asset = asset_ref.get()
+    asset = await asset_ref.get()
     if not asset.exists:
         raise HTTPException(status_code=404, detail="Asset not found")
 
-    asset_ref.delete()
+    batch = db.batch()
+    batch.delete(asset_ref)
+    stage_deltas(batch, db, location_deltas(asset.to_dict(), None))
+    stage_increments(batch, db, asset_deltas(asset.to_dict(), None))
+    await batch.commit()
+    data_generations.bump('assets')
     return {"message": "Asset deleted successfully"}
 
-@router.post("/bulk-update-status")
+@router.post("/bulk-update-status", response_model=BulkUpdateResponse)
 async def bulk_update_status(
     update_data: BulkUpdateStatus,
     db = Depends(get_firestore_db),
@@ -414,13 +393,10 @@ async def bulk_update_status(
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    for asset_id in update_data.asset_ids:
-        asset_ref = db.collection('assets').document(asset_id)
-        asset_ref.update({"status": update_data.status})
-    
-    return {"message": "Assets updated successfully"}
+    summary = await bulk_update_assets(db, update_data.asset_ids, lambda asset: {"status": update_data.status})
+    return _bulk_response(summary)
 
-@router.post("/bulk-update-location")
+@router.post("/bulk-update-location", response_model=BulkUpdateResponse)
 async def bulk_update_location(
     update_data: BulkUpdateLocation,
     db = Depends(get_firestore_db),
@@ -429,8 +405,13 @@ async def bulk_update_location(
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    for asset_id in update_data.asset_ids:
-        asset_ref = db.collection('assets').document(asset_id)
-        asset_ref.update({"location_id": update_data.location_id})
-    
-    return {"message": "Assets updated successfully"}
\ No newline at end of file
+    # The per-user location histograms are updated in the same batches
+    summary = await bulk_update_assets(db, update_data.asset_ids, lambda asset: {"location_id": update_data.location_id})
+    return _bulk_response(summary)
+
+def _bulk_response(summary: dict) -> dict:
+    if summary['failed'] == 0:
+        message = "Assets updated successfully"
+    else:
+        message = f"Updated {summary['updated']} of {summary['requested']} assets"
+    return {"message": message, **summary}
\ No newline at end of file
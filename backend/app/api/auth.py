@@ -1,16 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer
 from app.core.firebase import get_firestore_db
-import firebase_admin.auth
 from pydantic import BaseModel, EmailStr
+from typing import Optional
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
 import jwt
 from app.core.config import settings
+from app.core.security import HashingPoolBusy, password_hasher, principal_cache
+from app.services.refresh_tokens import (
+    InvalidRefreshToken, decode_refresh_token, issue_refresh_token, revoke_family, rotate_refresh_token
+)
+import logging
+import time
 
 router = APIRouter()
 security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
 
 # Pydantic models
 class UserCreate(BaseModel):
@@ -36,6 +41,15 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     user: UserResponse
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class RefreshedToken(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -47,7 +61,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(security), db = Depends(get_firestore_db)):
+async def get_current_user(token: str = Depends(security), db = Depends(get_firestore_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -60,13 +74,21 @@ def get_current_user(token: str = Depends(security), db = Depends(get_firestore_
         if user_id is None:
             raise credentials_exception
         
+        cached = principal_cache.get(user_id, token.credentials)
+        if cached is not None:
+            return cached
+
+        generation = principal_cache.generation(user_id)
+        started = time.perf_counter()
         user_ref = db.collection('it_users').document(user_id)
-        user = user_ref.get()
+        user = await user_ref.get()
+        principal_cache.record_lookup(time.perf_counter() - started)
         if not user.exists:
             raise credentials_exception
         
         user_data = user.to_dict()
         user_data['id'] = user_id
+        principal_cache.put(user_id, token.credentials, user_data, generation, payload.get("exp"))
         return user_data
 
     except jwt.PyJWTError:
@@ -85,7 +107,7 @@ async def create_user_in_firestore(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     user_ref = db.collection('it_users').document(user_data.uid) # Changed to it_users
-    if user_ref.get().exists:
+    if (await user_ref.get()).exists:
         raise HTTPException(status_code=400, detail="User already exists in Firestore")
 
     user_dict = {
@@ -97,19 +119,19 @@ async def create_user_in_firestore(
         "created_at": datetime.utcnow()
     }
 
-    user_ref.set(user_dict)
+    await user_ref.set(user_dict)
 
     # Set custom claims for role-based access
     # firebase_admin.auth.set_custom_user_claims(user_data.uid, {'role': user_data.role}) # This is for Firebase Auth, not Firestore
 
-    created_user = user_ref.get()
+    created_user = await user_ref.get()
     response = created_user.to_dict()
     response['id'] = created_user.id
     return response
 
 @router.post("/login", response_model=Token)
 async def login_for_access_token(form_data: LoginRequest, db = Depends(get_firestore_db)):
-    user_ref = db.collection('it_users').where('email', '==', form_data.email).limit(1).get()
+    user_ref = await db.collection('it_users').where('email', '==', form_data.email).limit(1).get()
     if not user_ref:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -120,18 +142,35 @@ async def login_for_access_token(form_data: LoginRequest, db = Depends(get_fires
     user_data = user_doc.to_dict()
     hashed_password = user_data.get("password")
 
-    if not hashed_password or not pwd_context.verify(form_data.password, hashed_password):
+    verified, new_hash = False, None
+    if hashed_password:
+        try:
+            verified, new_hash = await password_hasher.verify_and_update(form_data.password, hashed_password)
+        except HashingPoolBusy:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many logins in progress, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    if new_hash:
+        # Stored with an outdated cost; upgrade while we have the plain password
+        try:
+            await user_doc.reference.update({"password": new_hash})
+        except Exception:
+            logger.exception("Failed to rehash password for user %s", user_doc.id)
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user_data["email"], "id": user_doc.id, "role": user_data["role"]},
-        expires_delta=access_token_expires
-    )
+    claims = {"sub": user_data["email"], "id": user_doc.id, "role": user_data["role"]}
+    access_token = create_access_token(data=claims, expires_delta=access_token_expires)
+    refresh_token = await issue_refresh_token(db, user_doc.id, claims)
     
     # Construct UserResponse object with all required fields
     user_response_data = {
@@ -144,7 +183,40 @@ async def login_for_access_token(form_data: LoginRequest, db = Depends(get_fires
         "created_at": user_data.get("created_at", datetime.utcnow()), # Default to now if not present
     }
     
-    return {"access_token": access_token, "token_type": "bearer", "user": user_response_data}
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": user_response_data,
+        "refresh_token": refresh_token,
+    }
+
+@router.post("/refresh", response_model=RefreshedToken)
+async def refresh_access_token(request: RefreshRequest, db = Depends(get_firestore_db)):
+    # A signature check and one token lookup; no password hashing involved
+    try:
+        refresh_token, claims = await rotate_refresh_token(db, request.refresh_token)
+    except InvalidRefreshToken as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    access_token = create_access_token(
+        data=claims,
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+@router.post("/logout")
+async def logout(request: RefreshRequest, db = Depends(get_firestore_db)):
+    # Revokes the session the token belongs to; other devices stay signed in
+    try:
+        payload = decode_refresh_token(request.refresh_token)
+    except InvalidRefreshToken:
+        return {"message": "Logged out"}
+    await revoke_family(db, payload['fam'])
+    return {"message": "Logged out"}
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user: dict = Depends(get_current_user)):
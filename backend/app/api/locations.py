@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from typing import List, Optional
+from app.core.conditional import conditional_response, representation_cache
 from app.core.firebase import get_firestore_db
 from app.api.auth import get_current_user
+from app.services.reference_cache import reference_cache
+from app.services.counters import stage_increments
+from app.services.repository import AssetRecord, LocationRecord
 from pydantic import BaseModel
 from datetime import datetime
 from enum import Enum
@@ -22,21 +26,24 @@ class LocationResponse(BaseModel):
 
 @router.get("/", response_model=List[LocationResponse])
 async def get_locations(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     db = Depends(get_firestore_db),
     current_user: dict = Depends(get_current_user)
 ):
-    locations_ref = db.collection('locations')
-    all_locations = locations_ref.stream()
-    
-    locations_list = []
-    for loc in all_locations:
-        loc_dict = loc.to_dict()
-        loc_dict['id'] = loc.id
-        locations_list.append(loc_dict)
-
-    return locations_list[skip:skip+limit]
+    # Same document ID order Firestore streams them in, encoded once per change
+    await reference_cache.ensure_loaded(db, ['locations'])
+    representation = representation_cache.get(
+        ('locations', skip, limit),
+        reference_cache.collection_generation('locations'),
+        List[LocationResponse],
+        lambda: [
+            {**location, 'id': location_id}
+            for location_id, location in sorted(reference_cache.all('locations').items())
+        ][skip:skip + limit],
+    )
+    return conditional_response(request, representation)
 
 @router.get("/{location_id}", response_model=LocationResponse)
 async def get_location(
@@ -45,13 +52,11 @@ async def get_location(
     current_user: dict = Depends(get_current_user)
 ):
     location_ref = db.collection('locations').document(location_id)
-    location = location_ref.get()
+    location = await location_ref.get()
     if not location.exists:
         raise HTTPException(status_code=404, detail="Location not found")
     
-    response = location.to_dict()
-    response['id'] = location.id
-    return response
+    return LocationRecord.from_snapshot(location).to_dict()
 
 @router.post("/", response_model=LocationResponse)
 async def create_location(
@@ -65,12 +70,15 @@ async def create_location(
     location_dict = location_data.dict()
     location_dict['created_at'] = datetime.utcnow()
 
-    update_time, location_ref = db.collection('locations').add(location_dict)
+    location_ref = db.collection('locations').document()
+    batch = db.batch()
+    batch.set(location_ref, location_dict)
+    stage_increments(batch, db, {'locations_total': 1})
+    await batch.commit()
 
-    created_location = location_ref.get()
-    response = created_location.to_dict()
-    response['id'] = created_location.id
-    return response
+    created_location = await location_ref.get()
+    reference_cache.upsert('locations', created_location.id, created_location.to_dict())
+    return LocationRecord.from_snapshot(created_location).to_dict()
 
 @router.put("/{location_id}", response_model=LocationResponse)
 async def update_location(
@@ -83,17 +91,16 @@ async def update_location(
         raise HTTPException(status_code=403, detail="Not authorized to update locations")
 
     location_ref = db.collection('locations').document(location_id)
-    location = location_ref.get()
+    location = await location_ref.get()
     if not location.exists:
         raise HTTPException(status_code=404, detail="Location not found")
 
     update_data = location_data.dict(exclude_unset=True)
-    location_ref.update(update_data)
+    await location_ref.update(update_data)
 
-    updated_location = location_ref.get()
-    response = updated_location.to_dict()
-    response['id'] = updated_location.id
-    return response
+    updated_location = await location_ref.get()
+    reference_cache.upsert('locations', location_id, updated_location.to_dict())
+    return LocationRecord.from_snapshot(updated_location).to_dict()
 
 @router.delete("/{location_id}")
 async def delete_location(
@@ -105,20 +112,24 @@ async def delete_location(
         raise HTTPException(status_code=403, detail="Not authorized to delete locations")
 
     location_ref = db.collection('locations').document(location_id)
-    location = location_ref.get()
+    location = await location_ref.get()
     if not location.exists:
         raise HTTPException(status_code=404, detail="Location not found")
 
     # Check if location has assets
     assets_ref = db.collection('assets').where('location_id', '==', location_id).limit(1)
-    assets = assets_ref.get()
+    assets = await assets_ref.get()
     if assets:
         raise HTTPException(
             status_code=400,
             detail=f"Cannot delete location. Assets are assigned to this location."
         )
 
-    location_ref.delete()
+    batch = db.batch()
+    batch.delete(location_ref)
+    stage_increments(batch, db, {'locations_total': -1})
+    await batch.commit()
+    reference_cache.remove('locations', location_id)
     return {"message": "Location deleted successfully"}
 
 @router.get("/{location_id}/assets")
@@ -128,18 +139,14 @@ async def get_location_assets(
     current_user: dict = Depends(get_current_user)
 ):
     location_ref = db.collection('locations').document(location_id)
-    location = location_ref.get()
+    location = await location_ref.get()
     if not location.exists:
         raise HTTPException(status_code=404, detail="Location not found")
 
     assets_ref = db.collection('assets').where('location_id', '==', location_id)
     all_assets = assets_ref.stream()
 
-    assets_list = []
-    for asset in all_assets:
-        asset_dict = asset.to_dict()
-        asset_dict['id'] = asset.id
-        assets_list.append(asset_dict)
+    assets_list = [AssetRecord.from_snapshot(asset).to_dict() async for asset in all_assets]
 
     location_data = location.to_dict()
     return {
@@ -1,25 +1,52 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import List, Optional
 from app.core.firebase import get_firestore_db
+from app.core.responses import fast_response
 from app.api.auth import get_current_user
 from pydantic import BaseModel
 from datetime import datetime
-from google.cloud.firestore_v1.document import DocumentReference
+from google.cloud.firestore_v1.base_document import BaseDocumentReference
 from google.cloud.firestore_v1 import Query as FirestoreQuery
 from app.api.assets import _get_populated_assets
+from app.services.loader import DocumentLoader, get_document_loader
+from app.services.user_locations import location_deltas, stage_deltas
+from app.services.counters import stage_increments, transfer_deltas
+from app.services.generations import data_generations
+from app.services.repository import TransferRecord
+import asyncio
 
 router = APIRouter()
 
-def convert_doc_refs(data):
-    if isinstance(data, dict):
-        for key, value in data.items():
-            data[key] = convert_doc_refs(value)
-    elif isinstance(data, list):
-        for i, item in enumerate(data):
-            data[i] = convert_doc_refs(item)
-    elif isinstance(data, DocumentReference):
-        return data.id
-    return data
+# (response key, transfer field holding the document ID, collection)
+_TRANSFER_RELATIONS = (
+    ('requester', 'requester_id', 'users'),
+    ('approver', 'approver_id', 'users'),
+    ('from_user', 'from_user_id', 'users'),
+    ('to_user', 'to_user_id', 'users'),
+    ('from_location', 'from_location_id', 'locations'),
+    ('to_location', 'to_location_id', 'locations'),
+)
+
+async def _load_transfer_relations(transfer: TransferRecord, loader: DocumentLoader) -> dict:
+    """Resolve the asset, users and locations a transfer points at.
+
+    All lookups go through the request's loader, so hydrating a page of
+    transfers concurrently costs one batched read per level of nesting,
+    and transfers naming the same user or location share its dict.
+    """
+    asset_doc, *related = await asyncio.gather(
+        loader.load('assets', transfer.asset_id),
+        *(loader.load(collection, getattr(transfer, id_field)) for _, id_field, collection in _TRANSFER_RELATIONS)
+    )
+    relations = {
+        name: loader.data(collection, snapshot)
+        for (name, _, collection), snapshot in zip(_TRANSFER_RELATIONS, related)
+    }
+    relations['asset'] = None
+    if asset_doc is not None:
+        populated_asset = await _get_populated_assets([asset_doc], loader)
+        relations['asset'] = populated_asset[0]
+    return relations
 
 # Pydantic models
 class TransferCreate(BaseModel):
@@ -66,6 +93,7 @@ async def get_transfers(
     status: Optional[str] = None,
     asset_id: Optional[str] = None,
     db = Depends(get_firestore_db),
+    loader: DocumentLoader = Depends(get_document_loader),
     current_user: dict = Depends(get_current_user)
 ):
     transfers_ref = db.collection('transfers')
@@ -80,155 +108,34 @@ async def get_transfers(
         query = query.where('asset_id', '==', asset_id)
     
     # Get all transfers first, then sort in Python to avoid index requirement
-    all_transfers_docs = list(query.stream())
-    all_transfers_docs.sort(key=lambda x: x.to_dict().get('requested_at', datetime.min), reverse=True)
-
-    transfers_list = []
-    for doc in all_transfers_docs:
-        transfer_data = doc.to_dict()
-        
-        asset = None
-        if transfer_data.get('asset_id'):
-            asset_ref = db.collection('assets').document(transfer_data['asset_id'])
-            asset_doc = asset_ref.get()
-            if asset_doc.exists:
-                populated_asset = await _get_populated_assets([asset_doc], db)
-                asset = populated_asset[0]
-
-        requester = None
-        if transfer_data.get('requester_id'):
-            requester_ref = db.collection('users').document(transfer_data['requester_id'])
-            requester_doc = requester_ref.get()
-            if requester_doc.exists:
-                requester = requester_doc.to_dict()
-
-        approver = None
-        if transfer_data.get('approver_id'):
-            approver_ref = db.collection('users').document(transfer_data['approver_id'])
-            approver_doc = approver_ref.get()
-            if approver_doc.exists:
-                approver = approver_doc.to_dict()
-
-        from_user = None
-        if transfer_data.get('from_user_id'):
-            from_user_ref = db.collection('users').document(transfer_data['from_user_id'])
-            from_user_doc = from_user_ref.get()
-            if from_user_doc.exists:
-                from_user = from_user_doc.to_dict()
-
-        to_user = None
-        if transfer_data.get('to_user_id'):
-            to_user_ref = db.collection('users').document(transfer_data['to_user_id'])
-            to_user_doc = to_user_ref.get()
-            if to_user_doc.exists:
-                to_user = to_user_doc.to_dict()
-
-        from_location = None
-        if transfer_data.get('from_location_id'):
-            from_location_ref = db.collection('locations').document(transfer_data['from_location_id'])
-            from_location_doc = from_location_ref.get()
-            if from_location_doc.exists:
-                from_location = from_location_doc.to_dict()
-
-        to_location = None
-        if transfer_data.get('to_location_id'):
-            to_location_ref = db.collection('locations').document(transfer_data['to_location_id'])
-            to_location_doc = to_location_ref.get()
-            if to_location_doc.exists:
-                to_location = to_location_doc.to_dict()
-
-        response_item = {
-            "id": doc.id,
-            "status": transfer_data.get("status"),
-            "reason": transfer_data.get("reason"),
-            "requested_at": transfer_data.get("requested_at"),
-            "approved_at": transfer_data.get("approved_at"),
-            "completed_at": transfer_data.get("completed_at"),
-            "asset": asset,
-            "requester": requester,
-            "approver": approver,
-            "from_user": from_user,
-            "to_user": to_user,
-            "from_location": from_location,
-            "to_location": to_location,
-            "asset_id": transfer_data.get("asset_id"),
-            "assigned_to_id": transfer_data.get("assigned_to_id"),
-            "from_location_id": transfer_data.get("from_location_id"),
-            "from_user_id": transfer_data.get("from_user_id"),
-            "requester_id": transfer_data.get("requester_id"),
-            "to_location_id": transfer_data.get("to_location_id"),
-            "to_user_id": transfer_data.get("to_user_id"),
-            "damage_report": transfer_data.get("damage_report"),
-            "photo_url": transfer_data.get("photo_url"),
-        }
+    all_transfers = [TransferRecord.from_snapshot(doc) async for doc in query.stream()]
+    all_transfers.sort(key=lambda transfer: transfer.requested_at or datetime.min, reverse=True)
 
-        transfers_list.append(response_item)
+    # Only the requested page is hydrated
+    page = all_transfers[skip:skip+limit]
+    page_relations = await asyncio.gather(*(_load_transfer_relations(transfer, loader) for transfer in page))
+    transfers_list = [transfer.to_response(relations) for transfer, relations in zip(page, page_relations)]
 
-    return transfers_list[skip:skip+limit]
+    return fast_response(List[TransferResponse], transfers_list)
 
 @router.get("/{transfer_id}", response_model=TransferResponse)
 async def get_transfer(
     transfer_id: str,
     db = Depends(get_firestore_db),
+    loader: DocumentLoader = Depends(get_document_loader),
     current_user: dict = Depends(get_current_user)
 ):
     transfer_ref = db.collection('transfers').document(transfer_id)
-    transfer = transfer_ref.get()
-    if not transfer.exists:
+    snapshot = await transfer_ref.get()
+    if not snapshot.exists:
         raise HTTPException(status_code=404, detail="Transfer not found")
     
-    transfer_data = transfer.to_dict()
+    transfer = TransferRecord.from_snapshot(snapshot)
     # Check permissions
-    if current_user.get("role") != "admin" and transfer_data.get("requester_id") != current_user.get("uid"):
+    if current_user.get("role") != "admin" and transfer.requester_id != current_user.get("uid"):
         raise HTTPException(status_code=403, detail="Not authorized to view this transfer")
-    
-    response = convert_doc_refs(transfer_data)
-    response['id'] = transfer.id
-
-    if response.get('asset_id'):
-        asset_ref = db.collection('assets').document(response['asset_id'])
-        asset_doc = asset_ref.get()
-        if asset_doc.exists:
-            populated_asset = await _get_populated_assets([asset_doc], db)
-            response['asset'] = populated_asset[0]
-
-    if response.get('requester_id'):
-        requester_ref = db.collection('users').document(response['requester_id'])
-        requester_doc = requester_ref.get()
-        if requester_doc.exists:
-            response['requester'] = requester_doc.to_dict()
-
-    if response.get('approver_id'):
-        approver_ref = db.collection('users').document(response['approver_id'])
-        approver_doc = approver_ref.get()
-        if approver_doc.exists:
-            response['approver'] = approver_doc.to_dict()
-
-    if response.get('from_user_id'):
-        from_user_ref = db.collection('users').document(response['from_user_id'])
-        from_user_doc = from_user_ref.get()
-        if from_user_doc.exists:
-            response['from_user'] = from_user_doc.to_dict()
-
-    if response.get('to_user_id'):
-        to_user_ref = db.collection('users').document(response['to_user_id'])
-        to_user_doc = to_user_ref.get()
-        if to_user_doc.exists:
-            response['to_user'] = to_user_doc.to_dict()
-
-    if response.get('from_location_id'):
-        from_location_ref = db.collection('locations').document(response['from_location_id'])
-        from_location_doc = from_location_ref.get()
-        if from_location_doc.exists:
-            response['from_location'] = from_location_doc.to_dict()
-
-    if response.get('to_location_id'):
-        to_location_ref = db.collection('locations').document(response['to_location_id'])
-        to_location_doc = to_location_ref.get()
-        if to_location_doc.exists:
-            response['to_location'] = to_location_doc.to_dict()
 
-    return response
+    return transfer.to_response(await _load_transfer_relations(transfer, loader))
 
 @router.post("/", response_model=TransferResponse)
 async def create_transfer_request(
@@ -237,7 +144,7 @@ async def create_transfer_request(
     current_user: dict = Depends(get_current_user)
 ):
     asset_ref = db.collection('assets').document(transfer_data.asset_id)
-    asset = asset_ref.get()
+    asset = await asset_ref.get()
     if not asset.exists:
         raise HTTPException(status_code=404, detail="Asset not found")
     
@@ -257,7 +164,7 @@ async def create_transfer_request(
     # Get from_user_id from asset
     from_user_ref = asset_data.get('user')
     assigned_user_id = asset_data.get('assigned_user_id')
-    if from_user_ref and isinstance(from_user_ref, DocumentReference):
+    if from_user_ref and isinstance(from_user_ref, BaseDocumentReference):
         transfer_dict['from_user_id'] = from_user_ref.id
     elif assigned_user_id:
         transfer_dict['from_user_id'] = assigned_user_id
@@ -267,7 +174,7 @@ async def create_transfer_request(
     # Get from_location_id from asset
     from_location_ref = asset_data.get('location')
     location_id = asset_data.get('location_id')
-    if from_location_ref and isinstance(from_location_ref, DocumentReference):
+    if from_location_ref and isinstance(from_location_ref, BaseDocumentReference):
         transfer_dict['from_location_id'] = from_location_ref.id
     elif location_id:
         transfer_dict['from_location_id'] = location_id
@@ -277,21 +184,14 @@ async def create_transfer_request(
     transfer_dict['status'] = "PENDING"
     transfer_dict['requested_at'] = datetime.utcnow()
 
-    update_time, transfer_ref = db.collection('transfers').add(transfer_dict)
+    transfer_ref = db.collection('transfers').document()
+    batch = db.batch()
+    batch.set(transfer_ref, transfer_dict)
+    stage_increments(batch, db, transfer_deltas(None, transfer_dict['status']))
+    await batch.commit()
 
-    created_transfer = transfer_ref.get()
-    response = convert_doc_refs(created_transfer.to_dict())
-    response['id'] = created_transfer.id
-    response.setdefault('asset', None)
-    response.setdefault('requester', None)
-    response.setdefault('approver', None)
-    response.setdefault('from_user', None)
-    response.setdefault('to_user', None)
-    response.setdefault('from_location', None)
-    response.setdefault('to_location', None)
-    response.setdefault('approved_at', None)
-    response.setdefault('completed_at', None)
-    return response
+    created_transfer = await transfer_ref.get()
+    return TransferRecord.from_snapshot(created_transfer).to_dict()
 
 @router.put("/{transfer_id}", response_model=TransferResponse)
 async def update_transfer(
@@ -305,12 +205,14 @@ async def update_transfer(
         raise HTTPException(status_code=403, detail="Not authorized to update transfers")
     
     transfer_ref = db.collection('transfers').document(transfer_id)
-    transfer = transfer_ref.get()
+    transfer = await transfer_ref.get()
     if not transfer.exists:
         raise HTTPException(status_code=404, detail="Transfer not found")
     
     update_data = transfer_data.dict(exclude_unset=True)
     update_data['approver_id'] = current_user.get("uid")
+    # Asset reassignment, the transfer itself and the dashboard counters commit together
+    batch = db.batch()
 
     if transfer_data.status == "APPROVED":
         update_data['approved_at'] = datetime.utcnow()
@@ -324,7 +226,7 @@ async def update_transfer(
         # Update asset assignment only when completed (after approval)
         transfer_doc = transfer.to_dict()
         asset_ref = db.collection('assets').document(transfer_doc.get('asset_id'))
-        asset = asset_ref.get()
+        asset = await asset_ref.get()
         if asset.exists:
             asset_update = {}
             if transfer_doc.get('to_user_id'):
@@ -332,14 +234,16 @@ async def update_transfer(
             if transfer_doc.get('to_location_id'):
                 asset_update['location_id'] = transfer_doc.get('to_location_id')
             if asset_update:
-                asset_ref.update(asset_update)
+                before = asset.to_dict()
+                batch.update(asset_ref, asset_update)
+                stage_deltas(batch, db, location_deltas(before, {**before, **asset_update}))
     elif transfer_data.status == "APPROVED":
         update_data['approved_at'] = datetime.utcnow()
         
         # Update asset assignment when approved
         transfer_doc = transfer.to_dict()
         asset_ref = db.collection('assets').document(transfer_doc.get('asset_id'))
-        asset = asset_ref.get()
+        asset = await asset_ref.get()
         if asset.exists:
             asset_update = {}
             if transfer_doc.get('to_user_id'):
@@ -347,14 +251,20 @@ async def update_transfer(
             if transfer_doc.get('to_location_id'):
                 asset_update['location_id'] = transfer_doc.get('to_location_id')
             if asset_update:
-                asset_ref.update(asset_update)
+                before = asset.to_dict()
+                batch.update(asset_ref, asset_update)
+                stage_deltas(batch, db, location_deltas(before, {**before, **asset_update}))
 
-    transfer_ref.update(update_data)
+    batch.update(transfer_ref, update_data)
+    previous_status = transfer.to_dict().get('status')
+    stage_increments(batch, db, transfer_deltas(previous_status, update_data.get('status', previous_status)))
+    await batch.commit()
+    if transfer_data.status in ("COMPLETED", "APPROVED"):
+        # The asset's assignment may have moved; drop cached asset list pages
+        data_generations.bump('assets')
 
-    updated_transfer = transfer_ref.get()
-    response = convert_doc_refs(updated_transfer.to_dict())
-    response['id'] = updated_transfer.id
-    return response
+    updated_transfer = await transfer_ref.get()
+    return TransferRecord.from_snapshot(updated_transfer).to_dict()
 
 @router.delete("/{transfer_id}")
 async def delete_transfer(
@@ -366,11 +276,14 @@ async def delete_transfer(
         raise HTTPException(status_code=403, detail="Not authorized to delete transfers")
 
     transfer_ref = db.collection('transfers').document(transfer_id)
-    transfer = transfer_ref.get()
+    transfer = await transfer_ref.get()
     if not transfer.exists:
         raise HTTPException(status_code=404, detail="Transfer not found")
 
-    transfer_ref.delete()
+    batch = db.batch()
+    batch.delete(transfer_ref)
+    stage_increments(batch, db, transfer_deltas(transfer.to_dict().get('status'), None))
+    await batch.commit()
     return {"message": "Transfer deleted successfully"}
 
 @router.get("/pending/count")
@@ -382,6 +295,6 @@ async def get_pending_transfers_count(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     transfers_ref = db.collection('transfers').where('status', '==', 'PENDING')
-    transfers = transfers_ref.get()
+    transfers = await transfers_ref.get()
     
     return {"pending_count": len(transfers)}
@@ -1,10 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
 from app.core.firebase import get_firestore_db
+from app.core.responses import fast_response
 from app.api.auth import get_current_user
+from app.services.reference_cache import reference_cache
+from app.core.security import HashingPoolBusy, password_hasher, principal_cache
+from app.services.refresh_tokens import revoke_user_tokens
+from app.services.loader import DocumentLoader, get_document_loader
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from collections import Counter
+from app.services.user_locations import USER_LOCATION_STATS, primary_location_id
+from app.services.counters import stage_increments
+from app.services.repository import AssetRecord, UserRecord
 
 router = APIRouter()
 
@@ -43,6 +50,7 @@ async def get_users(
     limit: int = Query(100, ge=1, le=1000),
     is_active: Optional[bool] = None,
     db = Depends(get_firestore_db),
+    loader: DocumentLoader = Depends(get_document_loader),
     current_user: dict = Depends(get_current_user)
 ):
     if current_user.get("role") not in ["admin", "regular"]:
@@ -54,89 +62,33 @@ async def get_users(
     if is_active is not None:
         query = query.where('is_active', '==', is_active)
     
-    all_users = query.stream()
-    
-    # Get all assets to calculate user locations
-    assets_ref = db.collection('assets')
-    all_assets = assets_ref.stream()
-    
-    # Build user location mapping based on assigned assets
-    user_locations = {}
-    location_cache = {}  # Cache for location documents
-    
-    for asset_doc in all_assets:
-        asset = asset_doc.to_dict()
-        
-        # Get user identifier from asset
-        user_ref = asset.get('user')
-        assigned_user_id = asset.get('assigned_user_id')
-        
-        user_identifier = None
-        if user_ref and hasattr(user_ref, 'id'):
-            user_identifier = user_ref.id
-        elif assigned_user_id:
-            user_identifier = assigned_user_id
-        
-        # Get location from asset
-        location_ref = asset.get('location')
-        location_id = asset.get('location_id')
-        
-        if user_identifier and (location_ref or location_id):
-            # Get location ID
-            loc_id = None
-            if location_ref and hasattr(location_ref, 'id'):
-                loc_id = location_ref.id
-            elif location_id:
-                loc_id = location_id
-            
-            if loc_id:
-                # Cache location data if not already cached
-                if loc_id not in location_cache:
-                    try:
-                        location_doc = db.collection('locations').document(loc_id).get()
-                        if location_doc.exists:
-                            location_data = location_doc.to_dict()
-                            location_cache[loc_id] = {
-                                "id": loc_id,
-                                "name": location_data.get('name', 'Unknown Location')
-                            }
-                        else:
-                            location_cache[loc_id] = None
-                    except:
-                        location_cache[loc_id] = None
-                
-                # Add location to user's location list
-                if user_identifier not in user_locations:
-                    user_locations[user_identifier] = []
-                
-                if location_cache[loc_id]:
-                    user_locations[user_identifier].append(location_cache[loc_id])
-    
+    # Only the requested page is read; each user's primary location comes
+    # from their maintained location histogram instead of an assets scan.
+    page_users = [user async for user in query.offset(skip).limit(limit).stream()]
+    histograms = await loader.load_many(USER_LOCATION_STATS, [user.id for user in page_users])
+
+    location_ids = list({
+        location_id
+        for histogram in histograms if histogram is not None
+        for location_id in (histogram.to_dict().get('counts') or {})
+    })
+    location_docs = await loader.load_many('locations', location_ids)
+    locations = {
+        loc_id: {"id": loc_id, "name": location_doc.to_dict().get('name', 'Unknown Location')}
+        for loc_id, location_doc in zip(location_ids, location_docs) if location_doc
+    }
+
     users_list = []
-    for user in all_users:
-        user_dict = user.to_dict()
-        user_dict['id'] = user.id
-        
-        # Calculate user's primary location based on assigned assets
-        location = None
-        if user.id in user_locations and user_locations[user.id]:
-            # Count occurrences of each location
-            location_names = [loc['name'] for loc in user_locations[user.id]]
-            if location_names:
-                # Get the most common location
-                most_common = Counter(location_names).most_common(1)[0]
-                primary_location_name = most_common[0]
-                
-                # Find the location object for the most common location
-                for loc in user_locations[user.id]:
-                    if loc['name'] == primary_location_name:
-                        location = loc
-                        break
-        
-        user_dict['location'] = location
+    for user, histogram in zip(page_users, histograms):
+        user_dict = UserRecord.from_snapshot(user).to_dict()
+
+        # Primary location: where most of the user's assigned assets are
+        counts = histogram.to_dict().get('counts') if histogram is not None else None
+        location_id = primary_location_id(counts, exists=lambda loc_id: loc_id in locations)
+        user_dict['location'] = locations.get(location_id) if location_id else None
         users_list.append(user_dict)
 
-    return users_list[skip:skip+limit]
+    return fast_response(List[UserResponse], users_list)
 
 @router.post("/", response_model=UserResponse)
 async def create_user(
@@ -148,19 +100,21 @@ async def create_user(
         raise HTTPException(status_code=403, detail="Not authorized to create users")
 
     # Check in both collections for existing email
-    existing_user_it = db.collection('it_users').where('email', '==', user_data.email).limit(1).get()
-    existing_user_regular = db.collection('users').where('email', '==', user_data.email).limit(1).get()
+    existing_user_it = await db.collection('it_users').where('email', '==', user_data.email).limit(1).get()
+    existing_user_regular = await db.collection('users').where('email', '==', user_data.email).limit(1).get()
     
     if existing_user_it or existing_user_regular:
         raise HTTPException(status_code=400, detail="Email already exists")
 
-    from passlib.context import CryptContext
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    try:
+        hashed_password = await password_hasher.hash(user_data.password)
+    except HashingPoolBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
     
     user_dict = {
         'name': user_data.name,
         'email': user_data.email,
-        'password': pwd_context.hash(user_data.password),
+        'password': hashed_password,
         'role': user_data.role,
         'location_id': user_data.location_id,
         'created_at': datetime.utcnow(),
@@ -169,18 +123,20 @@ async def create_user(
     }
 
     # Add to it_users collection for authentication
-    update_time, user_ref = db.collection('it_users').add(user_dict)
+    user_ref = db.collection('it_users').document()
+    batch = db.batch()
+    batch.set(user_ref, user_dict)
     
     # Also add to users collection for compatibility
     user_dict_copy = user_dict.copy()
     user_dict_copy.pop('password', None)  # Don't store password in users collection
-    db.collection('users').document(user_ref.id).set(user_dict_copy)
+    batch.set(db.collection('users').document(user_ref.id), user_dict_copy)
+    stage_increments(batch, db, {'users_total': 1})
+    await batch.commit()
+    reference_cache.upsert('users', user_ref.id, user_dict_copy)
 
-    created_user = user_ref.get()
-    response = created_user.to_dict()
-    response['id'] = created_user.id
-    response.pop('password', None)  # Don't return password
-    return response
+    created_user = await user_ref.get()
+    return UserRecord.from_snapshot(created_user).to_dict()
 
 
 @router.get("/{user_id}", response_model=UserResponse)
@@ -194,13 +150,11 @@ async def get_user(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     user_ref = db.collection('users').document(user_id)
-    user = user_ref.get()
+    user = await user_ref.get()
     if not user.exists:
         raise HTTPException(status_code=404, detail="User not found")
     
-    response = user.to_dict()
-    response['id'] = user.id
-    return response
+    return UserRecord.from_snapshot(user).to_dict()
 
 @router.put("/{user_id}", response_model=UserResponse)
 async def update_user(
@@ -213,23 +167,26 @@ async def update_user(
         raise HTTPException(status_code=403, detail="Not authorized to update users")
 
     user_ref = db.collection('users').document(user_id)
-    user = user_ref.get()
+    user = await user_ref.get()
     if not user.exists:
         raise HTTPException(status_code=404, detail="User not found")
 
     update_data = user_data.dict(exclude_unset=True)
 
     if 'email' in update_data and update_data['email'] != user.to_dict().get('email'):
-        existing_user = db.collection('users').where('email', '==', update_data['email']).limit(1).get()
+        existing_user = await db.collection('users').where('email', '==', update_data['email']).limit(1).get()
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already exists")
 
-    user_ref.update(update_data)
+    await user_ref.update(update_data)
 
-    updated_user = user_ref.get()
-    response = updated_user.to_dict()
-    response['id'] = updated_user.id
-    return response
+    updated_user = await user_ref.get()
+    reference_cache.upsert('users', user_id, updated_user.to_dict())
+    # Deactivation or a role change must not wait out a cached principal
+    principal_cache.invalidate_user(user_id)
+    if update_data.get('is_active') is False:
+        await revoke_user_tokens(db, user_id)
+    return UserRecord.from_snapshot(updated_user).to_dict()
 
 @router.delete("/{user_id}")
 async def delete_user(
@@ -241,20 +198,27 @@ async def delete_user(
         raise HTTPException(status_code=403, detail="Not authorized to delete users")
 
     user_ref = db.collection('users').document(user_id)
-    user = user_ref.get()
+    user = await user_ref.get()
     if not user.exists:
         raise HTTPException(status_code=404, detail="User not found")
 
     # Check if user has assets
     assets_ref = db.collection('assets').where('assigned_user_id', '==', user_id).limit(1)
-    assets = assets_ref.get()
+    assets = await assets_ref.get()
     if assets:
         raise HTTPException(
             status_code=400,
             detail=f"Cannot delete user. Assets are assigned to this user."
         )
 
-    user_ref.delete()
+    batch = db.batch()
+    batch.delete(user_ref)
+    batch.delete(db.collection(USER_LOCATION_STATS).document(user_id))
+    stage_increments(batch, db, {'users_total': -1})
+    await batch.commit()
+    reference_cache.remove('users', user_id)
+    principal_cache.invalidate_user(user_id)
+    await revoke_user_tokens(db, user_id)
     return {"message": "User deleted successfully"}
 
 @router.get("/{user_id}/assets")
@@ -268,18 +232,14 @@ async def get_user_assets(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     user_ref = db.collection('users').document(user_id)
-    user = user_ref.get()
+    user = await user_ref.get()
     if not user.exists:
         raise HTTPException(status_code=404, detail="User not found")
 
     assets_ref = db.collection('assets').where('assigned_user_id', '==', user_id)
     all_assets = assets_ref.stream()
 
-    assets_list = []
-    for asset in all_assets:
-        asset_dict = asset.to_dict()
-        asset_dict['id'] = asset.id
-        assets_list.append(asset_dict)
+    assets_list = [AssetRecord.from_snapshot(asset).to_dict() async for asset in all_assets]
 
     user_data = user.to_dict()
     return {
@@ -0,0 +1,114 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+# Bodies smaller than this are sent uncompressed
+GZIP_MIN_SIZE = 512
+
+
+class Representation:
+    """One encoded response body, its gzip form and their strong ETags."""
+
+    __slots__ = ('body', 'gzip_body', 'etag', 'gzip_etag')
+
+    def __init__(self, body: bytes):
+        self.body = body
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        # A different content-coding is a different representation, so it
+        # gets its own strong validator
+        self.gzip_body = gzip.compress(body, compresslevel=6, mtime=0) if len(body) >= GZIP_MIN_SIZE else None
+        self.gzip_etag = f'"{digest}-gz"'
+
+
+def _accepts_gzip(request: Request) -> bool:
+    for coding in request.headers.get('accept-encoding', '').split(','):
+        name, _, params = coding.strip().partition(';')
+        if name.strip().lower() in ('gzip', '*'):
+            return params.replace(' ', '').lower() not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def _not_modified(request: Request, representation: Representation) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # If-None-Match uses the weak comparison, and either coding of the same body matches
+    tags = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return representation.etag in tags or representation.gzip_etag in tags
+
+
+def conditional_response(request: Request, representation: Representation) -> Response:
+    """200 with the body (gzipped if accepted), or 304 if the client's copy is current."""
+    use_gzip = representation.gzip_body is not None and _accepts_gzip(request)
+    headers = {
+        'ETag': representation.gzip_etag if use_gzip else representation.etag,
+        # Clients may keep the body but must revalidate it, which is what makes 304s possible
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding',
+    }
+    if _not_modified(request, representation):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers['Content-Encoding'] = 'gzip'
+        return Response(representation.gzip_body, media_type='application/json', headers=headers)
+    return Response(representation.body, media_type='application/json', headers=headers)
+
+
+class RepresentationCache:
+    """Encoded bodies of rarely changing list responses, rebuilt when their data version moves.
+
+    Entries are keyed by endpoint and variant (e.g. a skip/limit pair) and
+    hold the version they were built from, typically a reference cache
+    collection generation. A request for the current version is answered
+    from memory without encoding, and with its ETag, without a body.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Representation]]" = OrderedDict()
+        self._adapters: Dict[Any, TypeAdapter] = {}
+        self._stats = {'hits': 0, 'builds': 0}
+
+    def _adapter(self, response_type: Any) -> TypeAdapter:
+        adapter = self._adapters.get(response_type)
+        if adapter is None:
+            adapter = self._adapters[response_type] = TypeAdapter(response_type)
+        return adapter
+
+    def get(self, key: Hashable, version: Any, response_type: Any,
+            build: Callable[[], Any]) -> Representation:
+        """The representation of `build()` validated as `response_type`, at `version`."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[1]
+
+        # Same validation and JSON encoding FastAPI applies for response_model
+        adapter = self._adapter(response_type)
+        representation = Representation(adapter.dump_json(adapter.validate_python(build())))
+        with self._lock:
+            self._stats['builds'] += 1
+            self._entries[key] = (version, representation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return representation
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'entries': len(self._entries)}
+
+
+representation_cache = RepresentationCache()
@@ -1,11 +1,23 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 import os
 
 class Settings(BaseSettings):
     # Firebase
     FIREBASE_SERVICE_ACCOUNT_KEY_PATH: Optional[str] = None
 
+    # Firestore backend: "firestore", or "memory" for the in-process store
+    # used by offline tests and benchmarks, which sleeps this long (plus up to
+    # the jitter, at random) on every round trip
+    FIRESTORE_BACKEND: str = "firestore"
+    MEMORY_FIRESTORE_LATENCY_MS: float = 0
+    MEMORY_FIRESTORE_JITTER_MS: float = 0
+
+    # Startup warmup (Firestore channel, reference data) reported by /ready;
+    # listeners get this long to deliver their first snapshot
+    WARMUP_ON_STARTUP: bool = True
+    WARMUP_TIMEOUT_SECONDS: float = 30
+
     # Database
     DATABASE_URL: str
 
@@ -23,6 +35,38 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-super-secret-key" # CHANGE THIS IN PRODUCTION
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14
+
+    # Principal cache used by get_current_user; 0 entries disables it
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+
+    # Password hashing; stored hashes with a different cost are upgraded on login
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+
+    # Serve large list responses through the prebuilt-serializer/orjson path
+    FAST_JSON_RESPONSES: bool = False
+
+    # Filter categories on the asset_type stored on each asset rather than
+    # through asset_models; run backfill_asset_fields.py before enabling
+    DENORMALIZED_ASSET_FIELDS: bool = False
+
+    # Rewrite the type/make/model copied onto assets when a model is edited.
+    # Every process that enables it repeats each rewrite, so enable it on one
+    # process only; without it, re-run backfill_asset_fields.py after edits
+    ASSET_FIELD_SYNC: bool = False
+
+    # Asset list pages and counts kept per filter signature; 0 disables the cache
+    ASSET_LIST_CACHE_MAX_ENTRIES: int = 512
+
+    # Analytics responses younger than this are served as is; older ones up to
+    # the max stale age are served while refreshed in the background. The
+    # overrides map an endpoint (e.g. "recent-activities") to its own window.
+    ANALYTICS_CACHE_FRESH_SECONDS: int = 60
+    ANALYTICS_CACHE_MAX_STALE_SECONDS: int = 600
+    ANALYTICS_CACHE_FRESH_OVERRIDES: Dict[str, int] = {}
 
     class Config:
         env_file = ".env"
@@ -1,8 +1,36 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
 
+from app.core.metrics import instrument_firestore
+
+# firebase_admin (with google-auth, requests and cryptography behind it) is
+# imported by the functions below, on first use, rather than with the app;
+# the startup warmup makes that first use before traffic arrives.
+
+_memory_store = None
+
+def _use_memory_backend() -> bool:
+    # Imported here so importing this module does not load the app settings
+    from app.core.config import settings
+    return settings.FIRESTORE_BACKEND == "memory"
+
+def get_memory_store():
+    """The in-process store behind both clients when FIRESTORE_BACKEND=memory."""
+    global _memory_store
+    if _memory_store is None:
+        from app.core.config import settings
+        from app.core.memory_firestore import MemoryFirestore
+        _memory_store = MemoryFirestore(
+            latency_ms=settings.MEMORY_FIRESTORE_LATENCY_MS,
+            jitter_ms=settings.MEMORY_FIRESTORE_JITTER_MS,
+        )
+    return _memory_store
+
 def initialize_firebase():
+    if _use_memory_backend():
+        return
+    import firebase_admin
+    from firebase_admin import credentials
+
     service_account_key_path = os.getenv("FIREBASE_SERVICE_ACCOUNT_KEY_PATH")
     if not service_account_key_path:
         raise ValueError("FIREBASE_SERVICE_ACCOUNT_KEY_PATH environment variable not set.")
@@ -18,4 +46,20 @@ def initialize_firebase():
     firebase_admin.initialize_app(cred)
 
 def get_firestore_db():
+    """Async Firestore client used by the API routers.
+
+    All reads and writes made through it must be awaited, so a slow query
+    only suspends its own request instead of the whole uvicorn worker.
+    Its reads and writes are counted per request for /metrics.
+    """
+    if _use_memory_backend():
+        return get_memory_store().async_client()
+    from firebase_admin import firestore_async
+    return instrument_firestore(firestore_async.client())
+
+def get_sync_firestore_db():
+    """Blocking Firestore client for scripts and background threads."""
+    if _use_memory_backend():
+        return get_memory_store().client()
+    from firebase_admin import firestore
     return firestore.client()
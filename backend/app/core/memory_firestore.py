@@ -0,0 +1,899 @@
+"""
+In-process stand-in for Firestore, for offline tests, load tests and profiling.
+
+Implements the part of the Firestore client API this codebase uses, with
+both the async client the routers use and the sync client the snapshot
+listeners use, sharing one store:
+
+- collections, documents and auto IDs; `get`, `set` (with `merge`),
+  `create`, `update` (dotted field paths) and `delete`
+- `where` with every comparison, `in`, `not-in` and `array-contains`
+  operator, `order_by`, `start_at`/`start_after`/`end_at`/`end_before`,
+  `offset`, `limit`, `stream`, `get` and `count()`
+- `get_all`, batches with `write_option` preconditions, and the Increment,
+  ArrayUnion, ArrayRemove, DELETE_FIELD and SERVER_TIMESTAMP transforms
+- `on_snapshot` on collections, delivered on a separate thread like the
+  real watch stream
+
+Queries follow Firestore's semantics where the app can tell the difference:
+type-aware ordering and range filters, documents missing an ordered or
+filtered field left out (and, for `!=` and `not-in`, those holding null
+in it), results in document ID order by default, batches
+applied atomically and limited to 500 writes. Composite indexes are not
+required. Every round trip sleeps for the configured latency and is
+reported to the request metrics like the real client's.
+"""
+import asyncio
+import copy
+import heapq
+import itertools
+import logging
+import math
+import queue
+import random
+import string
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, InvalidArgument, NotFound
+from google.cloud.firestore_v1.base_aggregation import AggregationResult
+from google.cloud.firestore_v1.base_document import BaseDocumentReference, DocumentSnapshot
+from google.cloud.firestore_v1.transforms import (
+    DELETE_FIELD, SERVER_TIMESTAMP, ArrayRemove, ArrayUnion, Increment,
+)
+from google.cloud.firestore_v1.watch import ChangeType, DocumentChange
+
+from app.core.metrics import record_firestore_call
+
+logger = logging.getLogger(__name__)
+
+ASCENDING, DESCENDING = 'ASCENDING', 'DESCENDING'
+
+# Writes Firestore accepts in one commit
+MAX_BATCH_WRITES = 500
+# Firestore bills an aggregation one read per batch of up to this many index entries
+AGGREGATION_ENTRIES_PER_READ = 1000
+
+_AUTO_ID_CHARS = string.ascii_letters + string.digits
+_INEQUALITY_OPS = ('<', '<=', '>', '>=', '!=', 'not-in')
+
+
+class _StoredReference:
+    """A document reference as stored, rebound to the reading client on the way out."""
+    __slots__ = ('path',)
+
+    def __init__(self, path: Tuple[str, ...]):
+        self.path = path
+
+
+class _Document:
+    __slots__ = ('data', 'create_time', 'update_time')
+
+    def __init__(self, data: Dict[str, Any], create_time: datetime, update_time: datetime):
+        self.data = data
+        self.create_time = create_time
+        self.update_time = update_time
+
+
+# Values
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, BaseDocumentReference):
+        return _StoredReference(value._path)
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    if isinstance(value, datetime):
+        # Firestore stores UTC and treats naive datetimes as UTC
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+    return value
+
+
+def _decode(value: Any, client) -> Any:
+    if isinstance(value, _StoredReference):
+        return client.document(*value.path)
+    if isinstance(value, dict):
+        return {key: _decode(item, client) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item, client) for item in value]
+    return value
+
+
+_NULL, _BOOL, _NUMBER, _TIMESTAMP, _STRING, _BYTES, _REFERENCE, _ARRAY, _MAP, _OTHER = range(10)
+
+
+def _order_key(value: Any) -> Tuple:
+    """Firestore's total order across types, for stored (encoded) values."""
+    if value is None:
+        return (_NULL,)
+    if isinstance(value, bool):
+        return (_BOOL, value)
+    if isinstance(value, (int, float)):
+        # NaN sorts before every other number
+        return (_NUMBER, 0, 0) if value != value else (_NUMBER, 1, value)
+    if isinstance(value, datetime):
+        return (_TIMESTAMP, value)
+    if isinstance(value, str):
+        return (_STRING, value)
+    if isinstance(value, bytes):
+        return (_BYTES, value)
+    if isinstance(value, _StoredReference):
+        return (_REFERENCE, value.path)
+    if isinstance(value, list):
+        return (_ARRAY, tuple(_order_key(item) for item in value))
+    if isinstance(value, dict):
+        return (_MAP, tuple((key, _order_key(value[key])) for key in sorted(value)))
+    return (_OTHER, repr(value))
+
+
+def _lookup(data: Dict[str, Any], field_path: str) -> Tuple[bool, Any]:
+    value = data
+    for part in field_path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return False, None
+        value = value[part]
+    return True, value
+
+
+def _auto_id() -> str:
+    return ''.join(random.choices(_AUTO_ID_CHARS, k=20))
+
+
+def _path_of(reference) -> Tuple[str, ...]:
+    return reference._path
+
+
+def _cursor_value(path: str, value: Any) -> Any:
+    if path == '__name__' and isinstance(value, BaseDocumentReference):
+        return value.id
+    return _encode(value)
+
+
+# Writes
+
+class _Precondition:
+    __slots__ = ('last_update_time', 'exists')
+
+    def __init__(self, last_update_time: Optional[datetime] = None, exists: Optional[bool] = None):
+        self.last_update_time = last_update_time
+        self.exists = exists
+
+
+class WriteResult:
+    __slots__ = ('update_time',)
+
+    def __init__(self, update_time: datetime):
+        self.update_time = update_time
+
+
+def _apply_value(target: Dict[str, Any], key: str, value: Any, now: datetime) -> None:
+    if value is DELETE_FIELD:
+        target.pop(key, None)
+    elif value is SERVER_TIMESTAMP:
+        target[key] = now
+    elif isinstance(value, Increment):
+        current = target.get(key)
+        target[key] = (current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0) + value.value
+    elif isinstance(value, ArrayUnion):
+        current = list(target.get(key)) if isinstance(target.get(key), list) else []
+        keys = [_order_key(item) for item in current]
+        for item in _encode(list(value.values)):
+            if _order_key(item) not in keys:
+                current.append(item)
+                keys.append(_order_key(item))
+        target[key] = current
+    elif isinstance(value, ArrayRemove):
+        removed = {_order_key(item) for item in _encode(list(value.values))}
+        current = target.get(key) if isinstance(target.get(key), list) else []
+        target[key] = [item for item in current if _order_key(item) not in removed]
+    else:
+        target[key] = _encode(value)
+
+
+def _merge(target: Dict[str, Any], data: Dict[str, Any], now: datetime) -> None:
+    for key, value in data.items():
+        if isinstance(value, dict):
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            _merge(target[key], value, now)
+        else:
+            _apply_value(target, key, value, now)
+
+
+def _replace(data: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    result: Dict[str, Any] = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            result[key] = _replace(value, now)
+        elif value is not DELETE_FIELD:
+            _apply_value(result, key, value, now)
+    return result
+
+
+def _update(target: Dict[str, Any], field_updates: Dict[str, Any], now: datetime) -> None:
+    for field_path, value in field_updates.items():
+        *parents, last = field_path.split('.')
+        container = target
+        for part in parents:
+            if not isinstance(container.get(part), dict):
+                container[part] = {}
+            container = container[part]
+        if isinstance(value, dict):
+            # update() replaces a map field as a whole
+            container[last] = _replace(value, now)
+        else:
+            _apply_value(container, last, value, now)
+
+
+class _Write:
+    __slots__ = ('kind', 'path', 'data', 'merge', 'option')
+
+    def __init__(self, kind: str, path: Tuple[str, ...], data=None, merge: bool = False,
+                 option: Optional[_Precondition] = None):
+        self.kind = kind
+        self.path = path
+        self.data = data
+        self.merge = merge
+        self.option = option
+
+
+# Store
+
+def _snapshot(client, path: Tuple[str, ...], doc: Optional[_Document], read_time: datetime) -> DocumentSnapshot:
+    reference = client.document(*path)
+    if doc is None:
+        return DocumentSnapshot(reference, None, False, read_time, None, None)
+    return DocumentSnapshot(reference, _decode(doc.data, client), True, read_time,
+                            doc.create_time, doc.update_time)
+
+
+class _DocumentList(Sequence):
+    """A listener's full document list, built only if the listener reads it.
+
+    The app's listeners only look at it in their first snapshot, and building
+    it for every change to a large collection would dominate write latency.
+    """
+
+    def __init__(self, client, collection: Tuple[str, ...], documents: Dict[str, _Document],
+                 read_time: datetime):
+        self._client = client
+        self._collection = collection
+        self._documents = documents
+        self._read_time = read_time
+        self._snapshots: Optional[List[DocumentSnapshot]] = None
+
+    def _materialize(self) -> List[DocumentSnapshot]:
+        if self._snapshots is None:
+            self._snapshots = [
+                _snapshot(self._client, self._collection + (doc_id,), self._documents[doc_id], self._read_time)
+                for doc_id in sorted(self._documents)
+            ]
+        return self._snapshots
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __getitem__(self, index):
+        return self._materialize()[index]
+
+
+class _Watch:
+    """Returned by `on_snapshot`; call `unsubscribe()` to stop the listener."""
+
+    def __init__(self, store: 'MemoryFirestore', collection: str, client, callback: Callable):
+        self._store = store
+        self.collection = collection
+        self.client = client
+        self.callback = callback
+        self.active = True
+
+    def unsubscribe(self) -> None:
+        self.active = False
+        self._store._unwatch(self)
+
+
+class MemoryFirestore:
+    """The shared document store behind any number of memory clients.
+
+    `latency_ms` (plus up to `jitter_ms` at random) is slept on every round
+    trip, by `asyncio.sleep` on the async client and `time.sleep` on the
+    sync one, so concurrency behaves as it does against a remote database.
+    """
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._lock = threading.RLock()
+        self._collections: Dict[Tuple[str, ...], Dict[str, _Document]] = {}
+        self._watches: Dict[Tuple[str, ...], List[_Watch]] = {}
+        self._events: 'queue.Queue' = queue.Queue()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._last_time = datetime.fromtimestamp(0, timezone.utc)
+        # One of each, as firebase_admin does, so references from the same client compare equal
+        self._client = Client(self)
+        self._async_client = AsyncClient(self)
+
+    def client(self) -> 'Client':
+        return self._client
+
+    def async_client(self) -> 'AsyncClient':
+        return self._async_client
+
+    def delay(self) -> float:
+        """Seconds to wait for one round trip."""
+        return (self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000
+
+    def clear(self) -> None:
+        with self._lock:
+            self._collections.clear()
+
+    def wait_for_listeners(self) -> None:
+        """Block until every pending snapshot has been delivered."""
+        self._events.join()
+
+    def _now(self) -> datetime:
+        # Strictly increasing, so update times can serve as preconditions
+        now = max(datetime.now(timezone.utc), self._last_time + timedelta(microseconds=1))
+        self._last_time = now
+        return now
+
+    def _snapshot(self, client, path: Tuple[str, ...], read_time: datetime) -> DocumentSnapshot:
+        return _snapshot(client, path, self._collections.get(path[:-1], {}).get(path[-1]), read_time)
+
+    # Reads
+
+    def get_documents(self, client, paths: List[Tuple[str, ...]]) -> List[DocumentSnapshot]:
+        with self._lock:
+            read_time = self._now()
+            return [self._snapshot(client, path, read_time) for path in paths]
+
+    def run_query(self, client, query: '_Query') -> Tuple[List[DocumentSnapshot], int]:
+        """Matching snapshots, and the reads Firestore would bill for them."""
+        with self._lock:
+            read_time = self._now()
+            matched = query._evaluate(self._collections.get(query._parent, {}))
+            skipped = min(query._offset, len(matched))
+            matched = matched[query._offset:]
+            if query._limit is not None:
+                matched = matched[:query._limit]
+            snapshots = [self._snapshot(client, query._parent + (doc_id,), read_time) for doc_id, _ in matched]
+        # Skipped documents are billed too, and every query at least one read
+        return snapshots, max(1, skipped + len(snapshots))
+
+    def count(self, query: '_Query') -> int:
+        with self._lock:
+            matched = query._evaluate(self._collections.get(query._parent, {}), ordered=False)
+        count = max(0, len(matched) - query._offset)
+        return count if query._limit is None else min(count, query._limit)
+
+    # Writes
+
+    def commit(self, writes: List[_Write]) -> datetime:
+        if len(writes) > MAX_BATCH_WRITES:
+            raise InvalidArgument(f"A batch can contain at most {MAX_BATCH_WRITES} writes")
+        with self._lock:
+            now = self._now()
+            # Applied to copies first, so a failed precondition leaves nothing written
+            staged: Dict[Tuple[str, ...], Optional[_Document]] = {}
+            for write in writes:
+                if write.path in staged:
+                    current = staged[write.path]
+                else:
+                    current = self._collections.get(write.path[:-1], {}).get(write.path[-1])
+                staged[write.path] = self._apply(write, current, now)
+
+            changes: Dict[Tuple[str, ...], List[Tuple[ChangeType, str]]] = {}
+            for path, doc in staged.items():
+                collection = self._collections.setdefault(path[:-1], {})
+                existed = path[-1] in collection
+                if doc is None:
+                    if existed:
+                        del collection[path[-1]]
+                        changes.setdefault(path[:-1], []).append((ChangeType.REMOVED, path[-1]))
+                    continue
+                collection[path[-1]] = doc
+                changes.setdefault(path[:-1], []).append(
+                    (ChangeType.MODIFIED if existed else ChangeType.ADDED, path[-1]))
+            self._publish(changes, now)
+        return now
+
+    def _apply(self, write: _Write, current: Optional[_Document], now: datetime) -> Optional[_Document]:
+        option = write.option
+        if option is not None:
+            if option.exists is not None and option.exists != (current is not None):
+                raise FailedPrecondition(f"Document {'/'.join(write.path)} precondition failed: exists")
+            if option.last_update_time is not None and (
+                    current is None or current.update_time != option.last_update_time):
+                raise FailedPrecondition(f"Document {'/'.join(write.path)} was updated since it was read")
+
+        if write.kind == 'delete':
+            return None
+        if write.kind == 'create' and current is not None:
+            raise AlreadyExists(f"Document already exists: {'/'.join(write.path)}")
+        if write.kind == 'update' and current is None:
+            raise NotFound(f"No document to update: {'/'.join(write.path)}")
+
+        create_time = current.create_time if current is not None else now
+        if write.kind == 'update':
+            data = copy.deepcopy(current.data)
+            _update(data, write.data, now)
+        elif write.merge and current is not None:
+            data = copy.deepcopy(current.data)
+            _merge(data, write.data, now)
+        else:
+            data = _replace(write.data, now)
+        return _Document(data, create_time, now)
+
+    # Listeners
+
+    def watch(self, client, collection: Tuple[str, ...], callback: Callable) -> _Watch:
+        with self._lock:
+            watch = _Watch(self, collection, client, callback)
+            self._watches.setdefault(collection, []).append(watch)
+            documents = dict(self._collections.get(collection, {}))
+            changes = [(ChangeType.ADDED, doc_id, doc) for doc_id, doc in documents.items()]
+            self._events.put((watch, documents, changes, self._now()))
+            self._start_dispatcher()
+        return watch
+
+    def _unwatch(self, watch: _Watch) -> None:
+        with self._lock:
+            watches = self._watches.get(watch.collection, [])
+            if watch in watches:
+                watches.remove(watch)
+
+    def _publish(self, changes: Dict[Tuple[str, ...], List[Tuple[ChangeType, str]]], now: datetime) -> None:
+        for collection, collection_changes in changes.items():
+            watches = self._watches.get(collection)
+            if not watches:
+                continue
+            # Documents are replaced on write, never changed in place, so a
+            # shallow copy is a consistent view to build the snapshots from later
+            documents = dict(self._collections[collection])
+            collection_changes = [
+                (change_type, doc_id, documents.get(doc_id)) for change_type, doc_id in collection_changes
+            ]
+            for watch in watches:
+                self._events.put((watch, documents, collection_changes, now))
+
+    def _start_dispatcher(self) -> None:
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._dispatch, name='memory-firestore-watch', daemon=True)
+            self._dispatcher.start()
+
+    def _dispatch(self) -> None:
+        while True:
+            watch, documents, changes, read_time = self._events.get()
+            try:
+                if watch.active:
+                    docs = _DocumentList(watch.client, watch.collection, documents, read_time)
+                    document_changes = [
+                        DocumentChange(change_type, _snapshot(watch.client, watch.collection + (doc_id,),
+                                                              None if change_type == ChangeType.REMOVED else doc,
+                                                              read_time), -1, -1)
+                        for change_type, doc_id, doc in changes
+                    ]
+                    watch.callback(docs, document_changes, read_time)
+            except Exception:
+                logger.exception("Snapshot listener on %s failed", '/'.join(watch.collection))
+            finally:
+                self._events.task_done()
+
+
+# Queries
+
+class _Query:
+    def __init__(self, client, parent: Tuple[str, ...], filters: Tuple = (), orders: Tuple = (),
+                 offset: int = 0, limit: Optional[int] = None, start: Optional[Tuple] = None,
+                 end: Optional[Tuple] = None):
+        self._client = client
+        self._parent = parent
+        self._filters = filters
+        self._orders = orders
+        self._offset = offset
+        self._limit = limit
+        # (values, inclusive) cursors
+        self._start = start
+        self._end = end
+
+    ASCENDING = ASCENDING
+    DESCENDING = DESCENDING
+
+    def _copy(self, **changes) -> '_Query':
+        fields = {
+            'filters': self._filters, 'orders': self._orders, 'offset': self._offset,
+            'limit': self._limit, 'start': self._start, 'end': self._end,
+        }
+        fields.update(changes)
+        return self._client._query_class(self._client, self._parent, **fields)
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value: Any = None,
+              *, filter=None) -> '_Query':
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string in ('in', 'not-in', 'array-contains-any'):
+            value = [_encode(item) for item in value]
+        else:
+            value = _encode(value)
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> '_Query':
+        if direction not in (ASCENDING, DESCENDING):
+            raise ValueError(f"Invalid direction: {direction}")
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def offset(self, num_to_skip: int) -> '_Query':
+        return self._copy(offset=num_to_skip)
+
+    def limit(self, count: int) -> '_Query':
+        return self._copy(limit=count)
+
+    def _cursor(self, document_fields, inclusive: bool) -> Tuple:
+        orders = self._effective_orders()
+        if isinstance(document_fields, DocumentSnapshot):
+            values = [
+                document_fields.id if path == '__name__' else _encode(document_fields.get(path))
+                for path, _ in orders
+            ]
+        elif isinstance(document_fields, dict):
+            values = [_cursor_value(path, document_fields[path]) for path, _ in orders if path in document_fields]
+        else:
+            values = [_cursor_value(path, value) for (path, _), value in zip(orders, document_fields)]
+        return tuple(values), inclusive
+
+    def start_at(self, document_fields) -> '_Query':
+        return self._copy(start=self._cursor(document_fields, True))
+
+    def start_after(self, document_fields) -> '_Query':
+        return self._copy(start=self._cursor(document_fields, False))
+
+    def end_at(self, document_fields) -> '_Query':
+        return self._copy(end=self._cursor(document_fields, True))
+
+    def end_before(self, document_fields) -> '_Query':
+        return self._copy(end=self._cursor(document_fields, False))
+
+    # Evaluation
+
+    def _effective_orders(self) -> List[Tuple[str, str]]:
+        orders = list(self._orders)
+        if not orders:
+            # Firestore orders by the inequality field first when none is given
+            inequality = next((path for path, op, _ in self._filters if op in _INEQUALITY_OPS), None)
+            if inequality and inequality != '__name__':
+                orders.append((inequality, ASCENDING))
+        if not orders or orders[-1][0] != '__name__':
+            orders.append(('__name__', orders[-1][1] if orders else ASCENDING))
+        return orders
+
+    @staticmethod
+    def _field(doc_id: str, data: Dict[str, Any], path: str) -> Tuple[bool, Any]:
+        if path == '__name__':
+            return True, doc_id
+        return _lookup(data, path)
+
+    def _matches(self, doc_id: str, data: Dict[str, Any]) -> bool:
+        for path, op, value in self._filters:
+            found, actual = self._field(doc_id, data, path)
+            if path == '__name__' and isinstance(value, _StoredReference):
+                value = value.path[-1]
+            if not found:
+                return False
+            key = _order_key(actual)
+            if op == '==':
+                matched = key == _order_key(value)
+            elif op == '!=':
+                # Like not-in, leaves out documents whose field is null
+                matched = actual is not None and key != _order_key(value)
+            elif op == 'in':
+                matched = key in {_order_key(item) for item in value}
+            elif op == 'not-in':
+                matched = actual is not None and key not in {_order_key(item) for item in value}
+            elif op == 'array-contains':
+                matched = isinstance(actual, list) and _order_key(value) in {_order_key(item) for item in actual}
+            elif op == 'array-contains-any':
+                matched = isinstance(actual, list) and bool(
+                    {_order_key(item) for item in actual} & {_order_key(item) for item in value})
+            elif op in ('<', '<=', '>', '>='):
+                expected = _order_key(value)
+                # Range filters only match values of the same type
+                if key[0] != expected[0]:
+                    return False
+                matched = {'<': key < expected, '<=': key <= expected,
+                           '>': key > expected, '>=': key >= expected}[op]
+            else:
+                raise ValueError(f"Unsupported operator: {op}")
+            if not matched:
+                return False
+        return True
+
+    def _evaluate(self, documents: Dict[str, _Document], ordered: bool = True) -> List[Tuple[str, Dict[str, Any]]]:
+        orders = self._effective_orders()
+        rows = []
+        for doc_id, doc in documents.items():
+            if not self._matches(doc_id, doc.data):
+                continue
+            keys = []
+            for path, _ in orders:
+                found, value = self._field(doc_id, doc.data, path)
+                if not found:
+                    # Ordering by a field leaves out documents without it
+                    break
+                keys.append(_order_key(value))
+            else:
+                rows.append((tuple(keys), doc_id, doc.data))
+
+        if self._start is not None:
+            rows = [row for row in rows if self._after_start(row[0], orders)]
+        if self._end is not None:
+            rows = [row for row in rows if self._before_end(row[0], orders)]
+        if not ordered:
+            return [(doc_id, data) for _, doc_id, data in rows]
+
+        directions = {direction for _, direction in orders}
+        if self._limit is not None and len(directions) == 1:
+            # Keys end with the document ID, so they are unique and a partial
+            # selection gives the same rows as sorting everything
+            select = heapq.nlargest if DESCENDING in directions else heapq.nsmallest
+            rows = select(self._offset + self._limit, rows, key=lambda row: row[0])
+        else:
+            # Stable sorts from the last ordering to the first
+            for position in reversed(range(len(orders))):
+                rows.sort(key=lambda row: row[0][position], reverse=orders[position][1] == DESCENDING)
+        return [(doc_id, data) for _, doc_id, data in rows]
+
+    @staticmethod
+    def _compare(keys: Tuple, cursor: Tuple, orders: List[Tuple[str, str]]) -> int:
+        for key, value, (_, direction) in zip(keys, cursor, orders):
+            expected = _order_key(value)
+            if key != expected:
+                result = -1 if key < expected else 1
+                return -result if direction == DESCENDING else result
+        return 0
+
+    def _after_start(self, keys: Tuple, orders) -> bool:
+        values, inclusive = self._start
+        result = self._compare(keys, values, orders)
+        return result > 0 or (inclusive and result == 0)
+
+    def _before_end(self, keys: Tuple, orders) -> bool:
+        values, inclusive = self._end
+        result = self._compare(keys, values, orders)
+        return result < 0 or (inclusive and result == 0)
+
+
+class _CountQuery:
+    def __init__(self, query: _Query, alias: Optional[str]):
+        self._query = query
+        self._alias = alias or 'field_1'
+
+    def _result(self) -> Tuple[List[List[AggregationResult]], int]:
+        count = self._query._client._store.count(self._query)
+        reads = max(1, math.ceil(count / AGGREGATION_ENTRIES_PER_READ))
+        return [[AggregationResult(alias=self._alias, value=count, read_time=datetime.now(timezone.utc))]], reads
+
+
+class Query(_Query):
+    def stream(self, transaction=None) -> Iterable[DocumentSnapshot]:
+        yield from self.get()
+
+    def get(self, transaction=None) -> List[DocumentSnapshot]:
+        return self._client._call('run_query', lambda: self._client._store.run_query(self._client, self))
+
+    def count(self, alias: Optional[str] = None) -> 'CountQuery':
+        return CountQuery(self, alias)
+
+
+class AsyncQuery(_Query):
+    async def stream(self, transaction=None):
+        for snapshot in await self.get():
+            yield snapshot
+
+    async def get(self, transaction=None) -> List[DocumentSnapshot]:
+        return await self._client._call('run_query', lambda: self._client._store.run_query(self._client, self))
+
+    def count(self, alias: Optional[str] = None) -> 'AsyncCountQuery':
+        return AsyncCountQuery(self, alias)
+
+
+class CountQuery(_CountQuery):
+    def get(self, transaction=None) -> List[List[AggregationResult]]:
+        return self._query._client._call('run_aggregation_query', self._result, aggregation=True)
+
+
+class AsyncCountQuery(_CountQuery):
+    async def get(self, transaction=None) -> List[List[AggregationResult]]:
+        return await self._query._client._call('run_aggregation_query', self._result, aggregation=True)
+
+
+class _Collection:
+    @property
+    def id(self) -> str:
+        return self._parent[-1]
+
+    @property
+    def parent(self):
+        return self._client.document(*self._parent[:-1]) if len(self._parent) > 1 else None
+
+    def document(self, document_id: Optional[str] = None):
+        return self._client.document(*self._parent, document_id or _auto_id())
+
+    def on_snapshot(self, callback: Callable) -> _Watch:
+        """`callback(docs, changes, read_time)` with every document first, then each change."""
+        return self._client._store.watch(self._client, self._parent, callback)
+
+
+class CollectionReference(_Collection, Query):
+    def add(self, document_data: Dict[str, Any], document_id: Optional[str] = None):
+        reference = self.document(document_id)
+        return reference.create(document_data).update_time, reference
+
+    def list_documents(self, page_size: Optional[int] = None):
+        return [snapshot.reference for snapshot in self.get()]
+
+
+class AsyncCollectionReference(_Collection, AsyncQuery):
+    async def add(self, document_data: Dict[str, Any], document_id: Optional[str] = None):
+        reference = self.document(document_id)
+        return (await reference.create(document_data)).update_time, reference
+
+    async def list_documents(self, page_size: Optional[int] = None):
+        for snapshot in await self.get():
+            yield snapshot.reference
+
+
+# Documents
+
+class _Reference(BaseDocumentReference):
+    def _read(self) -> Tuple[DocumentSnapshot, int]:
+        return self._client._store.get_documents(self._client, [self._path])[0], 1
+
+    def _write(self, kind: str, data=None, merge: bool = False, option=None) -> Callable:
+        def commit():
+            return WriteResult(self._client._store.commit([_Write(kind, self._path, data, merge, option)])), 0
+        return commit
+
+
+class DocumentReference(_Reference):
+    def get(self, field_paths=None, transaction=None) -> DocumentSnapshot:
+        return self._client._call('batch_get_documents', self._read)
+
+    def set(self, document_data: Dict[str, Any], merge: bool = False) -> WriteResult:
+        return self._client._call('commit', self._write('set', document_data, merge), writes=1)
+
+    def create(self, document_data: Dict[str, Any]) -> WriteResult:
+        return self._client._call('commit', self._write('create', document_data), writes=1)
+
+    def update(self, field_updates: Dict[str, Any], option=None) -> WriteResult:
+        return self._client._call('commit', self._write('update', field_updates, option=option), writes=1)
+
+    def delete(self, option=None) -> datetime:
+        return self._client._call('commit', self._write('delete', option=option), writes=1).update_time
+
+
+class AsyncDocumentReference(_Reference):
+    async def get(self, field_paths=None, transaction=None) -> DocumentSnapshot:
+        return await self._client._call('batch_get_documents', self._read)
+
+    async def set(self, document_data: Dict[str, Any], merge: bool = False) -> WriteResult:
+        return await self._client._call('commit', self._write('set', document_data, merge), writes=1)
+
+    async def create(self, document_data: Dict[str, Any]) -> WriteResult:
+        return await self._client._call('commit', self._write('create', document_data), writes=1)
+
+    async def update(self, field_updates: Dict[str, Any], option=None) -> WriteResult:
+        return await self._client._call('commit', self._write('update', field_updates, option=option), writes=1)
+
+    async def delete(self, option=None) -> datetime:
+        return (await self._client._call('commit', self._write('delete', option=option), writes=1)).update_time
+
+
+# Batches
+
+class _Batch:
+    def __init__(self, client):
+        self._client = client
+        self._writes: List[_Write] = []
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def set(self, reference, document_data: Dict[str, Any], merge: bool = False) -> None:
+        self._writes.append(_Write('set', _path_of(reference), document_data, merge))
+
+    def create(self, reference, document_data: Dict[str, Any]) -> None:
+        self._writes.append(_Write('create', _path_of(reference), document_data))
+
+    def update(self, reference, field_updates: Dict[str, Any], option=None) -> None:
+        self._writes.append(_Write('update', _path_of(reference), field_updates, option=option))
+
+    def delete(self, reference, option=None) -> None:
+        self._writes.append(_Write('delete', _path_of(reference), option=option))
+
+    def _commit(self) -> Tuple[List[WriteResult], int]:
+        update_time = self._client._store.commit(self._writes)
+        return [WriteResult(update_time) for _ in self._writes], 0
+
+
+class WriteBatch(_Batch):
+    def commit(self) -> List[WriteResult]:
+        return self._client._call('commit', self._commit, writes=len(self._writes))
+
+
+class AsyncWriteBatch(_Batch):
+    async def commit(self) -> List[WriteResult]:
+        return await self._client._call('commit', self._commit, writes=len(self._writes))
+
+
+# Clients
+
+class _Client:
+    def __init__(self, store: MemoryFirestore):
+        self._store = store
+
+    def collection(self, *collection_path: str):
+        path = tuple(itertools.chain.from_iterable(part.split('/') for part in collection_path))
+        return self._collection_class(self, path)
+
+    def document(self, *document_path: str):
+        path = tuple(itertools.chain.from_iterable(part.split('/') for part in document_path))
+        return self._document_class(*path, client=self)
+
+    def batch(self):
+        return self._batch_class(self)
+
+    def write_option(self, last_update_time: Optional[datetime] = None,
+                     exists: Optional[bool] = None) -> _Precondition:
+        return _Precondition(last_update_time, exists)
+
+    def _read_all(self, references) -> Callable:
+        paths = [_path_of(reference) for reference in references]
+        # Missing documents are billed as reads too
+        return lambda: (self._store.get_documents(self, paths), len(paths))
+
+    def close(self) -> None:
+        pass
+
+
+class Client(_Client):
+    _collection_class = CollectionReference
+    _query_class = Query
+    _document_class = DocumentReference
+    _batch_class = WriteBatch
+
+    def _call(self, rpc: str, operation: Callable, writes: int = 0, aggregation: bool = False):
+        started = time.perf_counter()
+        time.sleep(self._store.delay())
+        result, reads = operation()
+        record_firestore_call(rpc, time.perf_counter() - started, reads=reads, writes=writes,
+                              aggregation=aggregation)
+        return result
+
+    def get_all(self, references, field_paths=None, transaction=None) -> Iterable[DocumentSnapshot]:
+        yield from self._call('batch_get_documents', self._read_all(list(references)))
+
+
+class AsyncClient(_Client):
+    _collection_class = AsyncCollectionReference
+    _query_class = AsyncQuery
+    _document_class = AsyncDocumentReference
+    _batch_class = AsyncWriteBatch
+
+    async def _call(self, rpc: str, operation: Callable, writes: int = 0, aggregation: bool = False):
+        started = time.perf_counter()
+        delay = self._store.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        result, reads = operation()
+        record_firestore_call(rpc, time.perf_counter() - started, reads=reads, writes=writes,
+                              aggregation=aggregation)
+        return result
+
+    async def get_all(self, references, field_paths=None, transaction=None):
+        for snapshot in await self._call('batch_get_documents', self._read_all(list(references))):
+            yield snapshot
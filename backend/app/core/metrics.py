@@ -0,0 +1,370 @@
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Request latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Firestore bills an aggregation one read per batch of up to this many index entries
+AGGREGATION_ENTRIES_PER_READ = 1000
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.label_names = name, help_text, labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.label_names, labels)} {value:g}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.label_names, self.buckets = name, help_text, labels, buckets
+        # labels -> ([count per bucket] + [count above the last], sum)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            counts, total = self._values.get(labels) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[labels] = (counts, total + value)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        names = self.label_names + ('le',)
+        with self._lock:
+            for labels, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == math.inf else f'{bound:g}'
+                    lines.append(f'{self.name}_bucket{_labels(names, labels + (le,))} {cumulative}')
+                lines.append(f'{self.name}_sum{_labels(self.label_names, labels)} {total:g}')
+                lines.append(f'{self.name}_count{_labels(self.label_names, labels)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """The metrics rendered by /metrics, in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect: Callable[[], Iterable[str]]) -> None:
+        """Add lines computed at scrape time, e.g. from a cache's own stats."""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            lines.extend(collect())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests served.', ('method', 'route', 'status'))
+http_latency = registry.histogram(
+    'http_request_duration_seconds', 'Time from request to the last response byte.', ('method', 'route'))
+firestore_reads = registry.counter(
+    'firestore_document_reads_total', 'Billed Firestore document reads.', ('route',))
+firestore_writes = registry.counter(
+    'firestore_document_writes_total', 'Firestore document writes committed.', ('route',))
+firestore_aggregations = registry.counter(
+    'firestore_aggregation_queries_total', 'Firestore aggregation (count) queries.', ('route',))
+firestore_round_trips = registry.counter(
+    'firestore_round_trips_total', 'Firestore RPCs issued.', ('route',))
+firestore_latency = registry.histogram(
+    'firestore_rpc_duration_seconds', 'Firestore RPC time, including streaming every result.', ('rpc',))
+
+
+# Firestore accounting
+
+class RequestStats:
+    """Firestore work done on behalf of one request."""
+
+    __slots__ = ('reads', 'writes', 'aggregations', 'round_trips', 'firestore_seconds')
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.aggregations = 0
+        self.round_trips = 0
+        self.firestore_seconds = 0.0
+
+
+# Set by MetricsMiddleware; tasks started during a request inherit it
+current_request: ContextVar[Optional[RequestStats]] = ContextVar('current_request', default=None)
+# Work done outside any request, such as the model field sync
+_background = RequestStats()
+
+
+def _stats() -> RequestStats:
+    return current_request.get() or _background
+
+
+class _CountingStream:
+    """Passes a streaming RPC's responses through, accounting for each one."""
+
+    def __init__(self, responses, rpc: str, stats: RequestStats, started: float,
+                 on_response: Callable[[RequestStats, object], int], minimum_reads: int):
+        self._responses = responses
+        self._rpc = rpc
+        self._stats = stats
+        self._started = started
+        self._on_response = on_response
+        self._minimum_reads = minimum_reads
+        self._reads = 0
+        self._done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            response = await self._responses.__anext__()
+        except BaseException:
+            self._finish()
+            raise
+        # Counted as they arrive, so a stream abandoned early is still accounted
+        reads = self._on_response(self._stats, response)
+        self._reads += reads
+        self._stats.reads += reads
+        return response
+
+    def _finish(self) -> None:
+        if self._done:
+            return
+        self._done = True
+        # A query is billed at least one read even when it matches nothing
+        self._stats.reads += max(0, self._minimum_reads - self._reads)
+        elapsed = time.perf_counter() - self._started
+        self._stats.firestore_seconds += elapsed
+        firestore_latency.observe(elapsed, self._rpc)
+
+
+def _document_response(stats: RequestStats, response) -> int:
+    # run_query responses without a document only report progress
+    return 1 if getattr(response, 'document', None) else 0
+
+
+def _batch_get_response(stats: RequestStats, response) -> int:
+    # Found and missing documents are both billed
+    return 1
+
+
+def _aggregation_response(stats: RequestStats, response) -> int:
+    result = getattr(response, 'result', None)
+    if not result:
+        return 0
+    entries = 0
+    for value in result.aggregate_fields.values():
+        entries = max(entries, int(getattr(value, 'integer_value', 0) or 0))
+    return max(1, math.ceil(entries / AGGREGATION_ENTRIES_PER_READ))
+
+
+def _wrap_streaming(method, rpc: str, on_response, minimum_reads: int, aggregation: bool = False):
+    async def call(*args, **kwargs):
+        stats = _stats()
+        stats.round_trips += 1
+        if aggregation:
+            stats.aggregations += 1
+        started = time.perf_counter()
+        responses = await method(*args, **kwargs)
+        return _CountingStream(responses, rpc, stats, started, on_response, minimum_reads)
+    return call
+
+
+def record_firestore_call(rpc: str, seconds: float, reads: int = 0, writes: int = 0,
+                          aggregation: bool = False) -> None:
+    """Account one round trip made by a client that is not instrumented, such as the memory backend."""
+    stats = _stats()
+    stats.round_trips += 1
+    stats.reads += reads
+    stats.writes += writes
+    if aggregation:
+        stats.aggregations += 1
+    stats.firestore_seconds += seconds
+    firestore_latency.observe(seconds, rpc)
+
+
+def _wrap_commit(method):
+    async def call(*args, **kwargs):
+        stats = _stats()
+        stats.round_trips += 1
+        request = kwargs.get('request')
+        writes = request.get('writes') if isinstance(request, dict) else getattr(request, 'writes', None)
+        started = time.perf_counter()
+        try:
+            response = await method(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            stats.firestore_seconds += elapsed
+            firestore_latency.observe(elapsed, 'commit')
+        stats.writes += len(writes or ())
+        return response
+    return call
+
+
+def instrument_firestore(client):
+    """Count the reads, writes and round trips an async Firestore client makes.
+
+    Wraps the RPC methods of the client's underlying API object, so every
+    query, document read, batch and aggregation built on the client is seen
+    without changing how it is used. The API object (and its grpc.aio
+    channel, bound to the event loop it is created on) is only built by the
+    client's first RPC, so it is wrapped then, not here; a client created
+    before asyncio.run() keeps working inside it. Safe to call more than once.
+    """
+    if getattr(client, '_metrics_instrumented', False):
+        return client
+    build_api = client._firestore_api_helper
+
+    def instrumented_api(*args, **kwargs):
+        api = build_api(*args, **kwargs)
+        if not getattr(api, '_metrics_instrumented', False):
+            _instrument_api(api)
+        return api
+
+    client._firestore_api_helper = instrumented_api
+    client._metrics_instrumented = True
+    return client
+
+
+def _instrument_api(api) -> None:
+    api.run_query = _wrap_streaming(api.run_query, 'run_query', _document_response, 1)
+    api.batch_get_documents = _wrap_streaming(api.batch_get_documents, 'batch_get_documents', _batch_get_response, 0)
+    api.run_aggregation_query = _wrap_streaming(
+        api.run_aggregation_query, 'run_aggregation_query', _aggregation_response, 1, aggregation=True)
+    api.commit = _wrap_commit(api.commit)
+    api._metrics_instrumented = True
+
+
+# Middleware
+
+def _server_timing(total_seconds: float, stats: RequestStats) -> str:
+    return (
+        f'app;dur={total_seconds * 1000:.1f}, '
+        f'firestore;dur={stats.firestore_seconds * 1000:.1f};'
+        f'desc="{stats.round_trips} round trips, {stats.reads} reads, {stats.writes} writes"'
+    )
+
+
+class MetricsMiddleware:
+    """Per-request Firestore accounting, route metrics and a Server-Timing header.
+
+    The header reports what was done before the response started; metrics
+    are recorded after the last body chunk, so streamed responses (the asset
+    export, say) are accounted in full.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status = {'code': 500}
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', _server_timing(time.perf_counter() - started, stats).encode()))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            route = scope.get('route')
+            # Templated path, so per-ID URLs share one series
+            route_path = getattr(route, 'path', None) or 'unmatched'
+            method = scope.get('method', '')
+            http_requests.inc(method, route_path, str(status['code']))
+            http_latency.observe(time.perf_counter() - started, method, route_path)
+            firestore_reads.inc(route_path, amount=stats.reads)
+            firestore_writes.inc(route_path, amount=stats.writes)
+            firestore_aggregations.inc(route_path, amount=stats.aggregations)
+            firestore_round_trips.inc(route_path, amount=stats.round_trips)
+
+
+def _collect_background() -> List[str]:
+    return [
+        '# HELP firestore_background_reads_total Firestore reads made outside any request.',
+        '# TYPE firestore_background_reads_total counter',
+        f'firestore_background_reads_total {_background.reads}',
+        '# HELP firestore_background_writes_total Firestore writes made outside any request.',
+        '# TYPE firestore_background_writes_total counter',
+        f'firestore_background_writes_total {_background.writes}',
+    ]
+
+
+registry.collector(_collect_background)
+
+
+def cache_collector(caches: Dict[str, Callable[[], dict]]) -> Callable[[], List[str]]:
+    """Expose `hits`/`misses` from each cache's stats() as labelled counters and a hit ratio."""
+    def collect() -> List[str]:
+        lines = [
+            '# HELP cache_hits_total Cache lookups answered from memory.',
+            '# TYPE cache_hits_total counter',
+        ]
+        misses, ratios = [], []
+        for name, stats in caches.items():
+            values = stats()
+            lines.append(f'cache_hits_total{{cache="{name}"}} {values.get("hits", 0)}')
+            misses.append(f'cache_misses_total{{cache="{name}"}} {values.get("misses", 0)}')
+            if values.get('hit_rate') is not None:
+                ratios.append(f'cache_hit_ratio{{cache="{name}"}} {values["hit_rate"]:.4f}')
+        lines += ['# HELP cache_misses_total Cache lookups that had to compute or read.',
+                  '# TYPE cache_misses_total counter'] + misses
+        lines += ['# HELP cache_hit_ratio Hits over lookups since startup.',
+                  '# TYPE cache_hit_ratio gauge'] + ratios
+        return lines
+    return collect
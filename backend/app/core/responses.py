@@ -0,0 +1,171 @@
+import re
+import typing
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Union
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+from app.core.config import settings
+
+_NONE_TYPE = type(None)
+
+# orjson writes 1e16 where json.dumps writes 1e+16. Any digit-e-digit run in
+# the output (a float, or just text such as a serial number) sends the
+# response back through the standard encoder.
+_EXPONENT = re.compile(rb'[0-9]e[-0-9]')
+
+# How a model field's value is turned into output
+_PASS, _TYPES, _DATETIME, _CONVERT = range(4)
+
+
+def _default(value):
+    # Firestore timestamps are a datetime subclass orjson does not take
+    if isinstance(value, datetime):
+        return datetime(
+            value.year, value.month, value.day, value.hour, value.minute, value.second,
+            value.microsecond, value.tzinfo
+        )
+    raise TypeError
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson.
+
+    For the content the prebuilt serializers produce, the bytes match what
+    JSONResponse writes after FastAPI's own serialization: compact
+    separators, UTF-8 rather than \\u escapes, and datetimes in pydantic's
+    ISO 8601 form with 'Z' for UTC.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+
+
+class _Unsupported(Exception):
+    """A value the fast path cannot reproduce byte for byte."""
+
+
+def _field_plan(annotation: Any):
+    """`(kind, argument)` describing how to emit a value of `annotation`."""
+    origin = typing.get_origin(annotation)
+    if origin is Union:
+        members = [arg for arg in typing.get_args(annotation) if arg is not _NONE_TYPE]
+        return _field_plan(members[0]) if len(members) == 1 else (_PASS, None)
+    if annotation in (str, int, bool):
+        return _TYPES, (annotation,)
+    if annotation is datetime:
+        return _DATETIME, None
+    if annotation in (dict, Any) or origin is dict:
+        # Nested values are left to orjson, which refuses what it cannot encode
+        return _PASS, None
+    return _CONVERT, _converter(annotation)
+
+
+@lru_cache(maxsize=None)
+def _converter(annotation: Any) -> Callable[[Any], Any]:
+    origin = typing.get_origin(annotation)
+    if origin is Union:
+        members = [arg for arg in typing.get_args(annotation) if arg is not _NONE_TYPE]
+        if len(members) != 1:
+            return lambda value: value
+        inner = _converter(members[0])
+        return lambda value: None if value is None else inner(value)
+    if origin in (list, typing.List):
+        (item_type,) = typing.get_args(annotation) or (Any,)
+        item = _converter(item_type)
+
+        def convert_list(value):
+            if not isinstance(value, list):
+                raise _Unsupported(value)
+            return [item(entry) for entry in value]
+        return convert_list
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return model_serializer(annotation)
+    if annotation in (str, int, bool, datetime, dict, Any) or origin is dict:
+        return lambda value: value
+    return _pydantic_converter(annotation)
+
+
+def _pydantic_converter(annotation: Any) -> Callable[[Any], Any]:
+    """Exact pydantic output for a type the fast path does not special-case, e.g. EmailStr."""
+    adapter = TypeAdapter(annotation)
+
+    # The same handful of values (emails, say) recur across requests
+    @lru_cache(maxsize=4096)
+    def convert(value):
+        try:
+            return adapter.dump_python(adapter.validate_python(value), mode='json')
+        except ValueError:
+            raise _Unsupported(value)
+
+    def convert_unhashable(value):
+        try:
+            return convert(value)
+        except TypeError:
+            raise _Unsupported(value)
+    return convert_unhashable
+
+
+@lru_cache(maxsize=None)
+def model_serializer(model: type) -> Callable[[Any], dict]:
+    """Prebuilt serializer turning a trusted dict into `model`'s output shape.
+
+    Keeps the model's fields in declaration order, fills in defaults for
+    missing ones and drops everything else, like `response_model` does, but
+    only type-checks values instead of validating them. Raises
+    `_Unsupported` where pydantic would coerce, so the output never differs.
+    """
+    fields = []
+    for name, field in model.model_fields.items():
+        default = _Unsupported if field.is_required() else field.get_default(call_default_factory=True)
+        kind, argument = _field_plan(field.annotation)
+        fields.append((name, kind, argument, default))
+
+    def serialize(data) -> dict:
+        if isinstance(data, BaseModel):
+            data = data.__dict__
+        if not isinstance(data, dict):
+            raise _Unsupported(data)
+        result = {}
+        for name, kind, argument, default in fields:
+            value = data.get(name, default)
+            if value is None or kind == _PASS:
+                result[name] = value
+            elif value is _Unsupported:
+                raise _Unsupported(name)
+            elif kind == _TYPES:
+                if type(value) not in argument:
+                    raise _Unsupported(value)
+                result[name] = value
+            elif kind == _DATETIME:
+                if not isinstance(value, datetime):
+                    # pydantic would parse a string and re-emit it normalized
+                    raise _Unsupported(value)
+                result[name] = value
+            else:
+                result[name] = argument(value)
+        return result
+
+    return serialize
+
+
+def fast_response(response_type: Any, content: Any):
+    """Return `content` as a FastJSONResponse when FAST_JSON_RESPONSES is on.
+
+    `response_type` is the endpoint's `response_model`. If the setting is
+    off, or the content holds anything whose encoding could differ from the
+    standard path, `content` is returned unchanged and FastAPI validates and
+    encodes it as usual.
+    """
+    if not settings.FAST_JSON_RESPONSES:
+        return content
+    try:
+        response = FastJSONResponse(_converter(response_type)(content))
+    except (_Unsupported, TypeError):
+        return content
+    if _EXPONENT.search(response.body):
+        return content
+    return response
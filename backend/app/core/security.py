@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PrincipalCache:
+    """Bounded, TTL'd cache of the `it_users` document behind a bearer token.
+
+    Entries are keyed by user ID and a digest of the token, so a new token
+    never reuses another token's entry, and they never outlive the token's
+    own expiry. Every entry of a user is dropped when their `it_users`
+    document changes (seen by a snapshot listener) or when the API
+    deactivates or deletes them.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, bytes], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._keys_by_user: Dict[str, set] = {}
+        self._user_generations: Dict[str, int] = {}
+        self._watch = None
+        self._stats = {
+            'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0, 'invalidations': 0,
+            'lookups': 0, 'lookup_seconds': 0.0,
+        }
+
+    # Lifecycle
+
+    def start(self, client) -> None:
+        """Listen to `it_users` on a synchronous Firestore client."""
+        if self._watch is not None:
+            return
+        synced = False
+
+        def on_snapshot(docs, changes, read_time):
+            nonlocal synced
+            if not synced:
+                # The first snapshot lists every user; nothing is cached yet.
+                synced = True
+                return
+            for change in changes:
+                self.invalidate_user(change.document.id)
+
+        self._watch = client.collection('it_users').on_snapshot(on_snapshot)
+
+    def stop(self) -> None:
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception:
+                logger.exception("Failed to unsubscribe principal cache listener")
+            self._watch = None
+
+    # Entries
+
+    @staticmethod
+    def _key(user_id: str, token: str) -> Tuple[str, bytes]:
+        return user_id, hashlib.sha256(token.encode()).digest()
+
+    def generation(self, user_id: str) -> int:
+        """Pass to `put` so a lookup racing an invalidation is not cached."""
+        return self._user_generations.get(user_id, 0)
+
+    def get(self, user_id: str, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(user_id, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            expires_at, principal = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return dict(principal)
+
+    def put(self, user_id: str, token: str, principal: Dict[str, Any], generation: int,
+            token_expires_at: Optional[float] = None) -> None:
+        """Cache `principal`; `token_expires_at` is the token's `exp` (epoch seconds)."""
+        ttl = self.ttl_seconds
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        key = self._key(user_id, token)
+        with self._lock:
+            if self._user_generations.get(user_id, 0) != generation:
+                return
+            self._entries[key] = (time.monotonic() + ttl, dict(principal))
+            self._entries.move_to_end(key)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats['evicted'] += 1
+
+    def _drop(self, key: Tuple[str, bytes]) -> None:
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+    def invalidate_user(self, user_id: str) -> None:
+        with self._lock:
+            self._user_generations[user_id] = self._user_generations.get(user_id, 0) + 1
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._drop(key)
+            self._stats['invalidations'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    # Metrics
+
+    def record_lookup(self, seconds: float) -> None:
+        """Time of one Firestore principal read made on a miss."""
+        with self._lock:
+            self._stats['lookups'] += 1
+            self._stats['lookup_seconds'] += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._entries)
+        lookup_seconds = stats.pop('lookup_seconds')
+        average_ms = lookup_seconds / stats['lookups'] * 1000 if stats['lookups'] else None
+        requests = stats['hits'] + stats['misses']
+        return {
+            **stats,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'hit_rate': stats['hits'] / requests if requests else None,
+            'avg_lookup_ms': round(average_ms, 2) if average_ms is not None else None,
+            # Every hit skipped one read that would have cost about the average lookup
+            'estimated_saved_ms': round(stats['hits'] * average_ms, 1) if average_ms is not None else None,
+            'listening': self._watch is not None,
+        }
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+class HashingPoolBusy(RuntimeError):
+    """Raised when the password hashing queue is full."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool instead of the event loop.
+
+    bcrypt releases the GIL, so a few workers hash in parallel while the loop
+    keeps serving other requests. At most `workers + max_queue` operations
+    are accepted at once; beyond that `HashingPoolBusy` is raised so a login
+    burst is shed quickly rather than queueing without bound.
+
+    Hashes are made with `rounds`. A stored hash with any other cost is
+    reported by `verify_and_update` together with its replacement, so
+    changing BCRYPT_ROUNDS migrates users as they log in.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 4, max_queue: int = 64):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds,
+        )
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._stats = {'hashed': 0, 'verified': 0, 'rehashed': 0, 'rejected': 0, 'peak_outstanding': 0}
+
+    def _submit(self, fn, *args) -> 'asyncio.Future':
+        with self._lock:
+            if self._outstanding >= self.workers + self.max_queue:
+                self._stats['rejected'] += 1
+                raise HashingPoolBusy("Password hashing queue is full")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+            self._outstanding += 1
+            self._stats['peak_outstanding'] = max(self._stats['peak_outstanding'], self._outstanding)
+        # Released when the work finishes, even if the awaiting request was cancelled
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return asyncio.wrap_future(future)
+
+    def _release(self, future) -> None:
+        with self._lock:
+            self._outstanding -= 1
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._submit(self.context.hash, password)
+        self._stats['hashed'] += 1
+        return hashed
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """`(verified, new_hash)`; `new_hash` is set when the stored cost is out of date."""
+        verified, new_hash = await self._submit(self.context.verify_and_update, password, hashed)
+        self._stats['verified'] += 1
+        if new_hash:
+            self._stats['rehashed'] += 1
+        return verified, new_hash
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                'outstanding': self._outstanding,
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'rounds': self.rounds,
+            }
+
+
+password_hasher = PasswordHasher(
+    rounds=settings.BCRYPT_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
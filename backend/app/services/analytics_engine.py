@@ -0,0 +1,153 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.services.generations import data_generations
+from app.services.reference_cache import reference_cache
+from app.services.search_index import asset_search_index
+
+# Collections whose changes alter at least one report
+SOURCE_COLLECTIONS = ('assets', 'asset_models', 'users', 'locations')
+
+# Asset types reported on their own; the rest are grouped as "Other"
+MAIN_ASSET_TYPES = {'Desktop', 'Headset', 'Laptop'}
+
+
+def _asset_type(asset: dict, asset_models: Dict[str, dict]) -> str:
+    asset_type = asset.get('asset_type')
+    if not asset_type and asset.get('asset_model'):
+        model_id = asset['asset_model']
+        if hasattr(model_id, 'id'):
+            model_id = model_id.id
+        asset_type = asset_models.get(model_id, {}).get('asset_type', 'UNKNOWN')
+    return asset_type or 'UNKNOWN'
+
+
+def build_reports(assets: Iterable[dict], asset_models: Dict[str, dict], users: Dict[str, dict],
+                  locations: Dict[str, dict]) -> Dict[str, List[dict]]:
+    """Every asset group-by report, filled in one pass over the assets."""
+    status_counts = defaultdict(int)
+    category_counts = defaultdict(int)
+    type_counts = defaultdict(int)
+    other_count = 0
+    location_counts = defaultdict(int)
+    user_counts = defaultdict(int)
+
+    for asset in assets:
+        status_counts[asset.get('status', 'UNKNOWN')] += 1
+        category_counts[asset.get('category', 'UNKNOWN')] += 1
+
+        asset_type = _asset_type(asset, asset_models)
+        if asset_type in MAIN_ASSET_TYPES:
+            type_counts[asset_type] += 1
+        else:
+            other_count += 1
+
+        location_id = asset.get('location_id')
+        if location_id:
+            location_counts[location_id] += 1
+
+        user_id = asset.get('assigned_user_id')
+        if user_id:
+            user_counts[user_id] += 1
+
+    by_type = [{'asset_type': asset_type, 'count': count} for asset_type, count in type_counts.items()]
+    if other_count > 0:
+        by_type.append({'asset_type': 'Other', 'count': other_count})
+
+    # Allocation names come from active users only, as the endpoint always did
+    active_users = {user_id: user for user_id, user in users.items() if user.get('is_active') is True}
+
+    return {
+        'by_status': [{'status': status, 'count': count} for status, count in status_counts.items()],
+        'by_category': [{'category': category, 'count': count} for category, count in category_counts.items()],
+        'by_type': by_type,
+        'by_location': [
+            {
+                'location_id': location_id,
+                'location_name': locations.get(location_id, {}).get('name', 'Unknown'),
+                'asset_count': count,
+            }
+            for location_id, count in location_counts.items()
+        ],
+        'user_allocation': [
+            {
+                'user_id': user_id,
+                'full_name': active_users.get(user_id, {}).get('full_name', 'Unknown'),
+                'username': active_users.get(user_id, {}).get('username', 'Unknown'),
+                'asset_count': count,
+            }
+            for user_id, count in user_counts.items()
+        ],
+    }
+
+
+class AnalyticsEngine:
+    """Computes the asset reports together and shares the result.
+
+    The analytics page asks for five reports at once. Whichever request
+    arrives first scans the assets; requests arriving during the scan wait
+    for it instead of starting their own. While the asset listener is
+    running, the result is kept until the data generation of any source
+    collection moves, so repeat visits cost no reads at all.
+    """
+
+    def __init__(self):
+        self._cached: Optional[Tuple[Tuple[int, ...], Dict[str, List[dict]]]] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self._stats = {'hits': 0, 'scans': 0, 'shared_scans': 0}
+
+    @property
+    def cacheable(self) -> bool:
+        # Without the listener nothing bumps the assets generation on change
+        return asset_search_index.ready
+
+    async def reports(self, db) -> Dict[str, List[dict]]:
+        key = data_generations.snapshot(*SOURCE_COLLECTIONS)
+        if self.cacheable and self._cached is not None and self._cached[0] == key:
+            self._stats['hits'] += 1
+            return self._cached[1]
+
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._scan(db, key))
+            self._inflight.add_done_callback(self._clear_inflight)
+        else:
+            self._stats['shared_scans'] += 1
+        # Shielded so one client disconnecting does not cancel the others' scan
+        return await asyncio.shield(self._inflight)
+
+    def _clear_inflight(self, task: asyncio.Future) -> None:
+        if self._inflight is task:
+            self._inflight = None
+
+    async def report(self, db, name: str) -> List[dict]:
+        return (await self.reports(db))[name]
+
+    async def _scan(self, db, key: Tuple[int, ...]) -> Dict[str, List[dict]]:
+        self._stats['scans'] += 1
+        await reference_cache.ensure_loaded(db, ['asset_models', 'users', 'locations'])
+        if asset_search_index.ready:
+            assets = [snapshot.to_dict() or {} for snapshot in asset_search_index.snapshots()]
+        else:
+            assets = [doc.to_dict() async for doc in db.collection('assets').stream()]
+
+        reports = build_reports(
+            assets,
+            reference_cache.all('asset_models'),
+            reference_cache.all('users'),
+            reference_cache.all('locations'),
+        )
+        # Stamped with the generation seen before the scan: a change made
+        # meanwhile leaves the key stale and forces a rescan next time.
+        if self.cacheable:
+            self._cached = (key, reports)
+        return reports
+
+    def invalidate(self) -> None:
+        self._cached = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, 'cached': self._cached is not None, 'generation': self._cached[0] if self._cached else None}
+
+
+analytics_engine = AnalyticsEngine()
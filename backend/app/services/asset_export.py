@@ -0,0 +1,224 @@
+import csv
+import io
+import json
+import re
+import zipfile
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, List, Optional
+from xml.sax.saxutils import escape
+
+from google.cloud.firestore_v1.base_document import BaseDocumentReference
+
+from app.services.reference_cache import reference_cache
+
+# Same header, in the same order, as the CSV embedded in data.js, so an
+# export can be fed straight back to seed_firebase.py.
+EXPORT_COLUMNS = (
+    'Tag No', 'Asset Type', 'Asset Make', 'Asset Model', 'Serial Number',
+    'Location', 'User Allocated', 'Asset Status', 'OS Version',
+)
+
+# Documents hydrated and encoded per step; bounds what is held in memory
+CHUNK_SIZE = 500
+
+MEDIA_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Characters XML 1.0 does not allow, even escaped
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def _ref_id(value) -> Optional[str]:
+    if isinstance(value, BaseDocumentReference):
+        return value.id
+    return value or None
+
+
+def _lookup(collection: str, value, field: str) -> Optional[str]:
+    """Name of a referenced document, or the stored value if it is not cached."""
+    doc_id = _ref_id(value)
+    if doc_id is None:
+        return None
+    data = reference_cache.all(collection).get(doc_id)
+    if data is None:
+        return None if isinstance(value, BaseDocumentReference) else doc_id
+    return data.get(field)
+
+
+def export_row(asset: dict) -> List[Optional[str]]:
+    """One asset document as values for EXPORT_COLUMNS."""
+    asset_type, asset_make, model = asset.get('asset_type'), asset.get('asset_make'), None
+    model_id = _ref_id(asset.get('asset_model'))
+    model_data = reference_cache.all('asset_models').get(model_id) if model_id else None
+    if model_data is not None:
+        asset_type = asset_type or model_data.get('asset_type')
+        asset_make = asset_make or model_data.get('asset_make')
+        model = model_data.get('asset_model')
+    elif not isinstance(asset.get('asset_model'), BaseDocumentReference):
+        model = model_id
+    return [
+        asset.get('asset_tag') or asset.get('tag_no'),
+        asset_type,
+        asset_make,
+        model,
+        asset.get('serial_number'),
+        _lookup('locations', asset.get('location'), 'name'),
+        _lookup('users', asset.get('user'), 'name'),
+        _lookup('asset_statuses', asset.get('asset_status'), 'status_name') or asset.get('status'),
+        asset.get('os_version'),
+    ]
+
+
+async def chunked(snapshots: AsyncIterable, size: int = CHUNK_SIZE) -> AsyncIterator[list]:
+    chunk = []
+    async for snapshot in snapshots:
+        chunk.append(snapshot)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def iterate(snapshots: Iterable) -> AsyncIterator:
+    """Adapt an in-memory list of snapshots, e.g. search results, to `chunked`."""
+    for snapshot in snapshots:
+        yield snapshot
+
+
+def _encode_csv(rows: List[list]) -> bytes:
+    out = io.StringIO()
+    csv.writer(out, lineterminator='\n').writerows(
+        ['' if value is None else value for value in row] for row in rows
+    )
+    return out.getvalue().encode('utf-8')
+
+
+def _encode_ndjson(rows: List[list]) -> bytes:
+    return ''.join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + '\n' for row in rows
+    ).encode('utf-8')
+
+
+class _Sink:
+    """Write-only, unseekable file for ZipFile; drained after every chunk."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data, self._parts = b''.join(self._parts), []
+        return data
+
+
+def _xml_cell(column: int, row_number: int, value) -> str:
+    ref = f"{chr(ord('A') + column)}{row_number}"
+    text = escape(_ILLEGAL_XML.sub('', str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xml_row(row_number: int, values: list) -> str:
+    cells = ''.join(_xml_cell(column, row_number, value)
+                    for column, value in enumerate(values) if value not in (None, ''))
+    return f'<row r="{row_number}">{cells}</row>'
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Assets" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+async def _xlsx(row_chunks: AsyncIterator[List[list]]) -> AsyncIterator[bytes]:
+    """A minimal single-sheet workbook, compressed as it is produced.
+
+    The zip is written to an unseekable sink, so ZipFile streams each entry
+    with a trailing data descriptor instead of seeking back to patch sizes.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xml_row(1, list(EXPORT_COLUMNS))
+            ).encode('utf-8'))
+            yield sink.drain()
+            row_number = 1
+            async for rows in row_chunks:
+                lines = []
+                for row in rows:
+                    row_number += 1
+                    lines.append(_xml_row(row_number, row))
+                sheet.write(''.join(lines).encode('utf-8'))
+                yield sink.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+
+async def _rows(chunks: AsyncIterator[list]) -> AsyncIterator[List[list]]:
+    async for chunk in chunks:
+        yield [export_row(snapshot.to_dict()) for snapshot in chunk]
+
+
+async def export_assets(snapshots: AsyncIterable, fmt: str) -> AsyncIterator[bytes]:
+    """Encode asset snapshots as `fmt` ('csv', 'ndjson' or 'xlsx'), chunk by chunk.
+
+    Only one chunk of documents is held at a time; names come from the
+    reference cache, which the caller must have loaded.
+    """
+    rows = _rows(chunked(snapshots))
+    if fmt == 'xlsx':
+        async for data in _xlsx(rows):
+            if data:
+                yield data
+        return
+
+    encode: Callable[[List[list]], bytes] = _encode_csv if fmt == 'csv' else _encode_ndjson
+    if fmt == 'csv':
+        yield _encode_csv([list(EXPORT_COLUMNS)])
+    async for chunk in rows:
+        yield encode(chunk)
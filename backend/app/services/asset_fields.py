@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Optional, Set
+
+from google.cloud.firestore_v1.base_document import BaseDocumentReference
+
+from app.services.reference_cache import reference_cache
+
+logger = logging.getLogger(__name__)
+
+# Copied from the asset's `asset_models` document onto the asset itself, so
+# type and make filters are single-field equality queries and reads need no
+# model lookup.
+DENORMALIZED_FIELDS = ('asset_type', 'asset_make', 'model')
+
+# Firestore batches are limited to 500 writes
+BATCH_SIZE = 500
+# Batches committed at once by the backfill
+MAX_CONCURRENT_BATCHES = 8
+
+
+def model_id_of(asset: dict) -> Optional[str]:
+    model = asset.get('asset_model')
+    if isinstance(model, BaseDocumentReference):
+        return model.id
+    return model or None
+
+
+def denormalized_fields(asset: dict, asset_models: Dict[str, dict]) -> dict:
+    """The type, make and model an asset should carry.
+
+    A reference (or the ID of an existing model) takes the model document's
+    values. A plain string that names no model document is the model itself,
+    as the API has always stored it next to `asset_type` and `asset_make`.
+    A reference to a deleted model yields nothing, leaving the fields as they are.
+    """
+    model_id = model_id_of(asset)
+    if model_id is None:
+        return {}
+    model_data = asset_models.get(model_id)
+    if model_data is None:
+        return {} if isinstance(asset.get('asset_model'), BaseDocumentReference) else {'model': model_id}
+    return {
+        'asset_type': model_data.get('asset_type'),
+        'asset_make': model_data.get('asset_make'),
+        'model': model_data.get('asset_model'),
+    }
+
+
+def stale_fields(asset: dict, asset_models: Dict[str, dict]) -> dict:
+    """The denormalized fields whose stored value is missing or out of date."""
+    return {
+        field: value for field, value in denormalized_fields(asset, asset_models).items()
+        if asset.get(field) != value
+    }
+
+
+async def _commit_updates(db, updates, concurrency: int) -> Dict[str, int]:
+    """Commit `(reference, fields)` pairs in batches, at most `concurrency` at once."""
+    stats = {'updated': 0, 'batches': 0}
+    pending = set()
+
+    async def commit(chunk):
+        batch = db.batch()
+        for ref, fields in chunk:
+            batch.update(ref, fields)
+        await batch.commit()
+        return len(chunk)
+
+    async def drain(return_when):
+        nonlocal pending
+        done, pending = await asyncio.wait(pending, return_when=return_when)
+        for task in done:
+            stats['updated'] += task.result()
+            stats['batches'] += 1
+
+    chunk = []
+    try:
+        async for ref, fields in updates:
+            chunk.append((ref, fields))
+            if len(chunk) == BATCH_SIZE:
+                if len(pending) >= concurrency:
+                    await drain(asyncio.FIRST_COMPLETED)
+                pending.add(asyncio.ensure_future(commit(chunk)))
+                chunk = []
+        if chunk:
+            pending.add(asyncio.ensure_future(commit(chunk)))
+        if pending:
+            await drain(asyncio.ALL_COMPLETED)
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        raise
+    return stats
+
+
+async def backfill_asset_fields(db, concurrency: int = MAX_CONCURRENT_BATCHES,
+                                progress: Optional[Callable[[int], None]] = None) -> Dict:
+    """Write the denormalized fields onto every asset that lacks them or has stale values.
+
+    Assets are streamed and only those needing a change are written, so the
+    migration can be re-run safely and resumes cheaply after an interruption.
+    `progress(scanned)` is called every BATCH_SIZE assets.
+    """
+    started = time.perf_counter()
+    await reference_cache.ensure_loaded(db, ['asset_models'])
+    asset_models = reference_cache.all('asset_models')
+    scanned = 0
+
+    async def updates():
+        nonlocal scanned
+        async for doc in db.collection('assets').stream():
+            scanned += 1
+            if progress is not None and scanned % BATCH_SIZE == 0:
+                progress(scanned)
+            fields = stale_fields(doc.to_dict() or {}, asset_models)
+            if fields:
+                yield doc.reference, fields
+
+    stats = await _commit_updates(db, updates(), concurrency)
+    elapsed = time.perf_counter() - started
+    return {
+        'scanned': scanned,
+        'updated': stats['updated'],
+        'batches': stats['batches'],
+        'elapsed_seconds': round(elapsed, 2),
+        'assets_per_second': round(scanned / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+async def sync_model_assets(db, model_id: str) -> int:
+    """Rewrite the denormalized fields of every asset of one model; returns assets updated."""
+    model_data = reference_cache.get('asset_models', model_id)
+    if model_data is None:
+        return 0
+    asset_models = {model_id: model_data}
+    assets = db.collection('assets')
+    model_ref = db.collection('asset_models').document(model_id)
+
+    async def updates():
+        # Seeded assets hold a reference; a few API-written ones hold the ID
+        for value in (model_ref, model_id):
+            async for doc in assets.where('asset_model', '==', value).stream():
+                fields = stale_fields(doc.to_dict() or {}, asset_models)
+                if fields:
+                    yield doc.reference, fields
+
+    stats = await _commit_updates(db, updates(), MAX_CONCURRENT_BATCHES)
+    return stats['updated']
+
+
+class AssetFieldSync:
+    """Keeps the denormalized fields current when an `asset_models` document changes.
+
+    Subscribes to the reference cache, whose listener sees every model edit,
+    including those made in the console or by scripts. Callbacks arrive on
+    Firestore's watch thread; the rewrite is scheduled on the event loop.
+    A model changed while the server was down is picked up by the backfill.
+    Started only where ASSET_FIELD_SYNC is set: each running instance would
+    otherwise rewrite the same assets.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._db = None
+        self._subscribed = False
+        self._stats = {'models_synced': 0, 'assets_updated': 0, 'failures': 0}
+
+    def start(self, db, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        self._db = db
+        self._loop = loop or asyncio.get_running_loop()
+        if not self._subscribed:
+            reference_cache.subscribe(self._on_change)
+            self._subscribed = True
+
+    def stop(self) -> None:
+        self._loop = None
+
+    def _on_change(self, collection: str, doc_ids: Optional[Set[str]]) -> None:
+        # None is a full (re)load, which is not an edit
+        if collection != 'asset_models' or not doc_ids or self._loop is None:
+            return
+        for model_id in doc_ids:
+            asyncio.run_coroutine_threadsafe(self._sync(model_id), self._loop)
+
+    async def _sync(self, model_id: str) -> None:
+        try:
+            updated = await sync_model_assets(self._db, model_id)
+        except Exception:
+            self._stats['failures'] += 1
+            logger.exception("Failed to sync denormalized fields for model %s", model_id)
+            return
+        self._stats['models_synced'] += 1
+        self._stats['assets_updated'] += updated
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, 'running': self._loop is not None}
+
+
+asset_field_sync = AssetFieldSync()
@@ -0,0 +1,125 @@
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.services.counters import asset_deltas, stage_increments
+from app.services.generations import data_generations
+from app.services.loader import MAX_BATCH_SIZE
+from app.services.user_locations import location_deltas, merge_deltas, stage_deltas
+
+# Firestore commits at most 500 writes per batch, histogram and counter writes included
+MAX_BATCH_WRITES = 500
+# Batches committed at once; each is a single commit RPC
+MAX_CONCURRENT_BATCHES = 8
+
+
+def _unique(ids: List[str]) -> List[str]:
+    return list(dict.fromkeys(asset_id for asset_id in ids if asset_id))
+
+
+def _pack(items: List[dict]) -> List[List[dict]]:
+    """Group updates into batches that stay within the per-batch write limit.
+
+    An update costs one write for the asset plus one per user histogram it
+    touches that the batch does not touch already, and the batch reserves
+    one write for the dashboard counters.
+    """
+    batches, current, users = [], [], set()
+    for item in items:
+        new_users = {user_id for user_id, _ in item['deltas']} - users
+        if current and len(current) + len(users) + len(new_users) + 2 > MAX_BATCH_WRITES:
+            batches.append(current)
+            current, users = [], set()
+            new_users = {user_id for user_id, _ in item['deltas']}
+        current.append(item)
+        users |= new_users
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def bulk_update_assets(db, asset_ids: List[str], make_update: Callable[[dict], dict],
+                             max_concurrency: int = MAX_CONCURRENT_BATCHES) -> Dict:
+    """Apply `make_update(current data)` to many assets with batched, concurrent commits.
+
+    The assets are read first, with concurrent `get_all` calls of up to
+    MAX_BATCH_SIZE keys; IDs that do not exist, or whose read failed, are
+    reported as failures without being written. Each batch succeeds or fails
+    as a whole, and its failure is reported against every asset in it.
+    """
+    started = time.perf_counter()
+    ids = _unique(asset_ids)
+    refs = {asset_id: db.collection('assets').document(asset_id) for asset_id in ids}
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    results: Dict[str, Optional[str]] = {}
+    existing: Dict[str, dict] = {}
+
+    async def read(chunk: List[str]) -> None:
+        async with semaphore:
+            try:
+                async for doc in db.get_all([refs[asset_id] for asset_id in chunk]):
+                    if doc.exists:
+                        existing[doc.id] = doc.to_dict()
+            except Exception as e:
+                for asset_id in chunk:
+                    results[asset_id] = str(e) or e.__class__.__name__
+
+    await asyncio.gather(*(read(ids[i:i + MAX_BATCH_SIZE]) for i in range(0, len(ids), MAX_BATCH_SIZE)))
+
+    items = []
+    for asset_id in ids:
+        if asset_id in results:
+            continue
+        before = existing.get(asset_id)
+        if before is None:
+            results[asset_id] = "Asset not found"
+            continue
+        update = make_update(before)
+        after = {**before, **update}
+        items.append({
+            'id': asset_id,
+            'update': update,
+            'deltas': location_deltas(before, after),
+            'counters': asset_deltas(before, after),
+        })
+
+    async def commit(chunk: List[dict]) -> None:
+        batch = db.batch()
+        for item in chunk:
+            batch.update(refs[item['id']], item['update'])
+        stage_deltas(batch, db, merge_deltas(*(item['deltas'] for item in chunk)))
+        counters = {}
+        for item in chunk:
+            for field, delta in item['counters'].items():
+                counters[field] = counters.get(field, 0) + delta
+        stage_increments(batch, db, counters)
+        async with semaphore:
+            try:
+                await batch.commit()
+            except Exception as e:
+                for item in chunk:
+                    results[item['id']] = str(e) or e.__class__.__name__
+                return
+        for item in chunk:
+            results[item['id']] = None
+
+    batches = _pack(items)
+    await asyncio.gather(*(commit(chunk) for chunk in batches))
+    if batches:
+        data_generations.bump('assets')
+
+    elapsed = time.perf_counter() - started
+    updated = sum(1 for error in results.values() if error is None)
+    return {
+        'requested': len(ids),
+        'updated': updated,
+        'failed': len(ids) - updated,
+        'batches': len(batches),
+        'elapsed_ms': round(elapsed * 1000, 1),
+        'assets_per_second': round(updated / elapsed, 1) if elapsed > 0 else None,
+        'results': [
+            {'asset_id': asset_id, 'success': results[asset_id] is None, 'error': results[asset_id]}
+            for asset_id in ids
+        ],
+    }
@@ -0,0 +1,134 @@
+import asyncio
+import random
+from datetime import datetime
+from typing import Dict, Optional
+
+from google.cloud.firestore_v1 import Increment
+
+# counters/dashboard/shards/{0..NUM_SHARDS-1}; each shard holds every field.
+# counters/dashboard itself records when reconcile_counters last seeded them.
+COUNTERS_COLLECTION = 'counters'
+DASHBOARD_COUNTERS = 'dashboard'
+# A single document sustains about one write per second. Spreading increments
+# over shards keeps bursts of asset writes from contending on one document.
+NUM_SHARDS = 10
+
+IN_SERVICE_STATUS = 'In-service'
+PENDING_TRANSFER_STATUS = 'PENDING'
+
+COUNTER_FIELDS = ('assets_total', 'assets_in_service', 'transfers_pending', 'users_total', 'locations_total')
+
+
+def _dashboard_ref(db):
+    return db.collection(COUNTERS_COLLECTION).document(DASHBOARD_COUNTERS)
+
+
+def _shard_refs(db):
+    shards = _dashboard_ref(db).collection('shards')
+    return [shards.document(str(index)) for index in range(NUM_SHARDS)]
+
+
+def is_in_service(asset: Optional[dict]) -> bool:
+    """Whether an asset counts as in service, by reference or by plain status ID."""
+    if not asset:
+        return False
+    status = asset.get('asset_status')
+    status_id = status if isinstance(status, str) else getattr(status, 'id', None)
+    return status_id == IN_SERVICE_STATUS
+
+
+def asset_deltas(before: Optional[dict], after: Optional[dict]) -> Dict[str, int]:
+    """Counter changes for an asset going from `before` to `after` (None = absent)."""
+    return {
+        'assets_total': (after is not None) - (before is not None),
+        'assets_in_service': is_in_service(after) - is_in_service(before),
+    }
+
+
+def transfer_deltas(before_status: Optional[str], after_status: Optional[str]) -> Dict[str, int]:
+    return {
+        'transfers_pending': (after_status == PENDING_TRANSFER_STATUS) - (before_status == PENDING_TRANSFER_STATUS),
+    }
+
+
+def stage_increments(batch, db, deltas: Dict[str, int]) -> int:
+    """Add counter increments to a write batch on one random shard; returns writes added."""
+    changes = {field: Increment(delta) for field, delta in deltas.items() if delta}
+    if not changes:
+        return 0
+    changes['updated_at'] = datetime.utcnow()
+    batch.set(random.choice(_shard_refs(db)), changes, merge=True)
+    return 1
+
+
+async def read_counters(db) -> Optional[Dict[str, int]]:
+    """Sum all shards in one batched read; None if the counters were never seeded.
+
+    Shards alone do not tell: the first write after a deploy creates one
+    holding just its own increment. Only reconcile_counters marks the
+    counters seeded, once they start from a full count.
+    """
+    dashboard_path = _dashboard_ref(db).path
+    totals = dict.fromkeys(COUNTER_FIELDS, 0)
+    seeded = False
+    async for snapshot in db.get_all([_dashboard_ref(db)] + _shard_refs(db)):
+        if not snapshot.exists:
+            continue
+        data = snapshot.to_dict()
+        if snapshot.reference.path == dashboard_path:
+            seeded = data.get('seeded_at') is not None
+            continue
+        for field in COUNTER_FIELDS:
+            totals[field] += data.get(field, 0) or 0
+    return totals if seeded else None
+
+
+async def _count(query) -> int:
+    return (await query.count().get())[0][0].value
+
+
+async def count_from_scratch(db) -> Dict[str, int]:
+    """Recompute every counter with aggregation queries."""
+    assets = db.collection('assets')
+    in_service_ref = db.collection('asset_statuses').document(IN_SERVICE_STATUS)
+    (assets_total, in_service_by_ref, in_service_by_id, transfers_pending,
+     users_total, locations_total) = await asyncio.gather(
+        _count(assets),
+        _count(assets.where('asset_status', '==', in_service_ref)),
+        _count(assets.where('asset_status', '==', IN_SERVICE_STATUS)),
+        _count(db.collection('transfers').where('status', '==', PENDING_TRANSFER_STATUS)),
+        _count(db.collection('users')),
+        _count(db.collection('locations')),
+    )
+    return {
+        'assets_total': assets_total,
+        'assets_in_service': in_service_by_ref + in_service_by_id,
+        'transfers_pending': transfers_pending,
+        'users_total': users_total,
+        'locations_total': locations_total,
+    }
+
+
+async def reconcile_counters(db) -> Dict[str, Dict[str, int]]:
+    """Reset the counters to freshly computed values and report the drift.
+
+    The true values go into shard 0 and every other shard is zeroed, in one
+    batch that also marks the counters seeded. Increments committed between
+    the count and the batch are lost; run it when writes are quiet.
+    """
+    actual, counted = await asyncio.gather(count_from_scratch(db), read_counters(db))
+    counted = counted or dict.fromkeys(COUNTER_FIELDS, 0)
+
+    now = datetime.utcnow()
+    batch = db.batch()
+    for index, shard_ref in enumerate(_shard_refs(db)):
+        values = actual if index == 0 else dict.fromkeys(COUNTER_FIELDS, 0)
+        batch.set(shard_ref, {**values, 'updated_at': now})
+    batch.set(_dashboard_ref(db), {'seeded_at': now}, merge=True)
+    await batch.commit()
+
+    return {
+        'actual': actual,
+        'counted': counted,
+        'drift': {field: counted[field] - actual[field] for field in COUNTER_FIELDS},
+    }
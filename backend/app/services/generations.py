@@ -0,0 +1,30 @@
+import threading
+from typing import Dict, Tuple
+
+
+class DataGenerations:
+    """Per-collection change counters shared by the in-process caches.
+
+    Anything that observes a change to a collection bumps its counter; caches
+    derived from that collection store the counter value they were built at
+    and treat a different value as invalidation.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+
+    def bump(self, collection: str) -> int:
+        with self._lock:
+            value = self._counters.get(collection, 0) + 1
+            self._counters[collection] = value
+            return value
+
+    def get(self, collection: str) -> int:
+        return self._counters.get(collection, 0)
+
+    def snapshot(self, *collections: str) -> Tuple[int, ...]:
+        return tuple(self._counters.get(collection, 0) for collection in collections)
+
+
+data_generations = DataGenerations()
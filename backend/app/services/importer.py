@@ -0,0 +1,291 @@
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Firestore commits at most 500 writes per batch
+MAX_BATCH_WRITES = 500
+# Batches committed at once; each is a single commit RPC
+DEFAULT_CONCURRENCY = 8
+# Attempts per batch before the import stops (and can be resumed)
+COMMIT_ATTEMPTS = 3
+
+# Cells pandas.read_csv reads as missing, which is how the original seed
+# script decided that, e.g., an 'N/A' OS version was not stored.
+NA_VALUES = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+})
+
+# Lookup collections written alongside the assets: (collection, CSV column, field)
+LOOKUPS = (
+    ('locations', 'Location', 'name'),
+    ('users', 'User Allocated', 'name'),
+    ('asset_statuses', 'Asset Status', 'status_name'),
+)
+
+
+def _doc_id(value: str) -> str:
+    # '/' separates path segments in Firestore
+    return value.replace('/', '-')
+
+
+def _model_id(row: Dict[str, Optional[str]]) -> str:
+    return _doc_id(f"{row['Asset Type']}-{row['Asset Make']}-{row['Asset Model']}")
+
+
+def _csv_lines(path: str) -> Iterator[str]:
+    """Lines of a .csv file, or of the backtick-quoted CSV string in data.js."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if not path.endswith('.js'):
+            yield from f
+            return
+        inside = False
+        for line in f:
+            if not inside:
+                start = line.find('`')
+                if start < 0:
+                    continue
+                inside, line = True, line[start + 1:]
+            end = line.find('`')
+            if end >= 0:
+                if line[:end].strip():
+                    yield line[:end] + '\n'
+                return
+            yield line
+        if not inside:
+            raise ValueError("Could not find CSV data string in data.js file.")
+
+
+def read_rows(path: str) -> Iterator[Dict[str, Optional[str]]]:
+    """Parse the import file one row at a time, missing cells as None."""
+    reader = csv.reader(line for line in _csv_lines(path) if line.strip())
+    header = [column.strip() for column in next(reader, [])]
+    for values in reader:
+        values += [''] * (len(header) - len(values))
+        yield {column: None if value in NA_VALUES else value for column, value in zip(header, values)}
+
+
+def source_fingerprint(path: str) -> str:
+    """Identifies the file a checkpoint belongs to; changes if the file is edited."""
+    stat = os.stat(path)
+    return hashlib.sha256(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+
+
+class Checkpoint:
+    """Rows of an import known to be committed, kept in a small JSON file.
+
+    Batches commit concurrently and may finish out of order, so the file
+    records a watermark: every row before it is committed. Rows after it are
+    written again on resume, which is harmless because every write merges.
+    """
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.rows_done = 0
+        self.stats = {'imported': 0, 'skipped': 0}
+
+    def load(self) -> int:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return 0
+        if data.get('fingerprint') != self.fingerprint:
+            return 0
+        self.rows_done = data.get('rows_done', 0)
+        self.stats = {**self.stats, **data.get('stats', {})}
+        return self.rows_done
+
+    def save(self) -> None:
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({
+                'fingerprint': self.fingerprint,
+                'rows_done': self.rows_done,
+                'stats': self.stats,
+                'saved_at': time.time(),
+            }, f)
+        os.replace(temporary, self.path)
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class _Batch:
+    def __init__(self, first_row: int):
+        self.first_row = first_row
+        self.end_row = first_row
+        self.writes: List[Tuple[str, str, dict]] = []
+        self.imported = 0
+        self.skipped = 0
+
+
+def _batches(rows: Iterator[Dict[str, Optional[str]]], start_row: int,
+             max_writes: int) -> Iterator[_Batch]:
+    """Turn rows into batches of at most `max_writes` merged document writes.
+
+    Each lookup document is written with the first batch that needs it.
+    """
+    seen = set()
+    batch = _Batch(start_row)
+    for row_number, row in enumerate(rows, start=start_row):
+        writes = []
+        if row.get('Serial Number'):
+            for collection, column, field in LOOKUPS:
+                if row.get(column):
+                    writes.append((collection, _doc_id(row[column]), {field: row[column]}))
+            if row.get('Asset Type') and row.get('Asset Make') and row.get('Asset Model'):
+                writes.append(('asset_models', _model_id(row), {
+                    'asset_type': row['Asset Type'],
+                    'asset_make': row['Asset Make'],
+                    'asset_model': row['Asset Model'],
+                }))
+            writes = [write for write in writes if (write[0], write[1]) not in seen]
+
+        if batch.writes and len(batch.writes) + len(writes) + 1 > max_writes:
+            yield batch
+            batch = _Batch(row_number)
+
+        batch.end_row = row_number + 1
+        if not row.get('Serial Number'):
+            batch.skipped += 1  # Rows without a serial number are skipped
+            continue
+        seen.update((collection, doc_id) for collection, doc_id, _ in writes)
+        batch.writes.extend(writes)
+        batch.writes.append(('assets', row['Serial Number'], row))
+        batch.imported += 1
+    if batch.end_row > batch.first_row:
+        yield batch
+
+
+def _asset_data(db, row: Dict[str, Optional[str]]) -> dict:
+    """The asset document for a row, with references into the lookup collections."""
+    asset_data = {
+        'asset_tag': row.get('Tag No'),
+        'serial_number': row['Serial Number'],
+        'os_version': row.get('OS Version'),
+        'asset_model': db.collection('asset_models').document(_model_id(row)) if row.get('Asset Model') else None,
+        'location': db.collection('locations').document(_doc_id(row['Location'])) if row.get('Location') else None,
+        'user': db.collection('users').document(_doc_id(row['User Allocated'])) if row.get('User Allocated') else None,
+        'asset_status': (db.collection('asset_statuses').document(_doc_id(row['Asset Status']))
+                         if row.get('Asset Status') else None),
+    }
+    if row.get('Asset Type') and row.get('Asset Make') and row.get('Asset Model'):
+        # The model's fields are denormalized onto the asset, see asset_fields.py
+        asset_data.update({
+            'asset_type': row['Asset Type'],
+            'asset_make': row['Asset Make'],
+            'model': row['Asset Model'],
+        })
+    # Filter out None values before setting the document
+    return {key: value for key, value in asset_data.items() if value is not None}
+
+
+async def import_assets(db, path: str, checkpoint_path: Optional[str] = None,
+                        concurrency: int = DEFAULT_CONCURRENCY, max_writes: int = MAX_BATCH_WRITES,
+                        restart: bool = False, progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """Import a data.js-format CSV into Firestore with batched, concurrent commits.
+
+    The file is parsed as a stream and at most `concurrency` batches are in
+    flight, so memory does not grow with the file. With `checkpoint_path`,
+    progress is saved after every commit and a later call for the same,
+    unchanged file resumes after the last committed row; `restart` ignores
+    it. `progress(stats)` is called after every commit.
+
+    Counters and user location histograms are not maintained; run
+    reconcile_counters.py and rebuild_user_locations.py afterwards.
+    """
+    checkpoint = Checkpoint(checkpoint_path, source_fingerprint(path)) if checkpoint_path else None
+    start_row = 0
+    if checkpoint is not None and not restart:
+        start_row = checkpoint.load()
+    resumed_stats = dict(checkpoint.stats) if checkpoint is not None else {'imported': 0, 'skipped': 0}
+
+    started = time.perf_counter()
+    stats = {
+        'resumed_from_row': start_row,
+        'rows_done': start_row,
+        'imported': 0,
+        'skipped': 0,
+        'batches': 0,
+        'writes': 0,
+        'elapsed_seconds': 0.0,
+        'rows_per_second': None,
+    }
+    finished: Dict[int, _Batch] = {}
+
+    def advance(batch: _Batch) -> None:
+        # Move the watermark over every batch that is now contiguous with it
+        finished[batch.first_row] = batch
+        while stats['rows_done'] in finished:
+            done = finished.pop(stats['rows_done'])
+            stats['rows_done'] = done.end_row
+            stats['imported'] += done.imported
+            stats['skipped'] += done.skipped
+        stats['batches'] += 1
+        stats['writes'] += len(batch.writes)
+        elapsed = time.perf_counter() - started
+        stats['elapsed_seconds'] = round(elapsed, 2)
+        rows = stats['rows_done'] - start_row
+        stats['rows_per_second'] = round(rows / elapsed, 1) if elapsed > 0 else None
+        if checkpoint is not None:
+            checkpoint.rows_done = stats['rows_done']
+            checkpoint.stats = {
+                'imported': resumed_stats['imported'] + stats['imported'],
+                'skipped': resumed_stats['skipped'] + stats['skipped'],
+            }
+            checkpoint.save()
+        if progress is not None:
+            progress(dict(stats))
+
+    async def commit(batch: _Batch) -> _Batch:
+        for attempt in range(1, COMMIT_ATTEMPTS + 1):
+            writer = db.batch()
+            for collection, doc_id, data in batch.writes:
+                if collection == 'assets':
+                    data = _asset_data(db, data)
+                writer.set(db.collection(collection).document(doc_id), data, merge=True)
+            try:
+                await writer.commit()
+                return batch
+            except Exception:
+                if attempt == COMMIT_ATTEMPTS:
+                    raise
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+
+    rows = read_rows(path)
+    # Rows before the checkpoint were committed by an earlier run
+    for _ in range(start_row):
+        if next(rows, None) is None:
+            break
+
+    pending = set()
+    try:
+        for batch in _batches(rows, start_row, max_writes):
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    advance(task.result())
+            pending.add(asyncio.ensure_future(commit(batch)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                advance(task.result())
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        raise
+
+    # A finished import is not resumed; running it again re-imports the file
+    if checkpoint is not None:
+        checkpoint.clear()
+    stats['total_imported'] = resumed_stats['imported'] + stats['imported']
+    return stats
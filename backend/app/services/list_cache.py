@@ -0,0 +1,119 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services.generations import data_generations
+from app.services.search_index import asset_search_index
+
+# A page shows asset fields and names hydrated from these collections
+SOURCE_COLLECTIONS = ('assets', 'locations', 'users', 'asset_models', 'asset_statuses')
+
+
+def _normalize(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    value = value.strip()
+    return value or None
+
+
+class AssetListCache:
+    """LRU cache of asset list pages and their total counts.
+
+    A page is keyed by its full request signature (filters, sort, limit and
+    skip or cursor); a count only by the filters, so every page of one
+    filter shares it. Each entry is stamped with the data generations of
+    SOURCE_COLLECTIONS seen before it was computed and is ignored once any
+    of them moves. The API bumps the assets generation on its own writes
+    and the asset listener on everyone else's, so entries are only kept
+    while that listener is running.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._pages: "OrderedDict[Tuple, Tuple[Tuple[int, ...], Dict[str, Any]]]" = OrderedDict()
+        self._counts: "OrderedDict[Tuple, Tuple[Tuple[int, ...], int]]" = OrderedDict()
+        self._stats = {
+            'hits': 0, 'misses': 0, 'count_hits': 0, 'count_misses': 0, 'stale': 0, 'evicted': 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        # Without the listener nothing bumps the assets generation on an outside change
+        return self.max_entries > 0 and asset_search_index.ready
+
+    @staticmethod
+    def generation() -> Tuple[int, ...]:
+        """Take before reading, and pass to `put_page`/`put_count`."""
+        return data_generations.snapshot(*SOURCE_COLLECTIONS)
+
+    @staticmethod
+    def filter_key(category: Optional[str], status: Optional[str], assigned_user_id: Optional[str],
+                   location_id: Optional[str]) -> Tuple:
+        return tuple(_normalize(value) for value in (category, status, assigned_user_id, location_id))
+
+    @staticmethod
+    def page_key(filter_key: Tuple, sort_by: Optional[str], sort_order: str, limit: int, skip: int,
+                 cursor: Optional[str]) -> Tuple:
+        sort_by = _normalize(sort_by)
+        cursor = _normalize(cursor)
+        # A cursor takes precedence over skip
+        return filter_key + (sort_by, sort_order, limit, 0 if cursor else skip, cursor)
+
+    def _get(self, entries: OrderedDict, key: Tuple, hit: str, miss: str):
+        if not self.enabled:
+            return None
+        entry = entries.get(key)
+        if entry is not None and entry[0] != self.generation():
+            del entries[key]
+            self._stats['stale'] += 1
+            entry = None
+        if entry is None:
+            self._stats[miss] += 1
+            return None
+        entries.move_to_end(key)
+        self._stats[hit] += 1
+        return entry[1]
+
+    def _put(self, entries: OrderedDict, key: Tuple, generation: Tuple[int, ...], value) -> None:
+        if not self.enabled or generation != self.generation():
+            # Changed while it was being computed
+            return
+        entries[key] = (generation, value)
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self._stats['evicted'] += 1
+
+    def get_page(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """`{'total_count', 'assets', 'next_cursor'}`; treat it as read-only."""
+        return self._get(self._pages, key, 'hits', 'misses')
+
+    def put_page(self, key: Tuple, generation: Tuple[int, ...], page: Dict[str, Any]) -> None:
+        self._put(self._pages, key, generation, page)
+
+    def get_count(self, key: Tuple) -> Optional[int]:
+        return self._get(self._counts, key, 'count_hits', 'count_misses')
+
+    def put_count(self, key: Tuple, generation: Tuple[int, ...], count: int) -> None:
+        self._put(self._counts, key, generation, count)
+
+    def clear(self) -> None:
+        self._pages.clear()
+        self._counts.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self._stats['hits'] + self._stats['misses']
+        count_requests = self._stats['count_hits'] + self._stats['count_misses']
+        return {
+            **self._stats,
+            'hit_rate': self._stats['hits'] / requests if requests else None,
+            'count_hit_rate': self._stats['count_hits'] / count_requests if count_requests else None,
+            'pages': len(self._pages),
+            'counts': len(self._counts),
+            'max_entries': self.max_entries,
+            'enabled': self.enabled,
+            'generation': self.generation(),
+        }
+
+
+asset_list_cache = AssetListCache(max_entries=settings.ASSET_LIST_CACHE_MAX_ENTRIES)
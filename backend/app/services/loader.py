@@ -0,0 +1,170 @@
+import asyncio
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import Depends
+
+from app.core.firebase import get_firestore_db
+from app.services.reference_cache import reference_cache
+from app.services.repository import plain
+
+# Firestore accepts up to 1000 keys per BatchGetDocuments
+MAX_GET_ALL_KEYS = 1000
+# Keys per get_all sent by the loader and the bulk updates; well below the limit
+MAX_BATCH_SIZE = 300
+
+
+class CachedDocument:
+    """Snapshot-shaped wrapper for a document served from the reference cache."""
+
+    __slots__ = ('id', '_data')
+
+    def __init__(self, doc_id: str, data: dict):
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return True
+
+    @property
+    def shared_data(self) -> dict:
+        """The reference cache's own dict, uncopied; it must not be modified."""
+        return self._data
+
+    def to_dict(self) -> dict:
+        return dict(self._data)
+
+
+class DocumentLoader:
+    """Request-scoped batching loader for Firestore documents.
+
+    Every `load()` made during one event-loop tick is collected and fetched
+    with a single `db.get_all`, so hydration code can request documents one
+    at a time (and concurrently) without paying a round trip per document.
+    Repeated keys share one fetch and results are memoized for the rest of
+    the request. Collections held by the reference cache are answered from
+    memory once they are loaded.
+    """
+
+    def __init__(self, db, cache=reference_cache, max_batch_size: int = MAX_BATCH_SIZE):
+        if not 0 < max_batch_size <= MAX_GET_ALL_KEYS:
+            raise ValueError(f"max_batch_size must be between 1 and {MAX_GET_ALL_KEYS}")
+        self._db = db
+        self._cache = cache
+        self._max_batch_size = max_batch_size
+        self._results: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._pending: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._data: Dict[Tuple[str, str], dict] = {}
+        self._dispatch_scheduled = False
+        # Running dispatches, referenced until done so none is garbage-collected
+        self._dispatch_tasks: Set[asyncio.Task] = set()
+        self.stats = {'requested': 0, 'fetched': 0, 'round_trips': 0, 'from_cache': 0}
+
+    def load(self, collection: str, doc_id: Optional[str]) -> 'asyncio.Future':
+        """Future resolving to the document's snapshot, or None if it does not exist."""
+        loop = asyncio.get_running_loop()
+        if not doc_id:
+            future = loop.create_future()
+            future.set_result(None)
+            return future
+
+        key = (collection, doc_id)
+        self.stats['requested'] += 1
+        future = self._results.get(key)
+        if future is not None:
+            return future
+
+        future = loop.create_future()
+        self._results[key] = future
+        if self._cache is not None and collection in self._cache.collections and self._cache.is_loaded(collection):
+            data = self._cache.get(collection, doc_id)
+            future.set_result(CachedDocument(doc_id, data) if data is not None else None)
+            self.stats['from_cache'] += 1
+            return future
+
+        self._pending[key] = future
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            # Runs after every coroutine already scheduled for this tick has
+            # had the chance to add its keys.
+            loop.call_soon(self._start_dispatch)
+        return future
+
+    def _start_dispatch(self) -> None:
+        task = asyncio.ensure_future(self._dispatch())
+        self._dispatch_tasks.add(task)
+        task.add_done_callback(self._dispatch_tasks.discard)
+
+    def data(self, collection: str, snapshot) -> Optional[dict]:
+        """A loaded document's data with references as IDs, or None if it does not exist.
+
+        Decoded once per request: everyone asking for the same document gets
+        the same dict (the reference cache's own, for cached collections), so
+        it must not be modified.
+        """
+        if snapshot is None:
+            return None
+        if isinstance(snapshot, CachedDocument):
+            return snapshot.shared_data
+        key = (collection, snapshot.id)
+        data = self._data.get(key)
+        if data is None:
+            data = self._data[key] = plain(snapshot.to_dict())
+        return data
+
+    async def load_many(self, collection: str, doc_ids: Iterable[Optional[str]]) -> List[Optional[object]]:
+        return list(await asyncio.gather(*(self.load(collection, doc_id) for doc_id in doc_ids)))
+
+    def prime(self, collection: str, snapshot) -> None:
+        """Record a snapshot the caller already has so it is not fetched again."""
+        key = (collection, snapshot.id)
+        if key in self._results:
+            return
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(snapshot if snapshot.exists else None)
+        self._results[key] = future
+
+    async def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        self._dispatch_scheduled = False
+        keys = list(pending)
+        batches = [keys[i:i + self._max_batch_size] for i in range(0, len(keys), self._max_batch_size)]
+        try:
+            outcomes = await asyncio.gather(*(self._fetch(batch, pending) for batch in batches),
+                                            return_exceptions=True)
+        except asyncio.CancelledError:
+            for future in pending.values():
+                future.cancel()
+            raise
+        # Nothing may be left waiting on a batch that failed outside _fetch's own handling
+        for batch, outcome in zip(batches, outcomes):
+            if isinstance(outcome, BaseException):
+                for key in batch:
+                    if not pending[key].done():
+                        pending[key].set_exception(outcome)
+
+    async def _fetch(self, keys, pending) -> None:
+        refs = [self._db.collection(collection).document(doc_id) for collection, doc_id in keys]
+        self.stats['round_trips'] += 1
+        try:
+            found = {}
+            async for snapshot in self._db.get_all(refs):
+                found[snapshot.reference.path] = snapshot
+        except Exception as e:
+            for key in keys:
+                if not pending[key].done():
+                    pending[key].set_exception(e)
+            return
+
+        for (collection, doc_id), ref in zip(keys, refs):
+            snapshot = found.get(ref.path)
+            if snapshot is not None and snapshot.exists:
+                self.stats['fetched'] += 1
+                pending[(collection, doc_id)].set_result(snapshot)
+            else:
+                pending[(collection, doc_id)].set_result(None)
+
+
+def get_document_loader(db = Depends(get_firestore_db)) -> DocumentLoader:
+    """FastAPI dependency: one loader, and so one memo, per request."""
+    return DocumentLoader(db)
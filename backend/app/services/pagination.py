@@ -0,0 +1,98 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from google.cloud.firestore_v1.base_document import BaseDocumentReference
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, BaseDocumentReference):
+        return {'$ref': value.path}
+    return value
+
+
+def _decode_value(value: Any, db) -> Any:
+    if isinstance(value, dict):
+        if '$dt' in value:
+            return datetime.fromisoformat(value['$dt'])
+        if '$ref' in value:
+            if db is None:
+                return value['$ref'].rsplit('/', 1)[-1]
+            return db.document(value['$ref'])
+    return value
+
+
+def encode_cursor(sort_by: Optional[str], sort_order: str, value: Any, doc_id: str) -> str:
+    """Opaque token identifying the last row of a page in its sort order."""
+    payload = {'s': sort_by or '', 'o': sort_order, 'v': _encode_value(value), 'id': doc_id}
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort_by: Optional[str], sort_order: str, db=None) -> Tuple[Any, str]:
+    """Return `(sort value, document id)` for a cursor from `encode_cursor`.
+
+    The cursor must have been issued for the same sort; reusing it with a
+    different `sort_by` or `sort_order` would silently skip or repeat rows.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        cursor_sort, cursor_order, value, doc_id = payload['s'], payload['o'], payload['v'], payload['id']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor("Malformed cursor")
+    if cursor_sort != (sort_by or '') or cursor_order != sort_order or not isinstance(doc_id, str):
+        raise InvalidCursor("Cursor does not match the requested sort")
+    return _decode_value(value, db), doc_id
+
+
+def keyset_page(rows: List[dict], sort_by: Optional[str], sort_order: str, limit: int,
+                cursor: Optional[str] = None, skip: int = 0) -> Tuple[List[dict], Optional[str]]:
+    """Sort in-memory rows and return one page plus the cursor for the next.
+
+    Rows are ordered by `(row[sort_by], row['id'])` so ties are broken the
+    same way on every request. With a cursor the page starts strictly after
+    the cursor's key, so rows inserted or removed before it do not shift
+    the page; without one, `skip` is applied as before.
+    """
+    # Without sort_by rows keep document ID order, as Firestore returns them.
+    descending = bool(sort_by) and sort_order == 'desc'
+
+    def sort_key(value, doc_id):
+        # Missing values sort lowest and are never compared with real ones.
+        if not sort_by or value is None:
+            return (False, '', doc_id)
+        return (True, value, doc_id)
+
+    def key(row):
+        return sort_key(row.get(sort_by) if sort_by else None, row['id'])
+
+    ordered = sorted(rows, key=key, reverse=descending)
+
+    if cursor:
+        value, doc_id = decode_cursor(cursor, sort_by, sort_order)
+        after = sort_key(value, doc_id)
+        start = 0
+        for index, row in enumerate(ordered):
+            if (key(row) < after) if descending else (key(row) > after):
+                start = index
+                break
+        else:
+            start = len(ordered)
+    else:
+        start = skip
+
+    page = ordered[start:start + limit]
+    next_cursor = None
+    if page and start + limit < len(ordered):
+        last = page[-1]
+        next_cursor = encode_cursor(sort_by, sort_order, last.get(sort_by) if sort_by else None, last['id'])
+    return page, next_cursor
@@ -0,0 +1,126 @@
+import asyncio
+import heapq
+import itertools
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from google.cloud.firestore_v1 import query as firestore_query
+from google.cloud.firestore_v1.base_document import BaseDocumentReference
+
+# Values Firestore accepts in one 'in' filter
+IN_LIMIT = 10
+
+# Firestore's cross-type ordering, for merging rows that hold different types
+_NULL, _BOOL, _NUMBER, _TIMESTAMP, _STRING, _BYTES, _REFERENCE, _OTHER = range(8)
+
+
+def _value_key(value: Any) -> Tuple:
+    if value is None:
+        return (_NULL,)
+    if isinstance(value, bool):
+        return (_BOOL, value)
+    if isinstance(value, (int, float)):
+        return (_NUMBER, value)
+    if isinstance(value, datetime):
+        return (_TIMESTAMP, value.timestamp())
+    if isinstance(value, str):
+        return (_STRING, value)
+    if isinstance(value, bytes):
+        return (_BYTES, value)
+    if isinstance(value, BaseDocumentReference):
+        return (_REFERENCE, value.path)
+    return (_OTHER, repr(value))
+
+
+class _Descending:
+    """Inverts the order of a sort key, so heapq.merge can merge descending streams."""
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+class FanOutQuery:
+    """A query with an 'in' filter too large for Firestore, run as several queries.
+
+    `base` holds every other filter. The values are split into chunks of
+    IN_LIMIT and each chunk becomes its own query; with IN_LIMIT values or
+    fewer this is just the one query. The chunks select disjoint documents
+    (a field holds one value), so counts add up exactly and a page is a
+    k-way merge of the chunks' pages on the same sort key. Empty `values`
+    match nothing, as an 'in' filter on no values would: no query is run.
+    """
+
+    def __init__(self, base, field: Optional[str] = None, values: Optional[Sequence] = None):
+        self.base = base
+        self.field = field
+        self.values = list(values) if values is not None else None
+
+    @property
+    def queries(self) -> List:
+        if self.field is None or self.values is None:
+            return [self.base]
+        return [
+            self.base.where(self.field, 'in', self.values[start:start + IN_LIMIT])
+            for start in range(0, len(self.values), IN_LIMIT)
+        ]
+
+    async def count(self) -> int:
+        results = await asyncio.gather(*(query.count().get() for query in self.queries))
+        return sum(result[0][0].value for result in results)
+
+    async def stream(self) -> AsyncIterator:
+        """Every matching document, one chunk query after another."""
+        for query in self.queries:
+            async for doc in query.stream():
+                yield doc
+
+    async def page(self, sort_by: Optional[str], sort_order: str, limit: int,
+                   start_after: Optional[Dict[str, Any]] = None, offset: int = 0) -> List:
+        """One page in `(sort_by, document ID)` order across every chunk.
+
+        `start_after` is the `{sort_by: value, '__name__': id}` of the last
+        row of the previous page. An offset cannot be pushed down to the
+        chunks, so each one reads `offset + limit` documents.
+        """
+        direction = firestore_query.Query.DESCENDING if sort_order == 'desc' else firestore_query.Query.ASCENDING
+        if not sort_by:
+            direction = firestore_query.Query.ASCENDING
+        queries = self.queries
+        if len(queries) == 1:
+            query = self._ordered(queries[0], sort_by, direction, start_after)
+            if offset:
+                query = query.offset(offset)
+            return [doc async for doc in query.limit(limit).stream()]
+
+        async def fetch(query):
+            query = self._ordered(query, sort_by, direction, start_after).limit(offset + limit)
+            return [doc async for doc in query.stream()]
+
+        streams = await asyncio.gather(*(fetch(query) for query in queries))
+
+        def key(doc):
+            sort_key = (_value_key(doc.get(sort_by)) if sort_by else (), doc.id)
+            return _Descending(sort_key) if direction == firestore_query.Query.DESCENDING else sort_key
+
+        merged = heapq.merge(*streams, key=key)
+        return list(itertools.islice(merged, offset, offset + limit))
+
+    @staticmethod
+    def _ordered(query, sort_by: Optional[str], direction, start_after: Optional[Dict[str, Any]]):
+        # Note: Firestore requires creating composite indexes for most non-trivial sort/filter combinations.
+        # If you get an error from Firestore, it will usually include a link to create the required index.
+        # Document ID breaks ties so every row has a unique position for the cursor.
+        if sort_by:
+            query = query.order_by(sort_by, direction=direction).order_by('__name__', direction=direction)
+        else:
+            query = query.order_by('__name__', direction=direction)
+        if start_after:
+            query = query.start_after(start_after)
+        return query
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from app.services.generations import data_generations
+from app.services.repository import plain
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_COLLECTIONS = ('locations', 'asset_models', 'asset_statuses', 'users')
+
+
+class ReferenceDataCache:
+    """In-memory copy of the small lookup collections used to hydrate assets.
+
+    Each collection is loaded once and then kept current by a Firestore
+    `on_snapshot` listener, which delivers only the documents that changed.
+    Listener callbacks run on Firestore's watch thread, so every collection
+    is held as a dict that is replaced, never mutated, under `_lock`; readers
+    on the event loop always see a complete version.
+    """
+
+    def __init__(self, collections: Iterable[str] = REFERENCE_COLLECTIONS):
+        self.collections = tuple(collections)
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, dict]] = {name: {} for name in self.collections}
+        self._loaded = {name: threading.Event() for name in self.collections}
+        self._watches = []
+        self._subscribers: List[Callable[[str, Optional[Set[str]]], None]] = []
+        self._load_lock: Optional[asyncio.Lock] = None
+        self._stats = {'hits': 0, 'misses': 0, 'full_loads': 0, 'changes_applied': 0}
+
+    # Lifecycle
+
+    def start(self, client) -> None:
+        """Attach a snapshot listener to every reference collection.
+
+        `client` must be a synchronous Firestore client; the async client has
+        no `on_snapshot`. The first snapshot of each listener carries the full
+        collection and marks it loaded.
+        """
+        if self._watches:
+            return
+        for name in self.collections:
+            watch = client.collection(name).on_snapshot(self._listener(name))
+            self._watches.append(watch)
+
+    def stop(self) -> None:
+        for watch in self._watches:
+            try:
+                watch.unsubscribe()
+            except Exception:
+                logger.exception("Failed to unsubscribe reference cache listener")
+        self._watches = []
+
+    def subscribe(self, callback: Callable[[str, Optional[Set[str]]], None]) -> None:
+        """Call `callback(collection, doc_ids)` after every applied change.
+
+        `doc_ids` is None when the whole collection was replaced. Callbacks
+        may run on Firestore's watch thread.
+        """
+        self._subscribers.append(callback)
+
+    def _notify(self, collection: str, doc_ids: Optional[Set[str]]) -> None:
+        for callback in self._subscribers:
+            try:
+                callback(collection, doc_ids)
+            except Exception:
+                logger.exception("Reference cache subscriber failed")
+
+    @property
+    def listening(self) -> bool:
+        return bool(self._watches)
+
+    def is_loaded(self, collection: str) -> bool:
+        return self._loaded[collection].is_set()
+
+    def wait_until_loaded(self, timeout: Optional[float] = None) -> bool:
+        """Block until every collection has received its initial snapshot."""
+        return all(self._loaded[name].wait(timeout) for name in self.collections)
+
+    def invalidate(self) -> None:
+        """Forget every collection, so ensure_loaded reads them again (without listeners)."""
+        with self._lock:
+            for name in self.collections:
+                self._data[name] = {}
+                self._loaded[name].clear()
+                data_generations.bump(name)
+
+    async def ensure_loaded(self, db, collections: Iterable[str] = REFERENCE_COLLECTIONS) -> None:
+        """Load any collection whose listener has not delivered data yet.
+
+        Only the first requests after startup can get here; once a listener
+        (or this fallback) has filled a collection it is never re-read.
+        """
+        missing = [name for name in collections if not self.is_loaded(name)]
+        if not missing:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            missing = [name for name in missing if not self.is_loaded(name)]
+            if missing:
+                await asyncio.gather(*(self._load_collection(db, name) for name in missing))
+
+    async def _load_collection(self, db, collection: str) -> None:
+        docs = {doc.id: plain(doc.to_dict()) async for doc in db.collection(collection).stream()}
+        with self._lock:
+            # A listener snapshot that arrived while we were reading is newer.
+            if self._loaded[collection].is_set():
+                return
+            self._data[collection] = docs
+            self._stats['full_loads'] += 1
+            data_generations.bump(collection)
+            self._loaded[collection].set()
+        self._notify(collection, None)
+
+    # Change application
+
+    def _listener(self, collection: str):
+        synced = False
+
+        def on_snapshot(docs, changes, read_time):
+            nonlocal synced
+            try:
+                if synced:
+                    self._apply_changes(collection, changes)
+                else:
+                    self._replace(collection, docs)
+                    synced = True
+            except Exception:
+                logger.exception("Failed to apply %s changes to the reference cache", collection)
+        return on_snapshot
+
+    def _replace(self, collection: str, docs) -> None:
+        """Install a listener's first snapshot, which is the whole collection."""
+        with self._lock:
+            self._data[collection] = {doc.id: plain(doc.to_dict()) for doc in docs}
+            self._stats['full_loads'] += 1
+            self._loaded[collection].set()
+            data_generations.bump(collection)
+        self._notify(collection, None)
+
+    def _apply_changes(self, collection: str, changes) -> None:
+        with self._lock:
+            current = dict(self._data[collection])
+            for change in changes:
+                doc = change.document
+                if change.type.name == 'REMOVED':
+                    current.pop(doc.id, None)
+                else:
+                    current[doc.id] = plain(doc.to_dict())
+            self._data[collection] = current
+            self._stats['changes_applied'] += len(changes)
+            data_generations.bump(collection)
+        self._notify(collection, {change.document.id for change in changes})
+
+    def upsert(self, collection: str, doc_id: str, data: Dict[str, Any]) -> None:
+        """Apply a local write immediately instead of waiting for the listener."""
+        with self._lock:
+            current = dict(self._data[collection])
+            current[doc_id] = plain(dict(data))
+            self._data[collection] = current
+            data_generations.bump(collection)
+        self._notify(collection, {doc_id})
+
+    def remove(self, collection: str, doc_id: str) -> None:
+        with self._lock:
+            if doc_id not in self._data[collection]:
+                return
+            current = dict(self._data[collection])
+            current.pop(doc_id, None)
+            self._data[collection] = current
+            data_generations.bump(collection)
+        self._notify(collection, {doc_id})
+
+    # Reads
+
+    def get(self, collection: str, doc_id: Optional[str]) -> Optional[dict]:
+        document = self._data[collection].get(doc_id) if doc_id else None
+        if document is None:
+            self._stats['misses'] += 1
+        else:
+            self._stats['hits'] += 1
+        return document
+
+    def all(self, collection: str) -> Dict[str, dict]:
+        """The current version of a collection. Treat it as read-only."""
+        return self._data[collection]
+
+    @property
+    def generation(self) -> int:
+        return sum(data_generations.snapshot(*self.collections))
+
+    def collection_generation(self, collection: str) -> int:
+        return data_generations.get(collection)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats['hits'] + self._stats['misses']
+        return {
+            **self._stats,
+            'hit_rate': self._stats['hits'] / lookups if lookups else None,
+            'generation': self.generation,
+            'listening': self.listening,
+            'documents': {name: len(self._data[name]) for name in self.collections},
+        }
+
+
+reference_cache = ReferenceDataCache()
@@ -0,0 +1,113 @@
+import secrets
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import jwt
+from google.api_core.exceptions import FailedPrecondition
+
+from app.core.config import settings
+
+# One small document per issued token, keyed by its jti:
+# {user_id, family_id, claims, expires_at, created_at, revoked, replaced_by}.
+# `expires_at` can back a Firestore TTL policy so spent tokens are purged.
+REFRESH_TOKENS = 'refresh_tokens'
+TOKEN_TYPE = 'refresh'
+
+# Firestore batches are limited to 500 writes
+BATCH_SIZE = 500
+
+
+class InvalidRefreshToken(ValueError):
+    """Raised for a refresh token that is malformed, expired, revoked or reused."""
+
+
+def _encode(jti: str, user_id: str, family_id: str, expires_at: datetime) -> str:
+    payload = {'sub': user_id, 'jti': jti, 'fam': family_id, 'typ': TOKEN_TYPE, 'exp': expires_at}
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def decode_refresh_token(token: str) -> Dict:
+    """Verify the signature and expiry without touching Firestore."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except jwt.PyJWTError:
+        raise InvalidRefreshToken("Invalid refresh token")
+    if payload.get('typ') != TOKEN_TYPE or not payload.get('jti') or not payload.get('fam'):
+        raise InvalidRefreshToken("Invalid refresh token")
+    return payload
+
+
+def _stage_issue(batch, db, user_id: str, claims: dict, family_id: Optional[str]) -> Tuple[str, str]:
+    jti = secrets.token_urlsafe(16)
+    family_id = family_id or secrets.token_urlsafe(16)
+    now = datetime.utcnow()
+    expires_at = now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    batch.set(db.collection(REFRESH_TOKENS).document(jti), {
+        'user_id': user_id,
+        'family_id': family_id,
+        # What the next access token is minted from, so a refresh needs no user read
+        'claims': claims,
+        'created_at': now,
+        'expires_at': expires_at,
+        'revoked': False,
+        'replaced_by': None,
+    })
+    return jti, _encode(jti, user_id, family_id, expires_at)
+
+
+async def issue_refresh_token(db, user_id: str, claims: dict) -> str:
+    """Start a new token family for a fresh login."""
+    batch = db.batch()
+    _, token = _stage_issue(batch, db, user_id, claims, None)
+    await batch.commit()
+    return token
+
+
+async def rotate_refresh_token(db, token: str) -> Tuple[str, dict]:
+    """Exchange a refresh token for its successor; returns `(new token, access claims)`.
+
+    A token can be exchanged once. Presenting one that was already exchanged
+    means it leaked, so its whole family is revoked and the caller, whoever
+    it is, has to log in again.
+    """
+    payload = decode_refresh_token(token)
+    ref = db.collection(REFRESH_TOKENS).document(payload['jti'])
+    record = await ref.get()
+    if not record.exists:
+        raise InvalidRefreshToken("Invalid refresh token")
+    data = record.to_dict()
+    if data.get('revoked'):
+        raise InvalidRefreshToken("Refresh token has been revoked")
+    if data.get('replaced_by'):
+        await revoke_family(db, data['family_id'])
+        raise InvalidRefreshToken("Refresh token has already been used")
+
+    batch = db.batch()
+    jti, new_token = _stage_issue(batch, db, data['user_id'], data['claims'], data['family_id'])
+    # Fails if another request rotated the same token since we read it
+    batch.update(ref, {'replaced_by': jti}, option=db.write_option(last_update_time=record.update_time))
+    try:
+        await batch.commit()
+    except FailedPrecondition:
+        raise InvalidRefreshToken("Refresh token has already been used")
+    return new_token, data['claims']
+
+
+async def _revoke_where(db, field: str, value: str) -> int:
+    query = db.collection(REFRESH_TOKENS).where(field, '==', value).where('revoked', '==', False)
+    refs = [doc.reference async for doc in query.stream()]
+    for start in range(0, len(refs), BATCH_SIZE):
+        batch = db.batch()
+        for ref in refs[start:start + BATCH_SIZE]:
+            batch.update(ref, {'revoked': True})
+        await batch.commit()
+    return len(refs)
+
+
+async def revoke_family(db, family_id: str) -> int:
+    return await _revoke_where(db, 'family_id', family_id)
+
+
+async def revoke_user_tokens(db, user_id: str) -> int:
+    """Sign a user out everywhere, e.g. on deactivation or deletion."""
+    return await _revoke_where(db, 'user_id', user_id)
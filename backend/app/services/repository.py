@@ -0,0 +1,202 @@
+"""Compact, typed views of the documents the routers return.
+
+A Firestore snapshot's `to_dict()` holds DocumentReference objects for
+references. Rather than walking that dict to swap references for IDs and
+patching names in key by key, a record copies the fields the API knows into
+`__slots__`, decodes each reference to its ID once and interns IDs and
+repeated values (types, makes, statuses), so a large page holds each of
+them once. Hydrated assets point at the one shared
+dict their location, user or model is cached as.
+"""
+import sys
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from google.cloud.firestore_v1.base_document import BaseDocumentReference
+
+# lookup(collection, doc_id): the referenced document's data, or None
+Lookup = Callable[[str, str], Optional[dict]]
+
+
+def document_id(value) -> Optional[str]:
+    """The ID in a reference field, which holds a DocumentReference or the ID itself."""
+    if isinstance(value, BaseDocumentReference):
+        return sys.intern(value.id)
+    if isinstance(value, str) and value:
+        return sys.intern(value)
+    return None
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def plain(data):
+    """Replace DocumentReferences in a document with their IDs."""
+    if isinstance(data, dict):
+        return {key: plain(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [plain(item) for item in data]
+    if isinstance(data, BaseDocumentReference):
+        return data.id
+    return data
+
+
+class Record:
+    """One document's known fields; subclasses name them in FIELDS."""
+
+    __slots__ = ('id',)
+
+    FIELDS: Tuple[str, ...] = ()
+    # Fields holding another document's ID, or a reference to it
+    REFERENCES = frozenset()
+    # Fields taking a handful of distinct values across the collection
+    INTERNED = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._decoders = tuple(
+            (field, document_id if field in cls.REFERENCES else _intern if field in cls.INTERNED else None)
+            for field in cls.FIELDS
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> 'Record':
+        # A loader.CachedDocument shares the reference cache's dict, which the
+        # record only reads; anything else is a Firestore snapshot.
+        data = getattr(snapshot, 'shared_data', None)
+        return cls.from_dict(snapshot.id, data if data is not None else snapshot.to_dict() or {})
+
+    @classmethod
+    def from_dict(cls, doc_id: str, data: dict) -> 'Record':
+        record = cls.__new__(cls)
+        record.id = doc_id
+        for field, decode in cls._decoders:
+            value = data.get(field)
+            setattr(record, field, value if decode is None or value is None else decode(value))
+        return record
+
+    def to_dict(self) -> dict:
+        """The stored fields that are set, references as IDs, plus `id`."""
+        data = {'id': self.id}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        return data
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.id!r})"
+
+
+# Reference fields of an asset and the collections they point into
+ASSET_REFERENCES = (
+    ('location', 'locations'),
+    ('user', 'users'),
+    ('asset_model', 'asset_models'),
+    ('asset_status', 'asset_statuses'),
+)
+
+
+class AssetRecord(Record):
+    FIELDS = (
+        'asset_tag', 'tag_no', 'serial_number', 'os_version',
+        'asset_type', 'asset_make', 'model',
+        'asset_model', 'asset_status', 'location', 'user',
+        'assigned_user_id', 'location_id',
+        # Free-text status written by the bulk status update
+        'status',
+        'created_at', 'updated_at',
+    )
+    REFERENCES = frozenset({'asset_model', 'asset_status', 'location', 'user', 'assigned_user_id', 'location_id'})
+    INTERNED = frozenset({'os_version', 'asset_type', 'asset_make', 'model', 'status'})
+
+    # model_is_reference: asset_model was a DocumentReference rather than a string
+    __slots__ = FIELDS + ('model_is_reference',)
+
+    @classmethod
+    def from_dict(cls, doc_id: str, data: dict) -> 'AssetRecord':
+        record = super().from_dict(doc_id, data)
+        record.model_is_reference = isinstance(data.get('asset_model'), BaseDocumentReference)
+        return record
+
+    def references(self) -> Iterator[Tuple[str, str]]:
+        """`(collection, doc_id)` of every document hydrate() looks up."""
+        for field, collection in ASSET_REFERENCES:
+            doc_id = getattr(self, field)
+            if doc_id:
+                yield collection, doc_id
+
+    def hydrate(self, lookup: Lookup) -> dict:
+        """The AssetResponse dict, with names resolved through lookup.
+
+        The model follows asset_fields.denormalized_fields: a model document
+        (by reference or ID) supplies the model name and any missing type or
+        make; a string naming no model is the model itself. The status is
+        the name of the asset_status document, else the stored `status`.
+        """
+        asset = self.to_dict()
+
+        if self.location:
+            asset['location'] = lookup('locations', self.location)
+
+        if self.user:
+            user = lookup('users', self.user)
+            if user is not None:
+                asset['assigned_user'] = user
+
+        if self.asset_model:
+            model = lookup('asset_models', self.asset_model)
+            if model is not None:
+                asset['asset_type'] = self.asset_type or model.get('asset_type')
+                asset['asset_make'] = self.asset_make or model.get('asset_make')
+                asset['model'] = model.get('asset_model')
+            elif not self.model_is_reference:
+                asset['model'] = self.model or self.asset_model
+
+        if self.asset_status:
+            status = lookup('asset_statuses', self.asset_status)
+            if status is not None:
+                asset['status'] = status.get('status_name')
+
+        return asset
+
+
+def hydrate_assets(snapshots: Iterable, lookup: Lookup) -> List[dict]:
+    return [AssetRecord.from_snapshot(snapshot).hydrate(lookup) for snapshot in snapshots]
+
+
+class TransferRecord(Record):
+    FIELDS = (
+        'asset_id', 'reason', 'status', 'damage_report', 'photo_url', 'rejection_reason',
+        'requester_id', 'approver_id', 'assigned_to_id',
+        'from_user_id', 'to_user_id', 'from_location_id', 'to_location_id',
+        'requested_at', 'approved_at', 'completed_at',
+    )
+    REFERENCES = frozenset({
+        'asset_id', 'requester_id', 'approver_id', 'assigned_to_id',
+        'from_user_id', 'to_user_id', 'from_location_id', 'to_location_id',
+    })
+    INTERNED = frozenset({'status'})
+
+    __slots__ = FIELDS
+
+    def to_response(self, relations: Dict[str, Optional[dict]]) -> dict:
+        """The TransferResponse dict: the stored fields plus the resolved relations."""
+        response = self.to_dict()
+        response.update(relations)
+        return response
+
+
+class UserRecord(Record):
+    # The password hash is never part of a record
+    FIELDS = ('name', 'username', 'email', 'role', 'is_active', 'location_id', 'created_at')
+    REFERENCES = frozenset({'location_id'})
+    INTERNED = frozenset({'role'})
+
+    __slots__ = FIELDS
+
+
+class LocationRecord(Record):
+    FIELDS = ('name', 'created_at')
+
+    __slots__ = FIELDS
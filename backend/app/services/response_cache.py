@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HIT, STALE, MISS = 'HIT', 'STALE', 'MISS'
+
+
+class StaleWhileRevalidateCache:
+    """Per-endpoint results served by age rather than recomputed per request.
+
+    A result younger than the endpoint's freshness window is a HIT. An
+    older one, up to `max_stale_seconds`, is served at once as STALE while a
+    single background task recomputes it; concurrent requests keep getting
+    the stale result instead of starting more refreshes. Anything older, or
+    missing, is computed inline as a MISS, shared by concurrent requests.
+    A failed refresh is logged and the stale result kept.
+    """
+
+    def __init__(self, fresh_seconds: float = 60.0, max_stale_seconds: float = 600.0,
+                 fresh_overrides: Optional[Dict[str, float]] = None):
+        self.fresh_seconds = fresh_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.fresh_overrides = dict(fresh_overrides or {})
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._refreshing: Dict[Hashable, asyncio.Future] = {}
+        self._stats = {HIT: 0, STALE: 0, MISS: 0, 'refreshes': 0, 'refresh_failures': 0}
+
+    def fresh_for(self, endpoint: str) -> float:
+        return self.fresh_overrides.get(endpoint, self.fresh_seconds)
+
+    async def get(self, endpoint: str, key: Hashable,
+                  compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, str, float]:
+        """`(result, 'HIT' | 'STALE' | 'MISS', age in seconds)` for `(endpoint, key)`."""
+        cache_key = (endpoint, key)
+        fresh_for = self.fresh_for(endpoint)
+        entry = self._entries.get(cache_key)
+        if entry is not None and fresh_for > 0:
+            computed_at, result = entry
+            age = time.monotonic() - computed_at
+            if age < fresh_for:
+                self._stats[HIT] += 1
+                return result, HIT, age
+            if age < self.max_stale_seconds:
+                self._stats[STALE] += 1
+                if cache_key not in self._refreshing:
+                    self._stats['refreshes'] += 1
+                    self._start(cache_key, compute).add_done_callback(self._log_refresh_failure)
+                return result, STALE, age
+
+        self._stats[MISS] += 1
+        task = self._refreshing.get(cache_key) or self._start(cache_key, compute)
+        # Shielded so one client disconnecting does not cancel the others' computation
+        return await asyncio.shield(task), MISS, 0.0
+
+    def _start(self, cache_key: Hashable, compute: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        async def run():
+            result = await compute()
+            self._entries[cache_key] = (time.monotonic(), result)
+            return result
+
+        task = asyncio.ensure_future(run())
+        self._refreshing[cache_key] = task
+
+        def finished(done: asyncio.Future) -> None:
+            if self._refreshing.get(cache_key) is done:
+                del self._refreshing[cache_key]
+        task.add_done_callback(finished)
+        return task
+
+    def _log_refresh_failure(self, task: asyncio.Future) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self._stats['refresh_failures'] += 1
+            logger.error("Background refresh of an analytics response failed", exc_info=task.exception())
+
+    def invalidate(self, endpoint: Optional[str] = None) -> None:
+        if endpoint is None:
+            self._entries.clear()
+            return
+        for cache_key in [cache_key for cache_key in self._entries if cache_key[0] == endpoint]:
+            del self._entries[cache_key]
+
+    def stats(self) -> Dict[str, Any]:
+        served = self._stats[HIT] + self._stats[STALE] + self._stats[MISS]
+        now = time.monotonic()
+        return {
+            'hits': self._stats[HIT],
+            'stale_hits': self._stats[STALE],
+            'misses': self._stats[MISS],
+            'refreshes': self._stats['refreshes'],
+            'refresh_failures': self._stats['refresh_failures'],
+            'hit_rate': (self._stats[HIT] + self._stats[STALE]) / served if served else None,
+            'refreshing': len(self._refreshing),
+            'entries': {
+                f"{endpoint}{'' if key is None else f' {key}'}": round(now - computed_at, 1)
+                for (endpoint, key), (computed_at, _) in self._entries.items()
+            },
+            'fresh_seconds': self.fresh_seconds,
+            'fresh_overrides': self.fresh_overrides,
+            'max_stale_seconds': self.max_stale_seconds,
+        }
+
+
+analytics_response_cache = StaleWhileRevalidateCache(
+    fresh_seconds=settings.ANALYTICS_CACHE_FRESH_SECONDS,
+    max_stale_seconds=settings.ANALYTICS_CACHE_MAX_STALE_SECONDS,
+    fresh_overrides=settings.ANALYTICS_CACHE_FRESH_OVERRIDES,
+)
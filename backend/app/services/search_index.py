@@ -0,0 +1,306 @@
+import logging
+import re
+import threading
+from collections import defaultdict
+from typing import Collection, Dict, Iterable, List, Optional, Set, Tuple
+
+from google.cloud.firestore_v1.base_document import BaseDocumentReference
+
+from app.services.generations import data_generations
+from app.services.reference_cache import reference_cache
+
+logger = logging.getLogger(__name__)
+
+# Fraction of the query's trigrams a field set must share to count as a match.
+# 0.5 lets a single transposed or mistyped letter through in names of 5+ letters.
+MIN_SIMILARITY = 0.5
+# Added to the score when the query appears verbatim, so exact hits rank first.
+EXACT_MATCH_BONUS = 1.0
+
+_TOKEN_RE = re.compile(r'[0-9a-z]+')
+
+# Fields search results can be filtered on, as get_assets' where() clauses
+# compare them: a reference field matches by document ID, and only when it
+# holds a DocumentReference.
+FILTER_FIELDS = ('asset_type', 'asset_model', 'asset_status', 'assigned_user_id', 'location')
+_REFERENCE_FILTERS = frozenset({'asset_model', 'asset_status', 'location'})
+
+
+def _ref_id(value) -> Optional[str]:
+    if value is None:
+        return None
+    return value if isinstance(value, str) else getattr(value, 'id', None)
+
+
+def normalize(text: str) -> str:
+    return ' '.join(_TOKEN_RE.findall(str(text).lower()))
+
+
+def trigrams(text: str) -> Set[str]:
+    """Word trigrams padded the way pg_trgm does: two spaces before, one after."""
+    grams = set()
+    for token in text.split():
+        padded = f'  {token} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def searchable_fields(data: dict) -> Dict[str, str]:
+    """Normalized text of every searchable field of an asset document."""
+    fields = {
+        'asset_tag': data.get('asset_tag') or data.get('tag_no'),
+        'serial_number': data.get('serial_number'),
+        'make': data.get('asset_make'),
+        'model': data.get('asset_model') if isinstance(data.get('asset_model'), str) else None,
+        'user': None,
+        'location': None,
+    }
+
+    model_id = _ref_id(data.get('asset_model'))
+    if not isinstance(data.get('asset_model'), str) and model_id:
+        model = reference_cache.all('asset_models').get(model_id) or {}
+        fields['make'] = fields['make'] or model.get('asset_make')
+        fields['model'] = model.get('asset_model')
+
+    user_id = _ref_id(data.get('user')) or data.get('assigned_user_id')
+    if user_id:
+        fields['user'] = (reference_cache.all('users').get(user_id) or {}).get('name')
+
+    location_id = _ref_id(data.get('location')) or data.get('location_id')
+    if location_id:
+        fields['location'] = (reference_cache.all('locations').get(location_id) or {}).get('name')
+
+    return {name: normalize(value) for name, value in fields.items() if value}
+
+
+def filter_values(data: dict) -> Tuple:
+    """An asset's value for each of FILTER_FIELDS."""
+    values = []
+    for field in FILTER_FIELDS:
+        value = data.get(field)
+        if field in _REFERENCE_FILTERS:
+            value = value.id if isinstance(value, BaseDocumentReference) else None
+        values.append(value)
+    return tuple(values)
+
+
+def _references(data: dict) -> Iterable[Tuple[str, str]]:
+    """(collection, id) pairs whose documents feed an asset's searchable text."""
+    model_id = _ref_id(data.get('asset_model'))
+    if model_id and not isinstance(data.get('asset_model'), str):
+        yield 'asset_models', model_id
+    user_id = _ref_id(data.get('user')) or data.get('assigned_user_id')
+    if user_id:
+        yield 'users', user_id
+    location_id = _ref_id(data.get('location')) or data.get('location_id')
+    if location_id:
+        yield 'locations', location_id
+
+
+class AssetSearchIndex:
+    """In-memory trigram index over the `assets` collection.
+
+    Covers asset tag, serial number, make, model, assigned user name and
+    location name. A snapshot listener keeps it current as assets change,
+    and reference-cache notifications re-index the assets whose user,
+    location or model documents changed. It also keeps the latest snapshot
+    of every asset, so search results are hydrated without Firestore reads.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._snapshots: Dict[str, object] = {}
+        self._fields: Dict[str, Dict[str, str]] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        self._filter_values: Dict[str, Tuple] = {}
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._referenced_by: Dict[Tuple[str, str], Set[str]] = defaultdict(set)
+        self._ready = threading.Event()
+        self._watch = None
+        self._subscribed = False
+
+    # Lifecycle
+
+    def start(self, client) -> None:
+        """Listen to `assets` on a synchronous Firestore client."""
+        if self._watch is not None:
+            return
+        if not self._subscribed:
+            reference_cache.subscribe(self._on_reference_change)
+            self._subscribed = True
+        synced = False
+
+        def on_snapshot(docs, changes, read_time):
+            nonlocal synced
+            try:
+                if synced:
+                    self.apply_changes(changes)
+                else:
+                    self.rebuild(docs)
+                    synced = True
+                data_generations.bump('assets')
+            except Exception:
+                logger.exception("Failed to update the asset search index")
+
+        self._watch = client.collection('assets').on_snapshot(on_snapshot)
+
+    def stop(self) -> None:
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception:
+                logger.exception("Failed to unsubscribe asset search index listener")
+            self._watch = None
+
+    @property
+    def listening(self) -> bool:
+        return self._watch is not None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    # Maintenance
+
+    def rebuild(self, snapshots: Iterable) -> None:
+        with self._lock:
+            self._snapshots.clear()
+            self._fields.clear()
+            self._grams.clear()
+            self._filter_values.clear()
+            self._postings.clear()
+            self._referenced_by.clear()
+            for snapshot in snapshots:
+                self._add(snapshot)
+            self._ready.set()
+
+    def apply_changes(self, changes) -> None:
+        with self._lock:
+            for change in changes:
+                if change.type.name == 'REMOVED':
+                    self._remove(change.document.id)
+                else:
+                    self._remove(change.document.id)
+                    self._add(change.document)
+
+    def _add(self, snapshot) -> None:
+        data = snapshot.to_dict() or {}
+        doc_id = snapshot.id
+        fields = searchable_fields(data)
+        grams = set()
+        for text in fields.values():
+            grams |= trigrams(text)
+        self._snapshots[doc_id] = snapshot
+        self._fields[doc_id] = fields
+        self._grams[doc_id] = grams
+        self._filter_values[doc_id] = filter_values(data)
+        for gram in grams:
+            self._postings[gram].add(doc_id)
+        for reference in _references(data):
+            self._referenced_by[reference].add(doc_id)
+
+    def _remove(self, doc_id: str) -> None:
+        snapshot = self._snapshots.pop(doc_id, None)
+        if snapshot is None:
+            return
+        self._fields.pop(doc_id, None)
+        self._filter_values.pop(doc_id, None)
+        for gram in self._grams.pop(doc_id, ()):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(doc_id)
+                if not postings:
+                    del self._postings[gram]
+        for reference in _references(snapshot.to_dict() or {}):
+            referencing = self._referenced_by.get(reference)
+            if referencing is not None:
+                referencing.discard(doc_id)
+                if not referencing:
+                    del self._referenced_by[reference]
+
+    def _reindex(self, doc_ids: Iterable[str]) -> None:
+        for doc_id in list(doc_ids):
+            snapshot = self._snapshots.get(doc_id)
+            if snapshot is not None:
+                self._remove(doc_id)
+                self._add(snapshot)
+
+    def _on_reference_change(self, collection: str, doc_ids: Optional[Set[str]]) -> None:
+        if collection not in ('users', 'locations', 'asset_models'):
+            return
+        with self._lock:
+            if doc_ids is None:
+                affected = {
+                    asset_id
+                    for (ref_collection, _), asset_ids in self._referenced_by.items()
+                    if ref_collection == collection
+                    for asset_id in asset_ids
+                }
+            else:
+                affected = set()
+                for doc_id in doc_ids:
+                    affected |= self._referenced_by.get((collection, doc_id), set())
+            self._reindex(affected)
+        if affected:
+            data_generations.bump('assets')
+
+    # Queries
+
+    def search(self, query: str,
+               filters: Optional[Dict[str, Collection]] = None) -> List[Tuple[str, float]]:
+        """Ranked `(asset id, score)` pairs for every asset matching `query`.
+
+        Scores are the share of the query's trigrams found in the asset, plus
+        a bonus when the normalized query occurs verbatim in one field. The
+        list is complete, so its length is the exact match count. Ties run by
+        ID descending, the order keyset_page gives a descending sort.
+        `filters` maps fields of FILTER_FIELDS to the values each may take.
+        """
+        needle = normalize(query)
+        if not needle:
+            return []
+        with self._lock:
+            if len(needle.replace(' ', '')) < 3:
+                # Too short for trigrams to say anything; fall back to a substring scan.
+                scores = {
+                    doc_id: EXACT_MATCH_BONUS
+                    for doc_id, fields in self._fields.items()
+                    if any(needle in text for text in fields.values())
+                }
+            else:
+                query_grams = trigrams(needle)
+                shared = defaultdict(int)
+                for gram in query_grams:
+                    for doc_id in self._postings.get(gram, ()):
+                        shared[doc_id] += 1
+                scores = {}
+                for doc_id, count in shared.items():
+                    similarity = count / len(query_grams)
+                    if similarity < MIN_SIMILARITY:
+                        continue
+                    if any(needle in text for text in self._fields[doc_id].values()):
+                        similarity += EXACT_MATCH_BONUS
+                    scores[doc_id] = similarity
+            if filters:
+                checks = [(FILTER_FIELDS.index(field), allowed) for field, allowed in filters.items()]
+                scores = {
+                    doc_id: score for doc_id, score in scores.items()
+                    if all(self._filter_values[doc_id][position] in allowed for position, allowed in checks)
+                }
+            return sorted(scores.items(), key=lambda item: (item[1], item[0]), reverse=True)
+
+    def snapshots(self, doc_ids: Optional[Iterable[str]] = None) -> list:
+        """Latest snapshots of the given assets, in the given order; all of them if None."""
+        with self._lock:
+            if doc_ids is None:
+                return list(self._snapshots.values())
+            return [self._snapshots[doc_id] for doc_id in doc_ids if doc_id in self._snapshots]
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+
+asset_search_index = AssetSearchIndex()
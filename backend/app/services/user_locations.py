@@ -0,0 +1,118 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from google.cloud.firestore_v1 import Increment
+
+# One document per user: {'counts': {location_id: assets}, 'updated_at': ...}
+USER_LOCATION_STATS = 'user_location_stats'
+
+# Firestore batches are limited to 500 writes
+BATCH_SIZE = 500
+
+
+def asset_user_id(asset: Optional[dict]) -> Optional[str]:
+    """User an asset is assigned to: the `user` reference, else `assigned_user_id`."""
+    if not asset:
+        return None
+    user_ref = asset.get('user')
+    if user_ref and hasattr(user_ref, 'id'):
+        return user_ref.id
+    return asset.get('assigned_user_id') or None
+
+
+def asset_location_id(asset: Optional[dict]) -> Optional[str]:
+    """Location of an asset: the `location` reference, else `location_id`."""
+    if not asset:
+        return None
+    location_ref = asset.get('location')
+    if location_ref and hasattr(location_ref, 'id'):
+        return location_ref.id
+    return asset.get('location_id') or None
+
+
+def location_deltas(before: Optional[dict], after: Optional[dict]) -> Dict[Tuple[str, str], int]:
+    """Histogram changes caused by an asset going from `before` to `after`.
+
+    Either side may be None for a created or deleted asset. Returns
+    `{(user_id, location_id): delta}` without zero entries.
+    """
+    deltas = defaultdict(int)
+    for asset, sign in ((before, -1), (after, 1)):
+        user_id, location_id = asset_user_id(asset), asset_location_id(asset)
+        if user_id and location_id:
+            deltas[(user_id, location_id)] += sign
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def merge_deltas(*many: Dict[Tuple[str, str], int]) -> Dict[Tuple[str, str], int]:
+    merged = defaultdict(int)
+    for deltas in many:
+        for key, delta in deltas.items():
+            merged[key] += delta
+    return {key: delta for key, delta in merged.items() if delta}
+
+
+def stage_deltas(batch, db, deltas: Dict[Tuple[str, str], int]) -> int:
+    """Add the histogram increments to a write batch; returns writes added."""
+    by_user = defaultdict(dict)
+    for (user_id, location_id), delta in deltas.items():
+        by_user[user_id][location_id] = Increment(delta)
+    for user_id, counts in by_user.items():
+        batch.set(
+            db.collection(USER_LOCATION_STATS).document(user_id),
+            {'counts': counts, 'updated_at': datetime.utcnow()},
+            merge=True
+        )
+    return len(by_user)
+
+
+def primary_location_id(counts: Optional[dict], exists=lambda location_id: True) -> Optional[str]:
+    """Location holding most of a user's assets; ties go to the lowest ID."""
+    candidates = sorted(
+        ((count, location_id) for location_id, count in (counts or {}).items() if count and count > 0),
+        key=lambda item: (-item[0], item[1])
+    )
+    for _, location_id in candidates:
+        if exists(location_id):
+            return location_id
+    return None
+
+
+def build_histograms(assets: Iterable[dict]) -> Dict[str, Counter]:
+    """Per-user location counts derived from scratch, as the rebuild does."""
+    histograms = defaultdict(Counter)
+    for asset in assets:
+        user_id, location_id = asset_user_id(asset), asset_location_id(asset)
+        if user_id and location_id:
+            histograms[user_id][location_id] += 1
+    return histograms
+
+
+async def rebuild_user_location_index(db) -> Dict[str, int]:
+    """Recompute every user's histogram from the assets collection.
+
+    Existing histograms are overwritten and those of users with no located
+    assets are deleted. Returns a summary of the work done.
+    """
+    histograms = build_histograms([doc.to_dict() async for doc in db.collection('assets').stream()])
+    existing = [doc.id async for doc in db.collection(USER_LOCATION_STATS).stream()]
+    stale = [user_id for user_id in existing if user_id not in histograms]
+
+    writes: List[tuple] = [('set', user_id) for user_id in histograms] + [('delete', user_id) for user_id in stale]
+    now = datetime.utcnow()
+    for start in range(0, len(writes), BATCH_SIZE):
+        batch = db.batch()
+        for operation, user_id in writes[start:start + BATCH_SIZE]:
+            ref = db.collection(USER_LOCATION_STATS).document(user_id)
+            if operation == 'set':
+                batch.set(ref, {'counts': dict(histograms[user_id]), 'updated_at': now})
+            else:
+                batch.delete(ref)
+        await batch.commit()
+
+    return {
+        'users_indexed': len(histograms),
+        'stale_removed': len(stale),
+        'multi_location_users': sum(1 for counts in histograms.values() if len(counts) > 1),
+    }
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.services.reference_cache import reference_cache
+from app.services.search_index import asset_search_index
+
+logger = logging.getLogger(__name__)
+
+# How often listener progress is checked while waiting
+POLL_SECONDS = 0.05
+
+
+async def _until(condition: Callable[[], bool], timeout: float) -> bool:
+    """Wait for `condition()` without blocking the loop; False if `timeout` passed first."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(POLL_SECONDS)
+    return True
+
+
+class Warmup:
+    """Readies a freshly started process before it reports ready.
+
+    Runs in the background after startup, so the server accepts connections
+    (and answers /health) at once while /ready answers 503 until it is done:
+
+      firestore       one small query, which opens the gRPC channel and
+                      fetches credentials
+      reference_data  waits for the reference cache listeners' first
+                      snapshots, then reads whatever has not arrived
+                      within `timeout_seconds` directly
+      search_index    waits, up to `timeout_seconds`, for the asset
+                      listener's first snapshot
+
+    The first requests then find the caches filled instead of each paying
+    for the collection scans. A listener that misses the timeout is recorded
+    but does not hold readiness back. A failed attempt is logged and retried.
+    """
+
+    def __init__(self, timeout_seconds: float = 30.0, retry_seconds: float = 5.0):
+        self.timeout_seconds = timeout_seconds
+        self.retry_seconds = retry_seconds
+        self._task: Optional[asyncio.Future] = None
+        self._ready = False
+        self._attempts = 0
+        self._error: Optional[str] = None
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._steps: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def start(self, db) -> None:
+        if self._task is not None or self._ready:
+            return
+        self._started_at = time.monotonic()
+        self._task = asyncio.ensure_future(self._run(db))
+
+    def skip(self) -> None:
+        """Report ready without warming up, the first requests paying instead."""
+        self._ready = True
+
+    def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    async def wait(self) -> None:
+        """Return once warmup has finished."""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def _run(self, db) -> None:
+        while True:
+            self._attempts += 1
+            try:
+                await self._warm(db)
+            except Exception as e:
+                self._error = str(e)
+                logger.exception("Warmup attempt %d failed; retrying in %ss", self._attempts, self.retry_seconds)
+                await asyncio.sleep(self.retry_seconds)
+                continue
+            self._error = None
+            self._finished_at = time.monotonic()
+            self._ready = True
+            logger.info("Warmup finished in %.2fs", self._finished_at - self._started_at)
+            return
+
+    async def _warm(self, db) -> None:
+        self._steps = {}
+
+        started = time.monotonic()
+        await db.collection('locations').limit(1).get()
+        self._record('firestore', started)
+
+        started = time.monotonic()
+        loaded = True
+        if reference_cache.listening:
+            loaded = await _until(
+                lambda: all(reference_cache.is_loaded(name) for name in reference_cache.collections),
+                self.timeout_seconds,
+            )
+        await reference_cache.ensure_loaded(db)
+        self._record('reference_data', started, timed_out=not loaded)
+
+        if asset_search_index.listening:
+            started = time.monotonic()
+            indexed = await _until(lambda: asset_search_index.ready, self.timeout_seconds)
+            self._record('search_index', started, timed_out=not indexed)
+
+    def _record(self, step: str, started: float, timed_out: bool = False) -> None:
+        self._steps[step] = {'seconds': round(time.monotonic() - started, 3), 'timed_out': timed_out}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'ready': self._ready,
+            'running': self._task is not None and not self._task.done(),
+            'attempts': self._attempts,
+            'error': self._error,
+            'seconds': (round(self._finished_at - self._started_at, 3)
+                        if self._finished_at is not None else None),
+            'steps': self._steps,
+            'timeout_seconds': self.timeout_seconds,
+        }
+
+
+warmup = Warmup(timeout_seconds=settings.WARMUP_TIMEOUT_SECONDS)
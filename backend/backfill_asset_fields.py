@@ -0,0 +1,51 @@
+"""
+Copy asset_type, asset_make and model from each asset's model onto the asset.
+
+Assets written by seed_firebase.py hold only an `asset_model` reference, so
+filtering them by type means resolving every model first. This migration
+writes the model's fields onto each asset in concurrent batches; only assets
+that lack them or hold stale values are written, so it can be re-run at any
+time. Once it has completed, set DENORMALIZED_ASSET_FIELDS=true to filter
+categories with a single equality query on `asset_type`. An API process
+with ASSET_FIELD_SYNC=true keeps the fields current from then on; without
+one, re-run this after editing asset models.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.firebase import initialize_firebase, get_firestore_db
+from app.services.asset_fields import MAX_CONCURRENT_BATCHES, backfill_asset_fields
+
+def backfill(concurrency):
+    try:
+        initialize_firebase()
+        db = get_firestore_db()
+
+        print("=== BACKFILLING DENORMALIZED ASSET FIELDS ===\n")
+        report = asyncio.run(backfill_asset_fields(
+            db, concurrency=concurrency, progress=lambda scanned: print(f"  {scanned} assets scanned")
+        ))
+
+        print(f"\nAssets scanned: {report['scanned']}")
+        print(f"Assets updated: {report['updated']} in {report['batches']} batches")
+        print(f"Elapsed: {report['elapsed_seconds']}s ({report['assets_per_second']} assets/s)")
+        return report
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backfill asset_type, asset_make and model onto assets.")
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENT_BATCHES,
+                        help="batches committed at once")
+    args = parser.parse_args()
+    backfill(args.concurrency)
@@ -0,0 +1,83 @@
+"""
+CPU and memory cost of hydrating one large page of assets.
+
+Seeds the in-memory Firestore backend with the scaled data.js inventory
+(see benchmarks.endpoints), reads one page of asset snapshots and hydrates
+it through both code paths the routers use:
+
+  cache   _get_populated_assets_optimized, names from the reference cache
+            (GET /assets, /assets/{id}, search)
+  loader  _get_populated_assets through a request-scoped DocumentLoader
+            (transfer relations)
+
+For each path it reports the median time per page, the tracemalloc peak
+while hydrating and the memory still held by the hydrated page afterwards.
+
+Usage (from the backend directory):
+    python -m benchmarks.asset_hydration --assets 10000 --page 1000 --repeat 20
+"""
+import argparse
+import asyncio
+import gc
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.endpoints import seed
+
+from app.api.assets import _get_populated_assets, _get_populated_assets_optimized
+from app.core.firebase import get_firestore_db
+from app.services.loader import DocumentLoader
+from app.services.reference_cache import reference_cache
+
+
+async def measure(hydrate, snapshots, repeat: int):
+    await hydrate(snapshots)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await hydrate(snapshots)
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    page = await hydrate(snapshots)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del page
+    return {
+        "ms_per_page": round(statistics.median(timings) * 1000, 2),
+        "peak_kib": round(peak / 1024),
+        "retained_kib": round(retained / 1024),
+    }
+
+
+async def run(args) -> None:
+    db = get_firestore_db()
+    await seed(args.assets, args.seed)
+    await reference_cache.ensure_loaded(db)
+    snapshots = await db.collection("assets").limit(args.page).get()
+
+    paths = {
+        "cache": lambda docs: _get_populated_assets_optimized(docs, db),
+        "loader": lambda docs: _get_populated_assets(docs, DocumentLoader(db)),
+    }
+    print(f"{len(snapshots)} assets per page, {args.assets} seeded")
+    for name, hydrate in paths.items():
+        result = await measure(hydrate, snapshots, args.repeat)
+        print(f"  {name:<7} {result['ms_per_page']:>8.2f} ms/page  "
+              f"peak {result['peak_kib']:>6} KiB  retained {result['retained_kib']:>6} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", type=int, default=10000)
+    parser.add_argument("--page", type=int, default=1000, help="assets per page (the list endpoints allow 1000)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Shows whether concurrent requests interleave on a single event loop.
+
+Runs the real `get_location` handler N times concurrently against a
+latency-injected stand-in for the Firestore client. With the async client
+each document read suspends its request, so total wall time stays close to
+one round trip. With a blocking client every read holds the loop, so the
+requests run back to back and wall time grows with N.
+
+Usage (from the backend directory):
+    python -m benchmarks.async_interleaving --requests 20 --latency-ms 50
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ.setdefault("DATABASE_URL", "sqlite:///./asset_management.db")
+
+from app.api.locations import get_location
+
+
+class _Snapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class _DocumentRef:
+    def __init__(self, client, doc_id):
+        self._client = client
+        self.id = doc_id
+
+    async def get(self):
+        await self._client.round_trip()
+        return _Snapshot(self.id, {"name": f"Location {self.id}"})
+
+
+class _Collection:
+    def __init__(self, client):
+        self._client = client
+
+    def document(self, doc_id):
+        return _DocumentRef(self._client, doc_id)
+
+
+class LatencyClient:
+    """Minimal client exposing `collection().document().get()` with fixed latency."""
+
+    def __init__(self, latency, blocking):
+        self.latency = latency
+        self.blocking = blocking
+
+    def collection(self, name):
+        return _Collection(self)
+
+    async def round_trip(self):
+        if self.blocking:
+            # What the synchronous client did: the whole loop waits.
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+
+
+async def _run(client, requests):
+    events = []
+
+    async def one(i):
+        events.append(("start", i))
+        await get_location(f"loc-{i}", db=client, current_user={"role": "admin"})
+        events.append(("end", i))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    # Requests interleave when a second request starts before the first ends.
+    first_end = next(index for index, event in enumerate(events) if event[0] == "end")
+    started_before_first_end = sum(1 for event in events[:first_end] if event[0] == "start")
+    return elapsed, started_before_first_end
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+    print(f"{args.requests} concurrent requests, {args.latency_ms:.0f} ms per Firestore round trip\n")
+    for label, blocking in (("blocking client", True), ("async client", False)):
+        elapsed, overlapping = asyncio.run(_run(LatencyClient(latency, blocking), args.requests))
+        print(
+            f"{label:<16} wall={elapsed * 1000:8.1f} ms  "
+            f"in flight before first response={overlapping:>3}  "
+            f"throughput={args.requests / elapsed:8.1f} req/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Cold start: how long a new process takes to serve its first user.
+
+Two measurements, each in fresh processes:
+
+  import   `import main`, in a new interpreter per run (median of --imports)
+  startup  the in-memory Firestore backend (FIRESTORE_BACKEND=memory) is
+           seeded with the scaled data.js inventory (see benchmarks.endpoints),
+           then the startup handlers run and a first user logs in and opens
+           the asset list, locations and dashboard. Once with the startup
+           warmup, waiting for /ready first as a load balancer would, and once
+           with WARMUP_ON_STARTUP disabled, the first user arriving right
+           after startup.
+
+For every first request the results record its latency, the Firestore
+reads it made (from Server-Timing) and the latency of the same request
+repeated at once; time to first response runs from the start of the
+startup handlers to the end of the first asset list request.
+Use --latency-ms to give every Firestore round trip a realistic cost.
+
+Usage (from the backend directory):
+    python -m benchmarks.cold_start --assets 10000 --latency-ms 20
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ.setdefault("DATABASE_URL", "sqlite:///./asset_management.db")
+os.environ["FIRESTORE_BACKEND"] = "memory"
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_SCRIPT = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+# What a user opening the app asks for first, after logging in
+FIRST_REQUESTS = ("/api/assets/?limit=50", "/api/locations/", "/api/analytics/dashboard")
+
+_READS = re.compile(r'(\d+) reads')
+
+
+def measure_imports(runs: int) -> Dict:
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=BACKEND, env=os.environ,
+                                capture_output=True, text=True, check=True).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return {"median_s": round(statistics.median(timings), 3), "min_s": round(min(timings), 3), "runs": runs}
+
+
+def _reads(response) -> int:
+    match = _READS.search(response.headers.get("server-timing", ""))
+    return int(match.group(1)) if match else 0
+
+
+async def first_user(client, started: float) -> Dict:
+    from benchmarks.endpoints import ADMIN_EMAIL, ADMIN_PASSWORD
+
+    requests: List[Dict] = []
+
+    async def timed(method: str, path: str, **kwargs):
+        request_started = time.perf_counter()
+        response = await client.request(method, path, **kwargs)
+        elapsed_ms = (time.perf_counter() - request_started) * 1000
+        # The same request again, as the process serves it once warm
+        request_started = time.perf_counter()
+        await client.request(method, path, **kwargs)
+        requests.append({
+            "endpoint": f"{method} {path}",
+            "status": response.status_code,
+            "ms": round(elapsed_ms, 2),
+            "reads": _reads(response),
+            "repeat_ms": round((time.perf_counter() - request_started) * 1000, 2),
+        })
+        return response
+
+    response = await timed("POST", "/api/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    await timed("GET", FIRST_REQUESTS[0], headers=headers)
+    first_response_s = time.perf_counter() - started
+    for path in FIRST_REQUESTS[1:]:
+        await timed("GET", path, headers=headers)
+    return {"time_to_first_response_s": round(first_response_s, 3), "requests": requests}
+
+
+async def run_startup(assets: int, options: Dict, warm: bool) -> Dict:
+    import httpx
+
+    import main as app_main
+    from app.core.config import settings
+    from app.core.firebase import get_memory_store
+    from app.services.warmup import warmup
+    from benchmarks.endpoints import seed
+
+    await seed(assets, options["seed"])
+    # Round trips cost nothing while seeding, then --latency-ms
+    store = get_memory_store()
+    store.latency_ms = options["latency_ms"]
+    store.jitter_ms = options["jitter_ms"]
+    settings.WARMUP_ON_STARTUP = warm
+
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        started = time.perf_counter()
+        await app_main.startup_event()
+        startup_s = time.perf_counter() - started
+        try:
+            ready_s = None
+            if warm:
+                while (await client.get("/ready")).status_code != 200:
+                    await asyncio.sleep(0.01)
+                ready_s = round(time.perf_counter() - started, 3)
+            result = await first_user(client, started)
+            result["warmup"] = warmup.stats()
+        finally:
+            await app_main.shutdown_event()
+    return {"mode": "warmup" if warm else "no warmup", "startup_s": round(startup_s, 3), "ready_s": ready_s,
+            **result}
+
+
+def _run_in_process(assets: int, options: Dict, warm: bool) -> Dict:
+    return asyncio.run(run_startup(assets, options, warm))
+
+
+def _format(result: Dict) -> str:
+    lines = [
+        f"{result['mode']}: startup handlers {result['startup_s']:.3f}s"
+        + (f", ready after {result['ready_s']:.3f}s" if result["ready_s"] is not None else "")
+        + f", first response after {result['time_to_first_response_s']:.3f}s"
+    ]
+    for request in result["requests"]:
+        lines.append(f"  {request['endpoint']:<40} {request['status']}  {request['ms']:>9.2f} ms  "
+                     f"reads={request['reads']:<4} repeated {request['repeat_ms']:>9.2f} ms")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", type=int, default=10000)
+    parser.add_argument("--imports", type=int, default=5, help="interpreters started to time `import main`")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args()
+    options = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "seed": args.seed}
+
+    imports = measure_imports(args.imports)
+    print(f"import main: median {imports['median_s']:.3f}s, min {imports['min_s']:.3f}s over {imports['runs']} runs")
+
+    # A fresh process per mode, so nothing is warm that a new instance would not have
+    results = []
+    for warm in (True, False):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            result = pool.submit(_run_in_process, args.assets, options, warm).result()
+        print(_format(result), flush=True)
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"assets": args.assets, "options": options, "import": imports, "startup": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Latency, throughput and Firestore reads of every read endpoint, at scale.
+
+Seeds the in-memory Firestore backend (FIRESTORE_BACKEND=memory) with the
+data.js inventory scaled up to the requested number of assets: each
+synthetic asset copies a real row, so asset types, makes, models,
+locations and statuses keep their distributions. Users are replicated with
+the inventory ("Jane Doe", "Jane Doe 2", ...) so assets per user stay the
+same as the organisation grows. Transfers, the dashboard counters and the
+user location histograms are seeded to match.
+
+The app then starts as it does in production (listeners, caches) and each
+endpoint is driven through its real middleware and routers at a fixed
+concurrency. For every endpoint the results record p50/p95/p99 latency,
+throughput and the Firestore reads per request reported in Server-Timing.
+Every scale runs in a fresh process.
+
+Results are written as JSON; pass a previous file as --baseline to print
+the change in p95 latency and reads per request for each endpoint.
+
+Usage (from the backend directory):
+    python -m benchmarks.endpoints --assets 10000 100000 --output results.json
+    python -m benchmarks.endpoints --assets 10000 --latency-ms 5 --baseline results.json
+"""
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ.setdefault("DATABASE_URL", "sqlite:///./asset_management.db")
+os.environ["FIRESTORE_BACKEND"] = "memory"
+
+import httpx
+
+import main as app_main
+from app.core.firebase import get_firestore_db, get_memory_store
+from app.core.security import password_hasher
+from app.services.counters import reconcile_counters
+from app.services.importer import import_assets, read_rows
+from app.services.user_locations import rebuild_user_location_index
+from app.services.warmup import warmup as startup_warmup
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data.js")
+ADMIN_EMAIL = "benchmark@example.com"
+ADMIN_PASSWORD = "benchmark"
+# One transfer per this many assets, spread over the last year
+ASSETS_PER_TRANSFER = 100
+TRANSFER_STATUSES = ("PENDING", "APPROVED", "COMPLETED", "REJECTED")
+
+_READS = re.compile(r'(\d+) reads')
+
+
+# Seeding
+
+def scaled_rows(source: List[Dict[str, Optional[str]]], assets: int, seed: int):
+    """`assets` data.js rows, each a copy of a random real row with unique identifiers."""
+    rng = random.Random(seed)
+    for i in range(assets):
+        row = dict(rng.choice(source))
+        replica = i // len(source)
+        row["Serial Number"] = f"{row['Serial Number']}-{i:07d}"
+        if row.get("Tag No"):
+            row["Tag No"] = f"{row['Tag No']}-{i:07d}"
+        if replica and row.get("User Allocated"):
+            row["User Allocated"] = f"{row['User Allocated']} {replica + 1}"
+        yield row
+
+
+def write_inventory(path: str, assets: int, seed: int) -> None:
+    source = [row for row in read_rows(SOURCE) if row.get("Serial Number")]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(source[0]))
+        writer.writeheader()
+        for row in scaled_rows(source, assets, seed):
+            writer.writerow({column: "" if value is None else value for column, value in row.items()})
+
+
+async def seed_transfers(db, count: int, seed: int) -> None:
+    rng = random.Random(seed)
+    asset_ids = [doc.id async for doc in db.collection("assets").limit(count * 10).stream()]
+    location_ids = [doc.id async for doc in db.collection("locations").stream()]
+    now = datetime.utcnow()
+    for start in range(0, count, 500):
+        batch = db.batch()
+        for _ in range(start, min(start + 500, count)):
+            batch.set(db.collection("transfers").document(), {
+                "asset_id": rng.choice(asset_ids),
+                "reason": "Relocation",
+                "requester_id": "benchmark-admin",
+                "from_location_id": rng.choice(location_ids),
+                "to_location_id": rng.choice(location_ids),
+                "status": rng.choice(TRANSFER_STATUSES),
+                "requested_at": now - timedelta(days=rng.uniform(0, 365)),
+            })
+        await batch.commit()
+
+
+async def seed(assets: int, seed: int) -> Dict:
+    db = get_firestore_db()
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "inventory.csv")
+        write_inventory(path, assets, seed)
+        await import_assets(db, path)
+    await seed_transfers(db, max(1, assets // ASSETS_PER_TRANSFER), seed)
+    await db.collection("it_users").document("benchmark-admin").set({
+        "email": ADMIN_EMAIL,
+        "password": await password_hasher.hash(ADMIN_PASSWORD),
+        "role": "admin",
+        "name": "Benchmark Admin",
+    })
+    await reconcile_counters(db)
+    await rebuild_user_location_index(db)
+    return {"seconds": round(time.perf_counter() - started, 2)}
+
+
+# Endpoints
+
+def endpoints(sample: Dict[str, str]) -> List[str]:
+    """Every read endpoint, with filters taken from the seeded data."""
+    return [
+        "/api/assets/?limit=50",
+        "/api/assets/?limit=50&sort_by=serial_number&sort_order=desc",
+        "/api/assets/?limit=50&skip=1000",
+        f"/api/assets/?limit=50&category={quote(sample['category'])}",
+        f"/api/assets/?limit=50&location_id={quote(sample['location'])}",
+        f"/api/assets/?limit=50&search_query={quote(sample['search'])}",
+        f"/api/assets/{quote(sample['asset'])}",
+        "/api/asset-models",
+        "/api/locations/",
+        f"/api/locations/{quote(sample['location'])}",
+        f"/api/locations/{quote(sample['location'])}/assets",
+        "/api/transfers/?status=PENDING",
+        "/api/transfers/pending/count",
+        "/api/users/?limit=50",
+        f"/api/users/{quote(sample['user'])}",
+        f"/api/users/{quote(sample['user'])}/assets",
+        "/api/analytics/dashboard",
+        "/api/analytics/assets/by-status",
+        "/api/analytics/assets/by-category",
+        "/api/analytics/assets/by-type",
+        "/api/analytics/assets/by-location",
+        "/api/analytics/transfers/monthly",
+        "/api/analytics/assets/warranty-expiring",
+        "/api/analytics/users/asset-allocation",
+        "/api/analytics/recent-activities",
+    ]
+
+
+async def sample_values(db) -> Dict[str, str]:
+    """The most common category, location, user and make, and one asset."""
+    types, locations, users, makes = Counter(), Counter(), Counter(), Counter()
+    first = None
+    async for doc in db.collection("assets").limit(5000).stream():
+        data = doc.to_dict()
+        first = first or doc.id
+        types[data.get("asset_type")] += 1
+        makes[data.get("asset_make")] += 1
+        if data.get("location") is not None:
+            locations[data["location"].id] += 1
+        if data.get("user") is not None:
+            users[data["user"].id] += 1
+    return {
+        "category": types.most_common(1)[0][0],
+        "location": locations.most_common(1)[0][0],
+        "user": users.most_common(1)[0][0],
+        "search": makes.most_common(1)[0][0].lower(),
+        "asset": first,
+    }
+
+
+def _percentile(quantiles: List[float], p: int) -> float:
+    return round(quantiles[p - 1], 2)
+
+
+async def drive(client: httpx.AsyncClient, path: str, headers: Dict[str, str], requests: int,
+                concurrency: int, warmup: int) -> Dict:
+    for _ in range(warmup):
+        await client.get(path, headers=headers)
+
+    latencies: List[float] = []
+    reads: List[int] = []
+    statuses: Counter = Counter()
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] += 1
+            match = _READS.search(response.headers.get("server-timing", ""))
+            reads.append(int(match.group(1)) if match else 0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "endpoint": f"GET {path}",
+        "requests": requests,
+        "concurrency": concurrency,
+        "p50_ms": _percentile(quantiles, 50),
+        "p95_ms": _percentile(quantiles, 95),
+        "p99_ms": _percentile(quantiles, 99),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "throughput_rps": round(requests / elapsed, 1),
+        "reads_per_request": round(statistics.fmean(reads), 1),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+async def run_scale(assets: int, options: Dict) -> Dict:
+    store = get_memory_store()
+    store.latency_ms = options["latency_ms"]
+    store.jitter_ms = options["jitter_ms"]
+    seeding = await seed(assets, options["seed"])
+
+    await app_main.startup_event()
+    try:
+        await startup_warmup.wait()
+        store.wait_for_listeners()
+        sample = await sample_values(get_firestore_db())
+
+        transport = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            response = await client.post("/api/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            results = []
+            for path in endpoints(sample):
+                result = await drive(client, path, headers, options["requests"], options["concurrency"],
+                                     options["warmup"])
+                result["assets"] = assets
+                results.append(result)
+                print(_format(result), flush=True)
+    finally:
+        await app_main.shutdown_event()
+    return {"assets": assets, "seed_seconds": seeding["seconds"], "results": results}
+
+
+def _run_in_process(assets: int, options: Dict) -> Dict:
+    print(f"\n=== {assets} assets ===", flush=True)
+    return asyncio.run(run_scale(assets, options))
+
+
+# Reporting
+
+def _format(result: Dict) -> str:
+    return (
+        f"{result['endpoint'][:64]:<64} p50={result['p50_ms']:9.2f}  p95={result['p95_ms']:9.2f}  "
+        f"p99={result['p99_ms']:9.2f} ms  {result['throughput_rps']:8.1f} req/s  "
+        f"reads={result['reads_per_request']:8.1f}  errors={result['errors']}"
+    )
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: Dict, baseline: Dict) -> None:
+    previous = {(row["assets"], row["endpoint"]): row for row in baseline.get("results", [])}
+    print(f"\nChange against {baseline.get('commit') or 'baseline'}:")
+    matched = 0
+    for row in report["results"]:
+        before = previous.get((row["assets"], row["endpoint"]))
+        if before is None:
+            continue
+        matched += 1
+        p95 = (row["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+        print(
+            f"{row['assets']:>8} {row['endpoint'][:64]:<64} p95 {before['p95_ms']:9.2f} -> {row['p95_ms']:9.2f} ms "
+            f"({p95:+6.1f}%)  reads {before['reads_per_request']:8.1f} -> {row['reads_per_request']:8.1f}"
+        )
+    if not matched:
+        print("No endpoint was benchmarked at the same number of assets in both runs.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", type=int, nargs="+", default=[10000],
+                        help="inventory sizes to benchmark, e.g. 10000 100000 1000000")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight at once")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per endpoint first")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated Firestore round trip")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="benchmark-endpoints.json")
+    parser.add_argument("--baseline", help="an earlier --output file to compare against")
+    args = parser.parse_args()
+
+    options = {
+        "requests": args.requests, "concurrency": args.concurrency, "warmup": args.warmup,
+        "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "seed": args.seed,
+    }
+    report = {
+        "commit": _git_commit(),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "options": options,
+        "scales": [],
+        "results": [],
+    }
+    # A fresh process per scale, so no cache, listener or memory carries over
+    context = multiprocessing.get_context("spawn")
+    for assets in args.assets:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            scale = pool.submit(_run_in_process, assets, options).result()
+        report["scales"].append({"assets": assets, "seed_seconds": scale["seed_seconds"]})
+        report["results"].extend(scale["results"])
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
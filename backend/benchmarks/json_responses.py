@@ -0,0 +1,156 @@
+"""
+Cost of encoding large list responses: standard path vs FAST_JSON_RESPONSES.
+
+Builds hydrated rows shaped like what the list endpoints return (Firestore
+timestamps, nested location and user dicts) and encodes them both ways:
+
+  standard  FastAPI's response_model validation and serialization followed
+            by JSONResponse, exactly what an endpoint returning a dict gets
+  fast      the prebuilt serializer for the same model rendered by orjson
+
+and checks that both produce the same bytes.
+
+Usage (from the backend directory):
+    python -m benchmarks.json_responses --rows 1000 --repeat 20
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ.setdefault("DATABASE_URL", "sqlite:///./asset_management.db")
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+
+from app.api.assets import PaginatedAssetResponse, router as assets_router
+from app.api.transfers import TransferResponse, router as transfers_router
+from app.api.users import UserResponse, router as users_router
+from app.core.config import settings
+from app.core.responses import FastJSONResponse, fast_response
+
+
+def _timestamp(i):
+    return DatetimeWithNanoseconds(2024, 1 + i % 12, 1 + i % 28, i % 24, i % 60, i % 60, (i * 7919) % 1000000,
+                                   tzinfo=timezone.utc)
+
+
+def _location(i):
+    return {"id": f"loc-{i % 40}", "name": f"Nairobi Floor {i % 40} – Wing ü", "created_at": _timestamp(i)}
+
+
+def asset_page(rows):
+    assets = [
+        {
+            "id": f"SN{i:06d}",
+            "asset_model": f"model-{i % 25}",
+            "asset_type": ("Laptop", "Desktop", "Headset")[i % 3],
+            "asset_make": "Dell",
+            "model": f"Latitude {5400 + i % 25}",
+            "asset_status": "In-service",
+            "status": "In-service",
+            "location": _location(i),
+            "serial_number": f"SN{i:06d}",
+            "tag_no": f"KQ-{i:05d}",
+            "assigned_user": {"id": f"user-{i % 300}", "name": f"User {i % 300}", "email": f"user{i % 300}@example.com"},
+            "user": f"user-{i % 300}",
+            "os_version": "Windows 11",
+            "created_at": _timestamp(i),
+            "updated_at": _timestamp(i + 1),
+        }
+        for i in range(rows)
+    ]
+    return {"total_count": rows * 10, "assets": assets, "next_cursor": "eyJzIjpudWxsfQ"}
+
+
+def transfer_list(rows):
+    return [
+        {
+            "id": f"tr-{i}",
+            "asset_id": f"SN{i:06d}",
+            "reason": "Relocation",
+            "requested_at": _timestamp(i),
+            "requester_id": f"user-{i % 300}",
+            "status": "PENDING",
+            "to_location_id": f"loc-{i % 40}",
+            "from_location": _location(i),
+            "to_location": _location(i + 1),
+            "asset": {"id": f"SN{i:06d}", "asset_tag": f"KQ-{i:05d}", "created_at": _timestamp(i)},
+            "requester": {"id": f"user-{i % 300}", "name": f"User {i % 300}"},
+        }
+        for i in range(rows)
+    ]
+
+
+def user_list(rows):
+    return [
+        {
+            "id": f"user-{i}",
+            "name": f"User {i}",
+            "username": f"user{i}",
+            "email": f"user{i}@example.com",
+            "role": "user",
+            "is_active": True,
+            "created_at": _timestamp(i),
+            "location": {"id": f"loc-{i % 40}", "name": f"Floor {i % 40}"},
+        }
+        for i in range(rows)
+    ]
+
+
+def _route(router, model):
+    return next(route for route in router.routes if route.path == "/" and route.response_model == model)
+
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    cases = (
+        ("GET /api/assets", _route(assets_router, PaginatedAssetResponse), asset_page(args.rows)),
+        ("GET /api/transfers", _route(transfers_router, List[TransferResponse]), transfer_list(args.rows)),
+        ("GET /api/users", _route(users_router, List[UserResponse]), user_list(args.rows)),
+    )
+
+    settings.FAST_JSON_RESPONSES = True
+    loop = asyncio.new_event_loop()
+    print(f"{args.rows} rows per response, best of {args.repeat}\n")
+    for label, route, content in cases:
+        def standard():
+            serialized = loop.run_until_complete(serialize_response(field=route.response_field, response_content=content))
+            return JSONResponse(serialized).body
+
+        def fast():
+            response = fast_response(route.response_model, content)
+            assert isinstance(response, FastJSONResponse), "fell back to the standard path"
+            return response.body
+
+        identical = standard() == fast()
+        standard_time = _time(standard, args.repeat)
+        fast_time = _time(fast, args.repeat)
+        print(
+            f"{label:<20} standard={standard_time * 1000:8.2f} ms  fast={fast_time * 1000:8.2f} ms  "
+            f"speedup={standard_time / fast_time:5.1f}x  bytes={len(fast()):>9}  identical={identical}"
+        )
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Login latency under a burst of concurrent logins.
+
+Runs the real `login_for_access_token` handler N times concurrently against
+an in-memory stand-in for the `it_users` query, once with bcrypt running
+inline on the event loop (what the handler used to do) and once on the
+password hashing pool. Alongside the logins a probe coroutine wakes every
+few milliseconds; how late it wakes is the stall every other request on the
+server would see.
+
+Usage (from the backend directory):
+    python -m benchmarks.login_concurrency --logins 32 --rounds 10 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ.setdefault("DATABASE_URL", "sqlite:///./asset_management.db")
+
+from app.api import auth
+from app.api.auth import LoginRequest, login_for_access_token
+from app.core.security import PasswordHasher
+
+PASSWORD = "password123"
+PROBE_INTERVAL = 0.005
+
+
+class InlineHasher(PasswordHasher):
+    """Verifies on the calling thread, i.e. on the event loop."""
+
+    def _submit(self, fn, *args):
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(fn(*args))
+        return future
+
+
+class _Reference:
+    async def update(self, data):
+        pass
+
+
+class _Snapshot:
+    def __init__(self, data):
+        self.id = "bench-user"
+        self.reference = _Reference()
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _Query:
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def where(self, *args):
+        return self
+
+    def limit(self, count):
+        return self
+
+    async def get(self):
+        return [self._snapshot]
+
+
+class _Batch:
+    def set(self, reference, data):
+        pass
+
+    async def commit(self):
+        pass
+
+
+class _Document:
+    def document(self, doc_id):
+        return _Reference()
+
+
+class UsersClient:
+    def __init__(self, hashed_password):
+        self._snapshot = _Snapshot({
+            "email": "bench@example.com",
+            "password": hashed_password,
+            "role": "admin",
+            "name": "Bench",
+            "is_active": True,
+        })
+
+    def collection(self, name):
+        if name == "refresh_tokens":
+            return _Document()
+        return _Query(self._snapshot)
+
+    def batch(self):
+        return _Batch()
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _run(hasher, client, logins):
+    auth.password_hasher = hasher
+    latencies, lags = [], []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            expected = time.perf_counter() + PROBE_INTERVAL
+            await asyncio.sleep(PROBE_INTERVAL)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    # Every login arrives at once, so latency is measured from the burst start
+    async def one():
+        await login_for_access_token(LoginRequest(email="bench@example.com", password=PASSWORD), db=client)
+        latencies.append(time.perf_counter() - started)
+
+    probe_task = asyncio.ensure_future(probe())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe_task
+    hasher.shutdown()
+    return elapsed, latencies, lags
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    hashed = PasswordHasher(rounds=args.rounds).context.hash(PASSWORD)
+    client = UsersClient(hashed)
+    print(f"{args.logins} concurrent logins, bcrypt cost {args.rounds}, {args.workers} hashing workers\n")
+    for label, hasher in (
+        ("inline on loop", InlineHasher(rounds=args.rounds)),
+        ("hashing pool", PasswordHasher(rounds=args.rounds, workers=args.workers, max_queue=args.logins)),
+    ):
+        elapsed, latencies, lags = asyncio.run(_run(hasher, client, args.logins))
+        print(
+            f"{label:<15} wall={elapsed * 1000:8.1f} ms  "
+            f"p50={_percentile(latencies, 0.5) * 1000:7.1f} ms  "
+            f"p99={_percentile(latencies, 0.99) * 1000:7.1f} ms  "
+            f"max loop stall={max(lags, default=0) * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
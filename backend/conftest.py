@@ -0,0 +1,32 @@
+"""
+pytest runs offline: the app's Firestore clients are the in-process store
+(FIRESTORE_BACKEND=memory) unless the environment selects another backend.
+"""
+import os
+
+os.environ.setdefault("FIRESTORE_BACKEND", "memory")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import httpx
+import pytest_asyncio
+
+
+@pytest_asyncio.fixture
+async def client():
+    """An HTTP client for the app over an empty memory store, signed in as an admin."""
+    import main
+    from app.api.auth import get_current_user
+    from app.core.firebase import get_memory_store
+    from app.services.generations import data_generations
+    from app.services.reference_cache import reference_cache
+
+    get_memory_store().clear()
+    # Caches filled by earlier tests describe the data just cleared
+    reference_cache.invalidate()
+    data_generations.bump('assets')
+    main.app.dependency_overrides[get_current_user] = lambda: {'id': 'admin', 'role': 'admin'}
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url='http://test') as client:
+            yield client
+    finally:
+        main.app.dependency_overrides.pop(get_current_user, None)
@@ -3,6 +3,7 @@ load_dotenv()
 
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.security import HTTPBearer
 from app.core.config import settings
 from app.api.auth import router as auth_router
@@ -12,7 +13,24 @@ from app.api.users import router as users_router
 from app.api.locations import router as locations_router
 from app.api.analytics import router as analytics_router
 from app.api.asset_models import router as asset_models_router
-from app.core.firebase import initialize_firebase
+from app.core.firebase import initialize_firebase, get_firestore_db, get_sync_firestore_db
+from app.services.reference_cache import reference_cache
+from app.services.search_index import asset_search_index
+from app.services.analytics_engine import analytics_engine
+from app.services.response_cache import analytics_response_cache
+from app.services.asset_fields import asset_field_sync
+from app.services.list_cache import asset_list_cache
+from app.services.warmup import warmup
+from app.core.security import password_hasher, principal_cache
+from app.core.conditional import representation_cache
+from app.core.metrics import MetricsMiddleware, cache_collector, registry
+
+registry.collector(cache_collector({
+    'reference': reference_cache.stats,
+    'auth': principal_cache.stats,
+    'asset_list': asset_list_cache.stats,
+    'analytics_responses': analytics_response_cache.stats,
+}))
 
 app = FastAPI(
     title="IT Asset Management System",
@@ -23,6 +41,28 @@ app = FastAPI(
 @app.on_event("startup")
 async def startup_event():
     initialize_firebase()
+    # Reference data is loaded once and then kept current by snapshot listeners
+    reference_cache.start(get_sync_firestore_db())
+    asset_search_index.start(get_sync_firestore_db())
+    principal_cache.start(get_sync_firestore_db())
+    # Rewrites the type/make/model copied onto assets when a model is edited;
+    # one writer, so only on the process configured for it
+    if settings.ASSET_FIELD_SYNC:
+        asset_field_sync.start(get_firestore_db())
+    # In the background: requests are accepted now, /ready reports when warm
+    if settings.WARMUP_ON_STARTUP:
+        warmup.start(get_firestore_db())
+    else:
+        warmup.skip()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    warmup.stop()
+    asset_field_sync.stop()
+    principal_cache.stop()
+    password_hasher.shutdown()
+    asset_search_index.stop()
+    reference_cache.stop()
 
 
 # CORS middleware
@@ -32,8 +72,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the frontend read cache validators, analytics cache status and timings
+    expose_headers=["ETag", "X-Cache", "Age", "Server-Timing"],
 )
 
+# Outermost, so its timings cover CORS and every route
+app.add_middleware(MetricsMiddleware)
+
 # Security
 security = HTTPBearer()
 
@@ -54,6 +99,43 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+# For readiness probes: 503 until the startup warmup has finished
+@app.get("/ready")
+async def readiness_check():
+    return JSONResponse(warmup.stats(), status_code=200 if warmup.ready else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health/reference-cache")
+async def reference_cache_stats():
+    return reference_cache.stats()
+
+@app.get("/health/representations")
+async def representation_cache_stats():
+    return representation_cache.stats()
+
+@app.get("/health/analytics")
+async def analytics_engine_stats():
+    return {**analytics_engine.stats(), 'responses': analytics_response_cache.stats()}
+
+@app.get("/health/asset-list-cache")
+async def asset_list_cache_stats():
+    return asset_list_cache.stats()
+
+@app.get("/health/asset-fields")
+async def asset_field_sync_stats():
+    return asset_field_sync.stats()
+
+@app.get("/health/auth-cache")
+async def principal_cache_stats():
+    return principal_cache.stats()
+
+@app.get("/health/password-hashing")
+async def password_hasher_stats():
+    return password_hasher.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
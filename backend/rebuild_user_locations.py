@@ -0,0 +1,40 @@
+"""
+Rebuild the per-user location histograms used by GET /api/users.
+
+Derives every user's asset count per location from the assets collection,
+the same way analyze_user_asset_locations.py does, and overwrites the
+user_location_stats documents. Run it once after deploying the index, after
+bulk imports, or whenever the histograms are suspected to have drifted.
+"""
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.firebase import initialize_firebase, get_firestore_db
+from app.services.user_locations import rebuild_user_location_index
+
+def rebuild_user_locations():
+    try:
+        initialize_firebase()
+        db = get_firestore_db()
+
+        print("=== REBUILDING USER LOCATION INDEX ===\n")
+        summary = asyncio.run(rebuild_user_location_index(db))
+
+        print(f"Users indexed: {summary['users_indexed']}")
+        print(f"Users in multiple locations: {summary['multi_location_users']}")
+        print(f"Stale histograms removed: {summary['stale_removed']}")
+        return summary
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+
+if __name__ == '__main__':
+    rebuild_user_locations()
@@ -0,0 +1,47 @@
+"""
+Recompute the dashboard counters from scratch and report drift.
+
+The counters read by GET /api/analytics/dashboard are incremented by the
+write paths. Writes made outside the API (seed scripts, the console) are not
+counted, so run this after imports or on a schedule. Each counter is
+recounted with an aggregation query, the shards are reset to the true
+values, and any difference from the stored counters is printed. It also
+marks the counters seeded; until something has, the dashboard does the same
+on its first request.
+"""
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.firebase import initialize_firebase, get_firestore_db
+from app.services.counters import COUNTER_FIELDS, reconcile_counters
+
+def reconcile():
+    try:
+        initialize_firebase()
+        db = get_firestore_db()
+
+        print("=== RECONCILING DASHBOARD COUNTERS ===\n")
+        report = asyncio.run(reconcile_counters(db))
+
+        for field in COUNTER_FIELDS:
+            drift = report['drift'][field]
+            marker = f"  (drift {drift:+d})" if drift else ""
+            print(f"{field}: {report['actual'][field]}{marker}")
+
+        drifted = [field for field in COUNTER_FIELDS if report['drift'][field]]
+        print(f"\nCounters with drift: {len(drifted)}")
+        return report
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+
+if __name__ == '__main__':
+    reconcile()
@@ -0,0 +1,55 @@
+"""
+Analytics API tests against the in-memory Firestore backend
+"""
+import pytest
+
+from app.core.firebase import get_firestore_db
+from app.services.response_cache import analytics_response_cache
+
+NEW_ASSET = {
+    'asset_type': 'Laptop', 'asset_make': 'HP', 'asset_model': 'EliteBook', 'asset_tag': 'T-new',
+    'tag_no': 'T-new', 'asset_status': 'In-service', 'location': 'HQ', 'user': 'U0', 'serial_number': 'SN-new',
+}
+
+
+@pytest.mark.asyncio
+async def test_dashboard_counts_data_written_before_the_counters_existed(client):
+    db = get_firestore_db()
+    # Data from before the counters were deployed: nothing counted it
+    batch = db.batch()
+    for i in range(50):
+        batch.set(db.collection('assets').document(f'A{i}'), {'asset_tag': f'A{i}'})
+    for i in range(7):
+        batch.set(db.collection('users').document(f'U{i}'), {'name': f'User {i}'})
+    for i in range(4):
+        batch.set(db.collection('locations').document(f'L{i}'), {'name': f'Location {i}'})
+    await batch.commit()
+
+    # The first write increments a counter shard before the dashboard is opened
+    response = await client.post('/api/assets/', json=NEW_ASSET)
+    assert response.status_code == 200
+
+    response = await client.get('/api/analytics/dashboard')
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats['total_assets'] == 51
+    assert stats['active_assets'] == 1
+    assert stats['total_users'] == 7
+    assert stats['total_locations'] == 4
+
+    # Once seeded, writes are counted incrementally
+    await client.delete('/api/assets/A0')
+    response = await client.get('/api/analytics/dashboard')
+    assert response.json()['total_assets'] == 50
+
+
+@pytest.mark.asyncio
+async def test_recent_activities_limit_is_validated_and_bounds_the_cache(client):
+    analytics_response_cache.invalidate('recent-activities')
+    assert (await client.get('/api/analytics/recent-activities?limit=-5')).status_code == 422
+    assert (await client.get('/api/analytics/recent-activities?limit=0')).status_code == 422
+    for limit in (10, 20, 100):
+        assert (await client.get(f'/api/analytics/recent-activities?limit={limit}')).status_code == 200
+    # Every limit above the most activities there can be shares one entry
+    entries = [name for name in analytics_response_cache.stats()['entries'] if name.startswith('recent-activities')]
+    assert entries == ['recent-activities 10']
@@ -0,0 +1,30 @@
+"""
+Asset API round trips against the in-memory Firestore backend
+
+Requests go through the real app and routers; only authentication is
+replaced, by an admin principal.
+"""
+import pytest
+
+from app.core.firebase import get_firestore_db
+
+
+@pytest.mark.asyncio
+async def test_bulk_status_update_is_returned_by_get(client):
+    db = get_firestore_db()
+    await db.collection('asset_statuses').document('In Service').set({'status_name': 'In Service'})
+    await db.collection('assets').document('1').set({'asset_tag': 'T-1'})
+    await db.collection('assets').document('2').set(
+        {'asset_tag': 'T-2', 'asset_status': db.collection('asset_statuses').document('In Service')})
+
+    response = await client.post('/api/assets/bulk-update-status', json={'asset_ids': ['1', '2'], 'status': 'Faulty'})
+    assert response.status_code == 200
+    assert response.json()['updated'] == 2
+
+    # Without an asset_status the written status is the asset's status...
+    response = await client.get('/api/assets/1')
+    assert response.status_code == 200
+    assert response.json()['status'] == 'Faulty'
+    # ...and an asset_status document, when there is one, still names it
+    response = await client.get('/api/assets/2')
+    assert response.json()['status'] == 'In Service'
@@ -10,7 +10,8 @@ load_dotenv()
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.core.firebase import initialize_firebase, get_firestore_db
+# FIRESTORE_BACKEND=memory (the default under pytest) runs this against the in-process store
+from app.core.firebase import initialize_firebase, get_sync_firestore_db as get_firestore_db
 
 def test_firebase_connection():
     try:
@@ -27,13 +28,16 @@ def test_firebase_connection():
         # Try to access a collection (this will work even if collection doesn't exist)
         collection_ref = db.collection('test')
         print("✓ Can access Firestore collections")
+
+        # One round trip, so a client that cannot reach Firestore fails here
+        collection_ref.limit(1).get()
+        print("✓ Can query Firestore")
         
         print("\n🎉 Firebase integration test passed!")
-        return True
         
     except Exception as e:
         print(f"❌ Firebase integration test failed: {e}")
-        return False
+        raise
 
 if __name__ == "__main__":
     test_firebase_connection()
\ No newline at end of file
@@ -0,0 +1,197 @@
+"""
+Offline tests for the in-memory Firestore backend (app/core/memory_firestore.py)
+
+Each test runs against a fresh store, so they need no credentials and no
+network; the expectations are Firestore's own query semantics.
+"""
+import threading
+from datetime import datetime, timezone
+
+import pytest
+from google.api_core.exceptions import FailedPrecondition, InvalidArgument, NotFound
+
+from app.core.memory_firestore import MAX_BATCH_WRITES, MemoryFirestore
+
+
+@pytest.fixture
+def store():
+    return MemoryFirestore()
+
+
+@pytest.fixture
+def db(store):
+    db = store.client()
+    rows = {
+        'a': {'n': 1, 'kind': 'x', 'tags': ['red']},
+        'b': {'n': 2, 'kind': 'y', 'tags': ['red', 'blue']},
+        'c': {'n': 3, 'kind': None},
+        'd': {'n': 'three'},
+        'e': {'kind': 'x'},
+    }
+    for doc_id, data in rows.items():
+        db.collection('items').document(doc_id).set(data)
+    return db
+
+
+def _ids(query):
+    return [doc.id for doc in query.stream()]
+
+
+# Filters
+
+def test_equality_and_in(db):
+    items = db.collection('items')
+    assert _ids(items.where('kind', '==', 'x')) == ['a', 'e']
+    assert _ids(items.where('kind', '==', None)) == ['c']
+    assert _ids(items.where('n', 'in', [1, 'three'])) == ['a', 'd']
+
+
+def test_not_equal_and_not_in_skip_missing_and_null_fields(db):
+    items = db.collection('items')
+    # 'c' holds null and 'd' lacks the field: Firestore returns neither
+    assert _ids(items.where('kind', '!=', 'x')) == ['b']
+    assert _ids(items.where('kind', 'not-in', ['y'])) == ['a', 'e']
+
+
+def test_range_filters_only_match_the_same_type(db):
+    items = db.collection('items')
+    assert _ids(items.where('n', '>=', 2)) == ['b', 'c']
+    assert _ids(items.where('n', '>', 'a')) == ['d']
+
+
+def test_array_contains(db):
+    items = db.collection('items')
+    assert _ids(items.where('tags', 'array-contains', 'blue')) == ['b']
+    assert _ids(items.where('tags', 'array-contains-any', ['red', 'green'])) == ['a', 'b']
+
+
+def test_reference_filters(store):
+    db = store.client()
+    location = db.collection('locations').document('hq')
+    db.collection('assets').document('1').set({'location': location})
+    db.collection('assets').document('2').set({'location': 'hq'})
+    # A reference never equals its ID as a string, and either client's reference matches
+    async_location = store.async_client().collection('locations').document('hq')
+    assert _ids(db.collection('assets').where('location', '==', async_location)) == ['1']
+    assert _ids(db.collection('assets').where('location', '==', 'hq')) == ['2']
+
+
+# Ordering
+
+def test_order_by_leaves_out_documents_without_the_field(db):
+    assert _ids(db.collection('items').order_by('n')) == ['a', 'b', 'c', 'd']
+
+
+def test_order_across_types_and_descending(store):
+    db = store.client()
+    values = {'t': 'text', 'i': 5, 'f': 1.5, 'z': None, 'b': True,
+              's': datetime(2024, 1, 1, tzinfo=timezone.utc)}
+    for doc_id, value in values.items():
+        db.collection('mixed').document(doc_id).set({'v': value})
+    # null < booleans < numbers < timestamps < strings
+    assert _ids(db.collection('mixed').order_by('v')) == ['z', 'b', 'f', 'i', 's', 't']
+    assert _ids(db.collection('mixed').order_by('v', direction='DESCENDING')) == ['t', 's', 'i', 'f', 'b', 'z']
+
+
+def test_ties_are_broken_by_document_id(db):
+    assert _ids(db.collection('items').order_by('kind')) == ['c', 'a', 'e', 'b']
+    assert _ids(db.collection('items').order_by('kind', direction='DESCENDING')) == ['b', 'e', 'a', 'c']
+
+
+def test_offset_limit_and_count(db):
+    query = db.collection('items').order_by('n')
+    assert _ids(query.offset(1).limit(2)) == ['b', 'c']
+    assert db.collection('items').count().get()[0][0].value == 5
+    assert db.collection('items').where('kind', '==', 'x').count().get()[0][0].value == 2
+
+
+# Cursors
+
+def test_cursors_on_values_and_snapshots(db):
+    query = db.collection('items').order_by('n')
+    assert _ids(query.start_after({'n': 1})) == ['b', 'c', 'd']
+    assert _ids(query.start_at({'n': 2}).end_before({'n': 'three'})) == ['b', 'c']
+    last = query.limit(2).get()[-1]
+    assert _ids(query.start_after(last)) == ['c', 'd']
+
+
+def test_cursor_on_document_id(db):
+    query = db.collection('items').order_by('kind').order_by('__name__')
+    assert _ids(query.start_after({'kind': 'x', '__name__': 'a'})) == ['e', 'b']
+    assert _ids(db.collection('items').order_by('__name__').start_after({'__name__': 'c'})) == ['d', 'e']
+
+
+# Writes
+
+def test_batch_over_the_write_limit_is_rejected_and_writes_nothing(store):
+    db = store.client()
+    batch = db.batch()
+    for i in range(MAX_BATCH_WRITES + 1):
+        batch.set(db.collection('bulk').document(str(i)), {'i': i})
+    with pytest.raises(InvalidArgument):
+        batch.commit()
+    assert db.collection('bulk').count().get()[0][0].value == 0
+
+
+def test_batch_is_atomic(db):
+    batch = db.batch()
+    batch.update(db.collection('items').document('a'), {'n': 10})
+    batch.update(db.collection('items').document('missing'), {'n': 11})
+    with pytest.raises(NotFound):
+        batch.commit()
+    assert db.collection('items').document('a').get().get('n') == 1
+
+
+def test_update_time_precondition(db):
+    ref = db.collection('items').document('a')
+    read = ref.get()
+    ref.update({'n': 4})
+    with pytest.raises(FailedPrecondition):
+        ref.update({'n': 5}, option=db.write_option(last_update_time=read.update_time))
+
+
+def test_get_all_keeps_missing_documents(db):
+    refs = [db.collection('items').document(doc_id) for doc_id in ('b', 'nope', 'a')]
+    snapshots = {snapshot.id: snapshot for snapshot in db.get_all(refs)}
+    assert set(snapshots) == {'a', 'b', 'nope'}
+    assert not snapshots['nope'].exists
+    assert snapshots['b'].get('n') == 2
+
+
+# Listeners
+
+def test_listener_gets_the_collection_then_each_change(store, db):
+    events = []
+    delivered = threading.Event()
+
+    def on_snapshot(docs, changes, read_time):
+        events.append(([doc.id for doc in docs], [(change.type.name, change.document.id) for change in changes]))
+        delivered.set()
+
+    watch = db.collection('items').on_snapshot(on_snapshot)
+    store.wait_for_listeners()
+    db.collection('items').document('f').set({'n': 6})
+    db.collection('items').document('a').delete()
+    store.wait_for_listeners()
+    watch.unsubscribe()
+    db.collection('items').document('g').set({'n': 7})
+    store.wait_for_listeners()
+
+    assert delivered.is_set()
+    assert events[0][0] == ['a', 'b', 'c', 'd', 'e']
+    assert events[1] == (['a', 'b', 'c', 'd', 'e', 'f'], [('ADDED', 'f')])
+    assert events[2] == (['b', 'c', 'd', 'e', 'f'], [('REMOVED', 'a')])
+    assert len(events) == 3
+
+
+# Async client
+
+@pytest.mark.asyncio
+async def test_async_client_shares_the_store(store, db):
+    async_db = store.async_client()
+    assert [doc.id for doc in await async_db.collection('items').where('kind', '==', 'x').get()] == ['a', 'e']
+    batch = async_db.batch()
+    batch.set(async_db.collection('items').document('f'), {'n': 6})
+    await batch.commit()
+    assert db.collection('items').document('f').get().get('n') == 6
+    assert (await async_db.collection('items').count().get())[0][0].value == 6
@@ -1,29 +1,12 @@
 import os
-import firebase_admin
-from firebase_admin import credentials, firestore
 from dotenv import load_dotenv
 import json
 
 # Load environment variables from .env file
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
 
-def initialize_firebase():
-    service_account_key_path = os.getenv("FIREBASE_SERVICE_ACCOUNT_KEY_PATH")
-    if not service_account_key_path:
-        raise ValueError("FIREBASE_SERVICE_ACCOUNT_KEY_PATH environment variable not set.")
-    
-    # Look for the file in the current directory (backend folder)
-    absolute_key_path = os.path.join(os.path.dirname(__file__), service_account_key_path)
-
-    if not os.path.exists(absolute_key_path):
-        raise FileNotFoundError(f"Firebase service account key file not found at: {absolute_key_path}")
-
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(absolute_key_path)
-        firebase_admin.initialize_app(cred)
-
-def get_firestore_db():
-    return firestore.client()
+# FIRESTORE_BACKEND=memory runs this against the in-process store instead of production
+from app.core.firebase import initialize_firebase, get_sync_firestore_db as get_firestore_db
 
 def test_users_api_logic():
     """Test the exact same logic that the users API uses"""
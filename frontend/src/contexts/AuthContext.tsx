@@ -86,6 +86,7 @@ export function AuthProvider({ children }: AuthProviderProps) {
         } catch (error) {
           // Token is invalid, clear storage
           localStorage.removeItem('access_token');
+          localStorage.removeItem('refresh_token');
           localStorage.removeItem('user');
           dispatch({ type: 'LOGOUT' });
         }
@@ -108,6 +109,9 @@ export function AuthProvider({ children }: AuthProviderProps) {
     try {
       const response = await authAPI.login(credentials);
       localStorage.setItem('access_token', response.access_token);
+      if (response.refresh_token) {
+        localStorage.setItem('refresh_token', response.refresh_token);
+      }
       localStorage.setItem('user', JSON.stringify(response.user));
       dispatch({
         type: 'LOGIN_SUCCESS',
@@ -128,7 +132,16 @@ export function AuthProvider({ children }: AuthProviderProps) {
     } catch (error) {
       console.error('Firebase logout error:', error);
     }
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (refreshToken) {
+      try {
+        await authAPI.logout(refreshToken);
+      } catch (error) {
+        console.error('Logout error:', error);
+      }
+    }
     localStorage.removeItem('access_token');
+    localStorage.removeItem('refresh_token');
     localStorage.removeItem('user');
     dispatch({ type: 'LOGOUT' });
   };
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { LoginRequest, LoginResponse, User } from '../types/index.ts';
+import { LoginRequest, LoginResponse, RefreshResponse, User } from '../types/index.ts';
 
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 
@@ -23,15 +23,45 @@ apiClient.interceptors.request.use(
   }
 );
 
+// Concurrent 401s share one refresh; a refresh token can only be used once
+let refreshInFlight: Promise<string> | null = null;
+
+const refreshAccessToken = (): Promise<string> => {
+  if (!refreshInFlight) {
+    const refreshToken = localStorage.getItem('refresh_token');
+    refreshInFlight = (refreshToken
+      ? axios.post<RefreshResponse>(`${API_URL}/api/auth/refresh`, { refresh_token: refreshToken })
+          .then((response) => {
+            localStorage.setItem('access_token', response.data.access_token);
+            localStorage.setItem('refresh_token', response.data.refresh_token);
+            return response.data.access_token;
+          })
+      : Promise.reject(new Error('No refresh token'))
+    ).finally(() => {
+      refreshInFlight = null;
+    });
+  }
+  return refreshInFlight;
+};
+
 // Response interceptor to handle token expiration
 apiClient.interceptors.response.use(
   (response) => response,
-  (error) => {
-    if (error.response?.status === 401) {
-      // Token expired or invalid
-      localStorage.removeItem('access_token');
-      localStorage.removeItem('user');
-      window.location.href = '/login';
+  async (error) => {
+    const original = error.config;
+    if (error.response?.status === 401 && original && !original._retried) {
+      original._retried = true;
+      try {
+        const token = await refreshAccessToken();
+        original.headers.Authorization = `Bearer ${token}`;
+        return apiClient(original);
+      } catch (refreshError) {
+        // Refresh token missing, expired or revoked
+        localStorage.removeItem('access_token');
+        localStorage.removeItem('refresh_token');
+        localStorage.removeItem('user');
+        window.location.href = '/login';
+      }
     }
     return Promise.reject(error);
   }
@@ -42,6 +72,9 @@ export const authAPI = {
     const response = await apiClient.post('/api/auth/login', credentials);
     return response.data;
   },
+  logout: async (refreshToken: string): Promise<void> => {
+    await apiClient.post('/api/auth/logout', { refresh_token: refreshToken });
+  },
   getCurrentUser: async (): Promise<User> => {
     const response = await apiClient.get('/api/users/me');
     return response.data;
@@ -120,6 +153,10 @@ export const assetsAPI = {
     const response = await apiClient.post('/api/assets/bulk-update-location', { asset_ids: assetIds, location_id: locationId });
     return response.data;
   },
+  exportAssets: async (format: 'csv' | 'ndjson' | 'xlsx', params?: any): Promise<Blob> => {
+    const response = await apiClient.get('/api/assets/export', { params: { ...params, format }, responseType: 'blob' });
+    return response.data;
+  },
 };
 
 export const usersAPI = {
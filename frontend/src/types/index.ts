@@ -141,6 +141,13 @@ export interface LoginResponse {
   access_token: string;
   token_type: string;
   user: User;
+  refresh_token?: string | null;
+}
+
+export interface RefreshResponse {
+  access_token: string;
+  refresh_token: string;
+  token_type: string;
 }
 
 export interface CreateAssetRequest {
@@ -175,4 +182,5 @@ export interface UpdateTransferRequest {
 export interface PaginatedAssetResponse {
   total_count: number;
   assets: Asset[];
+  next_cursor?: string | null;
 }